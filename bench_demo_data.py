@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Benchmark gen_demo_data.py stages
+
+ Drives DEMODATA with synthetic metadata of increasing size and reports
+ rows/sec and peak memory for gen_networks, create_networks, dhcp_range,
+ gen_reverse and output_csv. Results can be saved as a baseline and
+ later runs compared against it. A stage that logs an error, e.g. a
+ layout that does not fit the base network, fails the benchmark.
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: <scriptname> [options]
+        --sizes           location counts to benchmark
+        --bases           base networks to benchmark
+        --save            save results as the baseline
+        --compare         compare results with the baseline
+        --threshold       allowed regression (fraction)
+        --repeat          runs per stage
+        -h                help
+
+ Author: Chris Marrison
+ Email: chris@infoblox.com
+
+ Copyright 2018 Chris Marrison / Infoblox Inc
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+----------------------------------------------------------------------
+"""
+
+__version__ = '0.0.1'
+__author__ = 'Chris Marrison'
+
+import logging
+import os
+import math
+import json
+import time
+import yaml
+import argparse
+import tempfile
+import tracemalloc
+from gen_demo_data import DEMODATA, NETBLOCK
+
+### Global Variables ###
+
+STAGES = [ 'gen_networks', 'create_networks', 'dhcp_range',
+           'gen_reverse', 'output_csv' ]
+DEFAULT_SIZES = [ 10, 100, 1000, 10000 ]
+DEFAULT_BASES = [ '10.0.0.0/8', '10.0.0.0/12' ]
+DEPARTMENTS = [ 'HR', 'Engineering', 'Sales', 'IT' ]
+
+### Classes ###
+
+class ERROR_COUNT(logging.Handler):
+    '''
+    Count log records at ERROR and above, keeping the first message
+    '''
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count:int = 0
+        self.first:str = ''
+
+        return
+
+
+    def emit(self, record:logging.LogRecord):
+        if not self.count:
+            self.first = record.getMessage()
+        self.count += 1
+
+        return
+
+
+### Functions ###
+
+def synthetic_metadata(locations:int) -> dict:
+    '''
+    Build metadata with the given number of locations
+
+    Locations are spread over up to 5 regions with roughly as many
+    countries per region as locations per country.
+
+    Parameters:
+        locations (int): Number of locations
+
+    Returns:
+        metadata dict in metadata.yaml format
+    '''
+    num_regions = min(5, max(1, math.ceil(locations / 10)))
+    per_region = math.ceil(locations / num_regions)
+    num_countries = max(1, math.ceil(math.sqrt(per_region)))
+    location_data:dict = {}
+
+    count = 0
+    for r in range(num_regions):
+        region = location_data.setdefault(f'R{r:02d}', {})
+        for c in range(num_countries):
+            country = region.setdefault(f'C{r:02d}{c:04d}', [])
+            while count < locations and len(country) < math.ceil(per_region / num_countries):
+                country.append(f'L{count:06d}')
+                count += 1
+            if not country:
+                del region[f'C{r:02d}{c:04d}']
+
+    return { 'config': { 'dns_view': 'default',
+                         'network_view': 'default',
+                         'base_network': DEFAULT_BASES[0],
+                         'nsg': 'internal',
+                         'auth_zones': [ 'bench.internal' ],
+                         'sub_domains': [ 'nios' ],
+                         'cloud_providers': { 'aws': { 'zones': [ 'aws.private' ] } } },
+             'metadata': { 'names': [ 'Region', 'Country', 'Location' ],
+                           'location_data': location_data,
+                           'departments': DEPARTMENTS,
+                           'device_types': [ 'Router', 'Server' ],
+                           'org_compartments': [ 'Red' ] } }
+
+
+def write_fixture(locations:int, directory:str) -> str:
+    '''
+    Write synthetic metadata to a YAML file
+
+    Returns:
+        file name
+    '''
+    filename = os.path.join(directory, f'metadata_{locations}.yaml')
+    with open(filename, 'w') as f:
+        yaml.safe_dump(synthetic_metadata(locations), f)
+
+    return filename
+
+
+def network_blocks(base:str, count:int, prefix:int) -> list:
+    '''
+    Return up to count blocks of size prefix from base
+    '''
+    block = NETBLOCK.from_network(base)
+    prefix = max(prefix, block.prefixlen)
+
+    return list(block.subnets(new_prefix=prefix, count=count))
+
+
+def run_stage(stage:str, fixture:str, base:str, locations:int, workdir:str) -> tuple:
+    '''
+    Run a single stage, only the stage itself is timed
+
+    Returns:
+        (rows, seconds) tuple
+    '''
+    if stage == 'gen_networks':
+        d = DEMODATA(metadata=fixture, include_countries=True,
+                     include_locations=True)
+        start = time.perf_counter()
+        d.gen_networks(base=base)
+        seconds = time.perf_counter() - start
+        rows = len(d.csv_sets.get('containers', []))
+
+    elif stage == 'create_networks':
+        d = DEMODATA(metadata=fixture)
+        blocks = network_blocks(base, locations, 24)
+        rows = 0
+        start = time.perf_counter()
+        for block in blocks:
+            rows += len(d.create_networks(subnet=block, location='bench'))
+        seconds = time.perf_counter() - start
+
+    elif stage == 'dhcp_range':
+        d = DEMODATA(metadata=fixture)
+        blocks = network_blocks(base, locations * len(DEPARTMENTS), 28)
+        start = time.perf_counter()
+        for block in blocks:
+            d.dhcp_range(subnet=block)
+        seconds = time.perf_counter() - start
+        rows = len(blocks)
+
+    elif stage == 'gen_reverse':
+        # Zones are only created for allocated networks
+        d = DEMODATA(metadata=fixture, include_countries=True,
+                     include_locations=True, include_networks=True)
+        d.gen_networks(base=base)
+        start = time.perf_counter()
+        rows = len(d.gen_reverse(prefix=24, base=base))
+        seconds = time.perf_counter() - start
+
+    elif stage == 'output_csv':
+        d = DEMODATA(metadata=fixture, include_countries=True,
+                     include_locations=True, include_networks=True,
+                     include_dhcp=True)
+        d.gen_networks(base=base)
+        d.gen_zones()
+        d.gen_reverse(base=base)
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            start = time.perf_counter()
+            stats = d.output_csv(to_file=True)
+            seconds = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+        rows = sum(stat['rows'] for stat in stats)
+
+    return ( rows, seconds )
+
+
+def measure(stage:str, fixture:str, base:str, locations:int,
+            workdir:str, memory:bool = True, repeat:int = 3) -> dict:
+    '''
+    Time a stage, taking the best of repeat runs, and optionally
+    measure its peak memory in a separate traced run
+
+    Returns:
+        dict of rows, seconds, rows_per_sec, peak_kb and errors, the
+        number of errors logged by the stage
+    '''
+    errors = ERROR_COUNT()
+    logging.getLogger().addHandler(errors)
+    try:
+        timings:list = []
+        for _ in range(max(1, repeat)):
+            rows, seconds = run_stage(stage, fixture, base, locations, workdir)
+            timings.append(seconds)
+        elapsed = min(timings)
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            run_stage(stage, fixture, base, locations, workdir)
+            peak = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+    finally:
+        logging.getLogger().removeHandler(errors)
+
+    result = { 'rows': rows,
+               'seconds': round(elapsed, 6),
+               'rows_per_sec': round(rows / elapsed, 1) if elapsed else 0,
+               'peak_kb': peak,
+               'errors': errors.count }
+    if errors.count:
+        result['error'] = errors.first
+
+    return result
+
+
+def run_benchmarks(sizes:list, 
+                   bases:list, 
+                   stages:list, 
+                   memory:bool = True,
+                   repeat:int = 3) -> dict:
+    '''
+    Run each stage for each fixture size and base network
+
+    Returns:
+        dict of results keyed by '<stage> <locations> <base>'
+    '''
+    results:dict = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for locations in sizes:
+            fixture = write_fixture(locations, workdir)
+            for base in bases:
+                for stage in stages:
+                    key = f'{stage} {locations} {base}'
+                    results[key] = measure(stage, fixture, base,
+                                           locations, workdir, memory, repeat)
+                    r = results[key]
+                    print(f'{stage:16} {locations:>8} {base:>16} '
+                          f'{r["rows"]:>10} rows {r["rows_per_sec"]:>14.1f} rows/s '
+                          f'{r["peak_kb"] if memory else "-":>10} KB')
+                    if r['errors']:
+                        print(f'{"":16} {r["errors"]} errors logged: {r["error"]}')
+
+    return results
+
+
+def compare(results:dict, baseline:dict, threshold:float) -> list:
+    '''
+    Compare results with a baseline
+
+    A regression is rows/sec below, or peak memory above, the baseline
+    by more than threshold.
+
+    Returns:
+        list of regression messages
+    '''
+    regressions:list = []
+
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base['rows_per_sec'] and result['rows_per_sec'] < base['rows_per_sec'] * (1 - threshold):
+            regressions.append(f'{key}: {result["rows_per_sec"]} rows/s, '
+                               f'baseline {base["rows_per_sec"]} rows/s')
+        if base.get('peak_kb') and result.get('peak_kb') and \
+           result['peak_kb'] > base['peak_kb'] * (1 + threshold):
+            regressions.append(f'{key}: {result["peak_kb"]} KB peak, '
+                               f'baseline {base["peak_kb"]} KB')
+
+    return regressions
+
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Parameters:
+        None
+
+    Returns:
+        Returns parsed arguments
+    '''
+    description = 'NIOS Demo Data Generator Benchmarks'
+    parse = argparse.ArgumentParser(description=description)
+    parse.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                       help='Location counts to benchmark')
+    parse.add_argument('--bases', type=str, nargs='+', default=DEFAULT_BASES,
+                       help='Base networks to benchmark')
+    parse.add_argument('--stages', type=str, nargs='+', default=STAGES,
+                       choices=STAGES, help='Stages to benchmark')
+    parse.add_argument('--baseline', type=str, default='bench_baseline.json',
+                       help='Baseline results file')
+    parse.add_argument('--save', action='store_true',
+                       help='Save results as the baseline')
+    parse.add_argument('--compare', action='store_true',
+                       help='Compare results with the baseline')
+    parse.add_argument('--threshold', type=float, default=0.2,
+                       help='Allowed regression as a fraction, default 0.2')
+    parse.add_argument('--repeat', type=int, default=3,
+                       help='Runs per stage, the fastest is reported')
+    parse.add_argument('--no-memory', action='store_true',
+                       help='Skip peak memory measurement')
+    parse.add_argument('-d', '--debug', action='store_true',
+                        help="Enable debug messages")
+
+    return parse.parse_args()
+
+
+def main():
+    '''
+    Code logic
+    '''
+    exitcode = 0
+
+    args = parseargs()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.ERROR,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+
+    results = run_benchmarks(args.sizes, args.bases, args.stages,
+                             memory=not args.no_memory,
+                             repeat=args.repeat)
+
+    # Timings of a stage that failed are not comparable
+    failed = [ key for key, result in results.items() if result['errors'] ]
+    for key in failed:
+        print(f'FAILED {key}: {results[key]["error"]}')
+    if failed:
+        return 1
+
+    if args.compare:
+        try:
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f'Baseline {args.baseline} not found')
+            return 2
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f'REGRESSION {r}')
+        if regressions:
+            exitcode = 1
+        else:
+            print('No regressions')
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Saved baseline to {args.baseline}')
+
+    return exitcode
+
+
+### Main ###
+if __name__ == '__main__':
+    exitcode = main()
+    exit(exitcode)
+## End Main ###
@@ -5,13 +5,15 @@
 # Create EAs using WAPI
 #
 # Requirements:
-#   requests, getpass
+#   requests, getpass, wapi.py
 #
-# Usage: <scriptname> 
+# Usage: <scriptname> [-f ea_list.txt] [-u user] [--url url] [-c 8] [-b 100]
 #
 # Author: Chris Marrison
 #
 # ChangeLog:
+#   20261018    0.7     Batch EAs in to chunked /request calls
+#   20261018    0.6     Concurrent pooled requests with retries
 #   20170901    0.5     Added basic API error handling
 #   20170901    0.3     Added file check for ea_list.txt
 #   20170831    0.2     Request username:password
@@ -23,13 +25,13 @@
 # Copyright (c) 2017 All Rights Reserved.
 ############################################################################
 
-import requests
 import getpass
 import argparse
+import logging
+import time
 from pathlib import Path
+import wapi
 
-file = Path("ea_list.txt")
-ea_list = []
 wapi_url = "https://192.168.0.242/wapi/v2.11"
 
 
@@ -46,55 +48,99 @@ def parseargs():
     parse = argparse.ArgumentParser(description='Create EA in NIOS')
     parse.add_argument('-f', '--file', type=str, default='ea_list.txt',
                         help="Overide EA List file")
+    parse.add_argument('-u', '--user', type=str, default='',
+                        help="WAPI username (prompted if not given)")
+    parse.add_argument('--url', type=str, default=wapi_url,
+                        help="Base WAPI URL (default: " + wapi_url + ")")
+    parse.add_argument('-c', '--concurrency', type=int, default=8,
+                        help="Maximum requests in flight (default: 8)")
+    parse.add_argument('-b', '--batch', type=int, default=100,
+                        help="EAs per /request call (default: 100)")
+    parse.add_argument('-r', '--retries', type=int, default=3,
+                        help="Retries when the WAPI can not be reached (default: 3)")
     parse.add_argument('-d', '--debug', action='store_true', 
                         help="Enable debug messages")
 
     return parse.parse_args()
 
 
+def read_ea_list(file):
+    '''
+    Read list of EA from file - one per line
+
+    Parameters:
+        file (Path): EA list file
+
+    Returns:
+        List of EA names
+    '''
+    ea_list = []
+    for line in open(file):
+        ea = line.strip()
+        if ea:
+            ea_list.append(ea)
+
+    return ea_list
+
+
+def create_eas(client, ea_list, batch=100):
+    '''
+    Create each EA in ea_list
+
+    Parameters:
+        client (wapi.WAPI_CLIENT): WAPI client
+        ea_list (list): EA names
+        batch (int): EAs per /request call
+
+    Returns:
+        Number of failures
+    '''
+    entries = [ [ { "method": "POST",
+                    "object": "extensibleattributedef",
+                    "data": { "name": ea, "type": "STRING", "flags": "I" } } ]
+                for ea in ea_list ]
+
+    # Call POST /request obj
+    results = client.run_batches(entries, chunk_size=batch)
+
+    failed = 0
+    for ea, (ok, result) in zip(ea_list, results):
+        print("Adding EA: " + ea, end=" : ")
+        if ok:
+            print("Success.")
+        else:
+            failed += 1
+            print("Failed.") 
+            print(result)
+
+    return failed
+
+
 ### Main ###
 
 args = parseargs()
-if args.file:
-    file = Path(args.file)
-else:
-    file = Path("ea_list.txt")
-
-# Disable SSL warnings in requests #
-requests.packages.urllib3.disable_warnings()
+if args.debug:
+    logging.basicConfig(level=logging.DEBUG)
 
-# Read list of EA from file - one per line #
+file = Path(args.file)
 if file.is_file():
-    for line in open(file):
-        ea_list.append(line.rstrip())
+    ea_list = read_ea_list(file)
 else:
     print("File: " + str(file) + " not found.")
     exit()
 
 
 # Get username and password for auth #
-user = input('Username: ')
+user = args.user or input('Username: ')
 passwd = getpass.getpass('Password: ')
 
-# Create each EA in ea_list #
-for ea in ea_list:
-    payload = '{"name": "'+ea+'","type": "STRING", "flags":"I"}'
-
-    headers = {
-        'content-type': "application/json"
-        }
-
-    print("Adding EA: " + ea, end=" : ")
-
-    # Call POST /extensibleattributedef
-    response = requests.request("POST", wapi_url+"/extensibleattributedef", data=payload, 
-		    headers=headers, auth=(user,passwd), verify=False)
-
-    if response.status_code == 201:
-        print("Success.")
-    else:
-        print("Failed.") 
-        print(response.text)
-
-
+client = wapi.WAPI_CLIENT(args.url, user, passwd,
+                          concurrency=args.concurrency,
+                          retries=args.retries)
+start = time.perf_counter()
+failed = create_eas(client, ea_list, batch=args.batch)
+client.close()
 
+print("Created {} of {} EAs, {} failed, {} retries in {:.2f}s".format(
+      len(ea_list) - failed, len(ea_list), failed, client.retried,
+      time.perf_counter() - start))
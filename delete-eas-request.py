@@ -5,14 +5,15 @@
 # Delete EAs using WAPI
 #
 # Requirements:
-#   requests, getpass
+#   requests, getpass, wapi.py
 #   Reads EAs from file with one EA per line (ea_list.txt)
 #
-# Usage: <scriptname> 
+# Usage: <scriptname> [-f ea_list.txt] [-u user] [--url url] [-c 8] [-b 100]
 #
 # Author: Chris Marrison
 #
 # ChangeLog:
+#   20261018	0.6	Batch EAs in to chunked /request calls
 #   20170904	0.5	Added basic API error handling
 #   20170901	0.3	Version number consistency
 #   20170901	0.2	Added file check for ea_list.txt
@@ -24,80 +25,145 @@
 # Copyright (c) 2017 All Rights Reserved.
 ############################################################################
 
-import requests
 import getpass
+import argparse
+import logging
+import time
 from pathlib import Path
+import wapi
 
-file = Path("ea_list.txt")
-ea_list = []
 wapi_url = "https://192.168.0.242/wapi/v2.11.1"
 
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Parameters:
+        None
+
+    Returns:
+        Returns parsed arguments
+    '''
+    parse = argparse.ArgumentParser(description='Delete EA in NIOS')
+    parse.add_argument('-f', '--file', type=str, default='ea_list.txt',
+                        help="Overide EA List file")
+    parse.add_argument('-u', '--user', type=str, default='',
+                        help="WAPI username (prompted if not given)")
+    parse.add_argument('--url', type=str, default=wapi_url,
+                        help="Base WAPI URL (default: " + wapi_url + ")")
+    parse.add_argument('-c', '--concurrency', type=int, default=8,
+                        help="Maximum requests in flight (default: 8)")
+    parse.add_argument('-b', '--batch', type=int, default=100,
+                        help="EAs per /request call (default: 100)")
+    parse.add_argument('-r', '--retries', type=int, default=3,
+                        help="Retries when the WAPI can not be reached (default: 3)")
+    parse.add_argument('-d', '--debug', action='store_true', 
+                        help="Enable debug messages")
+
+    return parse.parse_args()
+
+
+def read_ea_list(file):
+    '''
+    Read list of EA from file - one per line
+
+    Parameters:
+        file (Path): EA list file
+
+    Returns:
+        List of EA names
+    '''
+    ea_list = []
+    for line in open(file):
+        ea = line.strip()
+        if ea:
+            ea_list.append(ea)
+
+    return ea_list
+
+
+def delete_entry(ea, index):
+    '''
+    /request items to look up and delete one EA
+
+    The reference is held in a state variable unique to the EA so
+    that many EAs can share one /request call. Only the DELETE
+    returns a result.
+
+    Parameters:
+        ea (str): EA name
+        index (int): Position of the EA in the list
+
+    Returns:
+        List of /request items
+    '''
+    ref = "ea_ref_" + str(index)
+
+    return [ { "method": "GET",
+               "object": "extensibleattributedef",
+               "data": { "name": ea },
+               "assign_state": { ref: "_ref" },
+               "discard": True },
+             { "method": "DELETE",
+               "object": "##STATE:" + ref + ":##",
+               "enable_substitution": True } ]
+
+
+def delete_eas(client, ea_list, batch=100):
+    '''
+    Delete each EA in ea_list
+
+    Parameters:
+        client (wapi.WAPI_CLIENT): WAPI client
+        ea_list (list): EA names
+        batch (int): EAs per /request call
+
+    Returns:
+        Number of failures
+    '''
+    entries = [ delete_entry(ea, index) for index, ea in enumerate(ea_list) ]
+
+    # Call POST /request obj
+    results = client.run_batches(entries, chunk_size=batch)
+
+    failed = 0
+    for ea, (ok, result) in zip(ea_list, results):
+        print("Deleting EA: " + ea, end=" : ")
+        if ok:
+            print("Success.")
+        else:
+            failed += 1
+            print("Failed.")
+            print(result)
+
+    return failed
+
+
 ### Main ###
 
-# Disable SSL warnings in requests #
-requests.packages.urllib3.disable_warnings()
+args = parseargs()
+if args.debug:
+    logging.basicConfig(level=logging.DEBUG)
 
-# Read list of EA from file - one per line #
+file = Path(args.file)
 if file.is_file():
-    for line in open(file):
-        ea_list.append(line.rstrip())
+    ea_list = read_ea_list(file)
 else:
     print("File: " + str(file) + " not found.")
     exit()
 
-for line in open(file):
-	    ea_list.append(line.rstrip())
-
 # Get username and password for auth #
-user = input('Username: ')
+user = args.user or input('Username: ')
 passwd = getpass.getpass('Password: ')
 
-# Create each EA in ea_list #
-for ea in ea_list:
-    payload = ( '['
-                    '{'
-                        '"method": "STATE:ASSIGN",'
-                        '"data": {'
-                                '"ea_name": "' + ea + '"'
-                                '}'
-                    '},'
-                    '{'
-                        '"method": "GET",'
-                        '"object": "extensibleattributedef",'
-                        '"data": {'
-                                '"name": "##STATE:ea_name:##"'
-                                '},'
-                        '"assign_state": {'
-                                '"ea_ref": "_ref"'
-                                '},'
-                        '"enable_substitution": true,'
-                        '"discard": true'
-                     '},'
-                     '{'
-                        '"method": "DELETE",'
-                        '"object": "##STATE:ea_ref:##",'
-                        '"enable_substitution": true,'
-                        '"discard": true'
-                     '},'
-                     '{'
-                        '"method": "STATE:DISPLAY"'
-                     '}'
-                ']')
-
-    headers = {
-        'content-type': "application/json"
-        }
-
-    print("Deleting EA: " + ea, end=" : ")
-
-    # Call POST /request obj
-    response = requests.request("POST", wapi_url+"/request", data=payload, 
-		    headers=headers, auth=(user,passwd), verify=False)
-
-    if response.status_code == 201:
-        print("Success.")
-    else:
-        print("Failed.")
-        print(response.text)
-
+client = wapi.WAPI_CLIENT(args.url, user, passwd,
+                          concurrency=args.concurrency,
+                          retries=args.retries)
+start = time.perf_counter()
+failed = delete_eas(client, ea_list, batch=args.batch)
+client.close()
 
+print("Deleted {} of {} EAs, {} failed, {} retries in {:.2f}s".format(
+      len(ea_list) - failed, len(ea_list), failed, client.retried,
+      time.perf_counter() - start))
@@ -62,609 +62,4833 @@ import yaml
 import argparse
 import ipaddress
 import random
+import socket
+import tempfile
+import collections
+import collections.abc
+import concurrent.futures
+import copy
+import io
+import re
+import hashlib
+import pickle
+import json
+import time
+import contextlib
+import itertools
+import tracemalloc
+import cProfile
+import csv
+import getpass
+import array
+import zlib
+import string
+import keyword
+import bisect
+import threading
+import http.server
+import urllib.parse
+from typing import NamedTuple
+
+# requests is only needed to push directly to WAPI
+try:
+    import wapi
+except ImportError:
+    wapi = None
+
+# pyarrow is only needed to export Arrow/Parquet
+try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+# zstandard is only needed for zstd compressed output
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 ### Global Variables ###
 
+# Compiled metadata and region caches, CACHE_VERSION is part of the
+# cache keys and is increased whenever generated rows change
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gen_demo_data')
+CACHE_VERSION = 3
+
+# Characters not allowed in generated host names
+HOST_LABEL = re.compile('[^a-z0-9-]+')
+
+# File suffix per output compression
+COMPRESSION = { '': '', 'gzip': '.gz', 'zstd': '.zst' }
+
+# Use libyaml when available
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Header fields held as integer addresses and prefix lengths in COLUMN_TABLE
+ADDRESS_FIELDS = { 'address', 'start_address', 'end_address', 'routers', 
+                   'addresses', 'ipv6_addresses', 'ip_address' }
+PREFIX_FIELDS = { 'netmask', 'cidr' }
+# Header fields unique per row, held as a first label and encoded domain
+NAME_FIELDS = { 'fqdn', 'canonical_name', 'dname' }
+
+# Prefix length of generated IPv6 networks
+IPV6_NETWORK_PREFIX = 64
+# Hosts per IPv6 network unless hosts_per_network is set
+IPV6_HOSTS = 253
+# Maximum addresses in an IPv6 DHCP range
+IPV6_RANGE = 253
+
+# WAPI object per CSV object type, in the order they must be created
+WAPI_OBJECTS = { 'nsg': 'nsgroup',
+                 'containers': 'networkcontainer',
+                 'networks': 'network',
+                 'dhcp_ranges': 'range',
+                 'fixed_addresses': 'fixedaddress',
+                 'auth_zones': 'zone_auth',
+                 'hosts': 'record:host',
+                 'cnames': 'record:cname',
+                 'a_records': 'record:a',
+                 'ptr_records': 'record:ptr' }
+
 # --- Classes ---
 
-class METADATA:
+class NETBLOCK:
+    '''
+    Network block held as an integer address/prefix pair
+
+    Child blocks are calculated arithmetically so that only the blocks
+    actually used are ever created, and addresses are only converted to
+    strings when a CSV row is formatted.
+    '''
+    __slots__ = ( 'address', 'prefixlen', 'version', 'max_prefixlen' )
 
-    def __init__(self,cfg:str = 'metadata.yaml'):
+    def __init__(self, address:int, prefixlen:int, version:int = 4):
         '''
+        Parameters:
+            address (int): Network address as an integer
+            prefixlen (int): Prefix length
+            version (int): IP version, 4 or 6
         '''
-        try:
-            with open(cfg, 'r') as f:
-                data = yaml.safe_load(f)
-                self.metadata = data.get('metadata')
-                self.config = data.get('config')
-                self.base_network = self.get_base_network()
-        except FileNotFoundError:
-            logging.error(f'Metadata file {cfg} not found')
-            raise
-
-        self.def_headers()
+        self.address:int = address
+        self.prefixlen:int = prefixlen
+        self.version:int = version
+        self.max_prefixlen:int = 32 if version == 4 else 128
 
         return
-    
 
-    def def_headers(self):
+
+    @classmethod
+    def from_network(cls, network) -> 'NETBLOCK':
         '''
+        Create block from a CIDR string or ipaddress network object
+
+        Parameters:
+            network (str|ipaddress.ip_network|NETBLOCK): Network
+
+        Returns:
+            NETBLOCK object
         '''
-        self.container_header = ( 'header-networkcontainer,address*,netmask*,'
-            'network_view,EA-Region,EAInherited-Region,EA-Country'
-            ',EAInherited-Country,EA-Location,EAInherited-Location'
-            ',EA-Department,EA-Billing,EA-SecurityZone,EA-VLAN' )
+        if isinstance(network, NETBLOCK):
+            return network
+        net = ipaddress.ip_network(network)
 
-        self.net_header = ( 'header-network,address*,netmask*,routers,disabled,'
-            'auto_create_reversezone,enable_discovery,'
-            'EA-Region,EAInherited-Region,EA-Country,EAInherited-Country,'
-            'EA-Location,EAInherited-Location,EA-Department,EA-Billing')
+        return cls(int(net.network_address), net.prefixlen, net.version)
 
-        self.dhcp_range_header = 'header-DhcpRange,start_address,end_address'
-        self.nsg_header = ( 'header-nsgroup,group_name,grid_primaries,grid_secondaries,'
-                            'is_grid_default' )
-        self.zone_header = 'header-authzone,fqdn,zone_format,view,ns_group,soa_email'
-        self.host_header = 'header-hostrecord,addresses,configure_for_dns,fqdn,EA-DeviceType'
-        self.cname_header = 'header-CnameRecord,fqdn,view,canonical_name,comment,EA-DeviceType'
-        self.headers = { 'containers': self.container_header,
-                         'networks': self.net_header,
-                         'dhcp_ranges': self.dhcp_range_header,
-                         'nsg': self.nsg_header,
-                         'auth_zones': self.zone_header,
-                         'hosts': self.host_header,
-                         'cnames': self.cname_header }
 
-        return
+    def __repr__(self):
+        return f'NETBLOCK({self.exploded})'
 
-    
-    def names(self):
+
+    def __eq__(self, other):
+        if isinstance(other, NETBLOCK):
+            return ( (self.address, self.prefixlen, self.version) ==
+                     (other.address, other.prefixlen, other.version) )
+        return NotImplemented
+
+
+    def __hash__(self):
+        return hash((self.address, self.prefixlen, self.version))
+
+
+    @property
+    def num_addresses(self) -> int:
         '''
+        Number of addresses in block
         '''
-        return self.metadata.get['names']
+        return 1 << (self.max_prefixlen - self.prefixlen)
 
 
-    def regions(self):
+    @property
+    def broadcast(self) -> int:
         '''
+        Last address in block as an integer
         '''
-        return list(self.metadata['location_data'].keys())
-    
+        return self.address + self.num_addresses - 1
 
-    def countries(self, region:str = '') -> list:
+
+    @property
+    def network_address(self) -> str:
         '''
+        Network address in exploded string form
         '''
-        countries:list = []
+        return int_to_address(self.address, self.version)
 
-        if region:
-            countries = list(self.metadata['location_data'][region].keys())
+
+    @property
+    def netmask(self) -> str:
+        '''
+        Netmask in exploded string form
+        '''
+        mask = ( (1 << self.max_prefixlen) - 1 ) ^ ( self.num_addresses - 1 )
+        return int_to_address(mask, self.version)
+
+
+    @property
+    def exploded(self) -> str:
+        '''
+        Network in exploded address/prefix form
+        '''
+        return f'{self.network_address}/{self.prefixlen}'
+
+
+    def num_subnets(self, new_prefix:int) -> int:
+        '''
+        Number of child blocks of size new_prefix
+
+        Parameters:
+            new_prefix (int): Prefix length of child blocks
+
+        Returns:
+            Number of child blocks, 0 if new_prefix is not valid
+        '''
+        if new_prefix < self.prefixlen or new_prefix > self.max_prefixlen:
+            return 0
+
+        return 1 << (new_prefix - self.prefixlen)
+
+
+    def subnet(self, index:int, new_prefix:int) -> 'NETBLOCK':
+        '''
+        Return the nth child block of size new_prefix
+
+        Parameters:
+            index (int): Index of child block
+            new_prefix (int): Prefix length of child block
+
+        Returns:
+            NETBLOCK object
+        '''
+        if not 0 <= index < self.num_subnets(new_prefix):
+            raise IndexError(f'Block {index} /{new_prefix} is outside '
+                             f'of {self.exploded}')
+        offset = index << (self.max_prefixlen - new_prefix)
+
+        return NETBLOCK(self.address + offset, new_prefix, self.version)
+
+
+    def subnets(self, new_prefix:int, count:int = 0):
+        '''
+        Generate child blocks of size new_prefix
+
+        Parameters:
+            new_prefix (int): Prefix length of child blocks
+            count (int): Maximum number of blocks, 0 for all
+
+        Yields:
+            NETBLOCK objects
+        '''
+        total = self.num_subnets(new_prefix)
+        if count:
+            total = min(count, total)
+        step = 1 << (self.max_prefixlen - new_prefix)
+        address = self.address
+        for _ in range(total):
+            yield NETBLOCK(address, new_prefix, self.version)
+            address += step
+
+
+    def supernet(self, new_prefix:int) -> 'NETBLOCK':
+        '''
+        Return the enclosing block of size new_prefix
+
+        Parameters:
+            new_prefix (int): Prefix length of the supernet
+
+        Returns:
+            NETBLOCK object
+        '''
+        if new_prefix > self.prefixlen or new_prefix < 0:
+            raise ValueError(f'/{new_prefix} is not a supernet of {self.exploded}')
+        host_bits = (1 << (self.max_prefixlen - new_prefix)) - 1
+
+        return NETBLOCK(self.address & ~host_bits, new_prefix, self.version)
+
+
+class CSV_WRITER:
+    '''
+    Buffered CSV writer
+
+    Rows are joined and written in batches through a large buffer.
+    When writing to a named file the output goes to a temporary file in
+    the same directory which is atomically renamed over the target on
+    close, keeping any existing file as <filename>.bak. Batches can be
+    handed to a thread pool so that writing overlaps with generation.
+
+    Output can be compressed as a single gzip or zstd stream. Batches
+    are compressed on the thread that writes them, zlib and zstandard
+    release the GIL while compressing, and zstd uses its own worker
+    threads as well.
+    '''
+
+    def __init__(self,
+                 filename:str = '',
+                 header:str = '',
+                 fileobj = None,
+                 executor:concurrent.futures.Executor = None,
+                 batch_rows:int = 10000,
+                 buffer_size:int = 1024 * 1024,
+                 compression:str = ''):
+        '''
+        Parameters:
+            filename (str): Target file name
+            header (str): Header row written first
+            fileobj (file): Binary file object to write to instead of
+                            filename, this is not closed
+            executor (Executor): Optional pool to write batches on
+            batch_rows (int): Rows per write
+            buffer_size (int): File buffer size in bytes
+            compression (str): '', 'gzip' or 'zstd'
+        '''
+        self.filename:str = filename
+        self.executor = executor
+        self.batch_rows:int = batch_rows
+        self.rows:int = 0
+        self.bytes:int = 0
+        self.compressed:int = 0
+        self.batch:list = []
+        self.future = None
+        self.tmpname:str = ''
+
+        if compression == 'gzip':
+            # wbits 31 writes a gzip header and trailer
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif compression == 'zstd':
+            if zstandard is None:
+                raise ImportError('zstd output requires the zstandard package')
+            self.compressor = zstandard.ZstdCompressor(threads=-1).compressobj()
+        elif compression:
+            raise ValueError(f'Unsupported compression: {compression}')
         else:
-            for region in self.metadata['location_data'].keys():
-                countries.extend(list(self.metadata['location_data'][region].keys()))
-        
-        return countries
-    
+            self.compressor = None
+
+        if fileobj:
+            self.output = fileobj
+        else:
+            fd = self.create_temp(filename)
+            self.output = open(fd, mode='wb', buffering=buffer_size)
+            logging.info(f"Successfully opened output file {filename}.")
+
+        if header:
+            self._write_batch([ header ])
+            self.rows = 0
+
+        return
+
 
-    def get_region(self, country:str):
+    def create_temp(self, filename:str) -> int:
         '''
+        Create a temporary file next to filename, with the permissions
+        open() would give filename under the process umask
+
+        Returns:
+            file descriptor
         '''
-        region:str = ''
-        for r in self.regions():
-            if country in self.metadata['location_data'][r].keys():
-                region = r
-                break
-        
-        return region
+        directory = os.path.dirname(os.path.abspath(filename))
+        while True:
+            self.tmpname = os.path.join(directory, 
+                                        f'.{os.path.basename(filename)}.'
+                                        f'{os.urandom(4).hex()}')
+            try:
+                return os.open(self.tmpname, 
+                               os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+                               getattr(os, 'O_BINARY', 0), 0o666)
+            except FileExistsError:
+                continue
 
 
-    def locations(self, region:str = '', country:str = ''):
+    def write(self, row:str):
         '''
+        Add row to the output
+
+        Parameters:
+            row (str): CSV row without line ending
         '''
-        locations:list = []
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_rows:
+            self.flush()
 
-        if region and country:
-            locations = self.metadata['location_data'][region][country]
-        elif region:
-            for ctry in self.countries(region=region):
-                locations.extend(self.metadata['location_data'][region][ctry])
-        elif country:
-            region = self.get_region(country=country)
-            locations = self.metadata['location_data'][region][country]
+        return
 
-        return locations
 
+    def write_rows(self, rows):
+        '''
+        Add rows to the output
 
-    def departments(self):
+        Parameters:
+            rows (iterable): CSV rows without line endings
+        '''
+        for row in rows:
+            self.batch.append(row)
+            if len(self.batch) >= self.batch_rows:
+                self.flush()
+
+        return
+
+
+    def flush(self):
         '''
+        Write the current batch, on the executor if set
         '''
-        return self.metadata.get('departments')
+        batch = self.batch
+        self.batch = []
+        if self.executor:
+            # Only one batch in flight per file to keep rows in order
+            if self.future:
+                self.future.result()
+            self.future = self.executor.submit(self._write_batch, batch)
+        else:
+            self._write_batch(batch)
 
+        return
 
-    def device_types(self):
+
+    def _write_batch(self, batch:list):
         '''
+        Encode and write a list of rows
         '''
-        return self.metadata.get('device_types')
+        if batch:
+            data = ( '\n'.join(batch) + '\n' ).encode('utf-8')
+            self.rows += len(batch)
+            self.bytes += len(data)
+            if self.compressor:
+                data = self.compressor.compress(data)
+                self.compressed += len(data)
+            self.output.write(data)
 
+        return
 
-    def org_compartments(self):
+
+    def close(self) -> dict:
+        '''
+        Write remaining rows and move the file in to place
+
+        Returns:
+            dict of file, rows and bytes written
+        '''
+        self.flush()
+        if self.future:
+            self.future.result()
+        if self.compressor:
+            data = self.compressor.flush()
+            self.compressed += len(data)
+            self.output.write(data)
+
+        if self.tmpname:
+            self.output.close()
+            if os.path.isfile(self.filename):
+                backup = self.filename + '.bak'
+                try:
+                    if os.path.exists(backup):
+                        os.remove(backup)
+                    os.link(self.filename, backup)
+                except OSError:
+                    shutil.copy2(self.filename, backup)
+                logging.info(f"Outfile exists backed up to {backup}")
+            os.replace(self.tmpname, self.filename)
+        else:
+            self.output.flush()
+
+        stats = { 'file': self.filename, 'rows': self.rows, 'bytes': self.bytes }
+        if self.compressor:
+            stats['compressed'] = self.compressed
+
+        return stats
+
+
+    def abort(self):
         '''
+        Discard output, leaving any existing target untouched
         '''
-        return self.metadata.get('org_compartments')
+        self.batch = []
+        if self.tmpname:
+            self.output.close()
+            os.remove(self.tmpname)
 
+        return
 
-    def dns_view(self):
+
+class ROW_SCHEMA:
+    '''
+    Column layout of an object type, parsed from its CSV header
+    '''
+
+    def __init__(self, header:str):
         '''
+        Parameters:
+            header (str): CSV header, header-<type>,<column>,...
         '''
-        return self.config.get('dns_view')
+        names = header.split(',')
+        self.header:str = header
+        self.tag:str = names[0].removeprefix('header-')
+        self.columns:tuple = tuple( name.rstrip('*') for name in names[1:] )
+        self.required:set = { name.rstrip('*') for name in names[1:] 
+                              if name.endswith('*') }
 
+        return
 
-    def network_view(self):
+
+    def template(self, 
+                 columns:dict, 
+                 fields:tuple = (), 
+                 typed:bool = False) -> 'ROW_TEMPLATE':
         '''
+        Compile a row template for this layout, see ROW_TEMPLATE
         '''
-        return self.config.get('network_view')
+        return ROW_TEMPLATE(self, columns, fields, typed)
 
 
-    def get_base_network(self):
+class ROW_TEMPLATE:
+    '''
+    Compiled CSV row encoder for one layout of an object type
+
+    Column values are str.format() style patterns over named values,
+    e.g. '{name}.{domain}' or '{group:04x}', plain text is a constant
+    column and columns that are not given are left empty. The constant
+    text is joined once and the row compiled to a single f-string, so
+    rows are checked against the header when the template is built
+    and encoding costs little more than a hand written f-string. Rows
+    with a comma or quote in a value are encoded again with each field
+    quoted as COLUMN_TABLE.quote() does.
+
+    Typed templates encode a row as a tuple of its field values for a
+    COLUMN_TABLE, so no CSV text is built for the row until output.
+    '''
+
+    def __init__(self, 
+                 schema:ROW_SCHEMA, 
+                 columns:dict, 
+                 fields:tuple = (), 
+                 typed:bool = False):
         '''
+        Parameters:
+            schema (ROW_SCHEMA): Layout of the object type
+            columns (dict): Pattern per column name
+            fields (tuple): Values that vary per row for encode_rows(),
+                            all other values are passed once per call
+            typed (bool): Encode rows as tuples of field values
         '''
-        return self.config.get('base_network')
+        self.schema:ROW_SCHEMA = schema
+        self.columns:dict = dict(columns)
+        self.fields:tuple = tuple(fields)
+        self.typed:bool = typed
+
+        unknown = [ column for column in self.columns 
+                    if column not in schema.columns ]
+        if unknown:
+            raise ValueError(f'{schema.tag} has no columns {unknown}')
+        missing = [ column for column in schema.columns 
+                    if column in schema.required and not self.columns.get(column) ]
+        if missing:
+            raise ValueError(f'{schema.tag} requires columns {missing}')
+
+        parts:list = [ schema.tag ]
+        quoted:list = [ schema.tag ]
+        params:list = []
+        for column in schema.columns:
+            source = ''
+            fields = []
+            for text, name, spec, conversion in string.Formatter().parse(
+                                                    self.columns.get(column, '')):
+                if any(char in text for char in ',"\n\\'):
+                    raise ValueError(f'{schema.tag} {column}: constant {text!r} '
+                                     'would change the column layout')
+                source += text.replace('{', '{{').replace('}', '}}')
+                if text:
+                    fields.append(repr(text))
+                if name is None:
+                    continue
+                if ( not name.isidentifier() or keyword.iskeyword(name) or 
+                     name == 'rows' or name.startswith('_') or conversion or
+                     '{' in (spec or '') or '\\' in (spec or '') ):
+                    raise ValueError(f'{schema.tag} {column}: unsupported '
+                                     f'field {{{name}}}')
+                if name not in params:
+                    params.append(name)
+                source += f'{{{name}:{spec}}}' if spec else f'{{{name}}}'
+                fields.append(f'format({name}, {spec!r})' if spec else 
+                              f'str({name})')
+            parts.append(source)
+            quoted.append(f"{{_quote({' + '.join(fields)})}}" if fields else '')
+
+        unknown = [ field for field in self.fields if field not in params ]
+        if unknown:
+            raise ValueError(f'{schema.tag} template has no fields {unknown}')
+        self.params:tuple = tuple(params)
+        self.bound:tuple = tuple( param for param in params 
+                                  if param not in self.fields )
+
+        args = ', '.join(self.params)
+        target = ', '.join(self.fields)
+        if len(self.fields) > 1:
+            target = f'({target})'
+        if typed:
+            row = f"( {', '.join('f' + repr(part) for part in parts)}, )"
+            source = f'def encode({args}):\n    return {row}\n'
+            if self.fields:
+                source += ( f'def encode_rows({", ".join(("rows",) + self.bound)}):\n'
+                            f'    return [ {row} for {target} in rows ]\n' )
+        else:
+            source = self.csv_source(parts, quoted, args, target)
+        namespace:dict = { '_quote': COLUMN_TABLE.quote }
+        exec(source, namespace)
+        self.encode = namespace['encode']
+        self.encode_rows = namespace.get('encode_rows')
 
+        return
 
-    def name_server_group(self):
+
+    def csv_source(self, parts:list, quoted:list, args:str, target:str) -> str:
         '''
+        Source of the CSV string encoders
         '''
-        return self.config.get('nsg')
+        # Values are only quoted when rows have more commas than columns
+        # or a quote, encode_rows() checks the whole batch at once
+        row = 'f' + repr(','.join(parts))
+        width = len(self.schema.columns)
+        check = f'(_row := {row}).count(",") == {width} and \'"\' not in _row'
+        source = ( f'def encode_quoted({args}):\n'
+                   f'    return f{",".join(quoted)!r}\n'
+                   f'def encode({args}):\n'
+                   f'    return _row if {check} else encode_quoted({args})\n' )
+        if self.fields:
+            source += ( f'def encode_rows({", ".join(("rows",) + self.bound)}):\n'
+                        f'    rows = list(rows)\n'
+                        f'    _rows = [ {row} for {target} in rows ]\n'
+                        f'    _text = "".join(_rows)\n'
+                        f'    if ( _text.count(",") == {width} * len(_rows) and\n'
+                        f'         \'"\' not in _text ):\n'
+                        f'        return _rows\n'
+                        f'    return [ _row if {check} else encode_quoted({args})\n'
+                        f'             for {target} in rows ]\n' )
+
+        return source
+
+
+    def __reduce__(self):
+        # Compiled functions cannot be pickled, rebuild from the columns
+        return ( ROW_TEMPLATE, (self.schema, self.columns, self.fields, self.typed) )
+
+
+class COLUMN_TABLE(collections.abc.Sequence):
+    '''
+    CSV rows for one object type held as typed columns
+
+    Addresses are held as integers, netmasks as prefix lengths, DNS
+    names as their first label plus an encoded domain and all other
+    fields dictionary encoded, so each distinct value is stored once.
+    Rows are added as tuples of field values from typed ROW_TEMPLATEs,
+    or as CSV strings, and are only formatted to CSV strings when read.
+    Added rows are converted a column at a time in batches.
+    '''
+    # Marks IPv6 addresses and dotted netmasks within a column
+    IPV6 = 1 << 128
+    DOTTED = 256
+
+    def __init__(self, header:str, rows=()):
+        '''
+        Parameters:
+            header (str): CSV header for the object type
+            rows (iterable): CSV rows
+        '''
+        self.header:str = header
+        self.names:list = [ name.rstrip('*') for name in header.split(',') ]
+        self.kinds:list = []
+        self.columns:list = []
+        for name in self.names:
+            if name in ADDRESS_FIELDS:
+                self.kinds.append('address')
+                self.columns.append(array.array('q'))
+            elif name in PREFIX_FIELDS:
+                self.kinds.append('prefix')
+                self.columns.append(array.array('H'))
+            elif name in NAME_FIELDS:
+                self.kinds.append('name')
+                self.columns.append([])
+            else:
+                self.kinds.append('category')
+                self.columns.append(array.array('I'))
+        # Dictionary encoding for category columns
+        self.values:list = [ [] for _ in self.names ]
+        self.codes:list = [ {} for _ in self.names ]
+        self.formatted:list = [ [] for _ in self.names ]
+        self.domains:list = [ array.array('I') for _ in self.names ]
+        self.prefixes:dict = {}
+        self.length:int = 0
+        self.pending:list = []
+        self.extend(rows)
+
+        return
 
 
-    def auth_zones(self):
+    def __len__(self) -> int:
+        return self.length + len(self.pending)
+
+
+    def __getitem__(self, index):
+        self.flush()
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step == 1:
+                return self.format_rows(start, stop)
+            return [ self[i] for i in range(start, stop, step) ]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('COLUMN_TABLE index out of range')
+
+        return self.format_rows(index, index + 1)[0]
+
+
+    def __iter__(self):
+        self.flush()
+        for start in range(0, self.length, 10000):
+            yield from self.format_rows(start, min(start + 10000, self.length))
+
+
+    def append(self, row):
         '''
+        Add a row, a tuple of field values or a CSV string
         '''
-        return self.config.get('auth_zones')
+        if not isinstance(row, tuple):
+            row = self.split(row)
+        self.pending.append(row)
+        if len(self.pending) >= 10000:
+            self.flush()
 
+        return
 
-    def sub_domains(self):
+
+    def extend(self, rows):
         '''
+        Add rows, tuples of field values or CSV strings
         '''
-        return self.config.get('sub_domains')
+        pending = self.pending
+        split = self.split
+        for row in rows:
+            pending.append(row if isinstance(row, tuple) else split(row))
+            if len(pending) >= 10000:
+                self.flush()
+                pending = self.pending
 
+        return
 
-    def cloud_providers(self):
+
+    def split(self, row:str) -> list:
         '''
+        Fields of a CSV row
         '''
-        return self.config.get('cloud_providers').keys()
+        fields = row.split(',')
+        if len(fields) != len(self.names) or '"' in row:
+            fields = next(csv.reader([ row ]))
+            if len(fields) != len(self.names):
+                raise ValueError(f'Row does not match header '
+                                 f'{self.names[0]}: {row}')
 
+        return fields
 
-    def cloud_zones(self, cloud:str=''):
+
+    def flush(self):
         '''
+        Convert the pending rows in to the columns
         '''
-        zones:list = []
-        cloud = cloud.casefold()
+        if self.pending:
+            self.add_fields(self.pending)
+            self.pending = []
 
-        if cloud:
-            if cloud in self.cloud_providers():
-                zones = self.config['cloud_providers'][cloud].get('zones')
+        return
+
+
+    def add_fields(self, batch:list):
+        '''
+        Add a batch of split rows
+        '''
+        for index, values in enumerate(zip(*batch)):
+            kind = self.kinds[index]
+            column = self.columns[index]
+            if kind == 'category':
+                codes = self.codes[index]
+                column.extend([ codes[value] if value in codes else
+                                self.add_category(index, value)
+                                for value in values ])
+            elif kind == 'name':
+                codes = self.codes[index]
+                domains = self.domains[index]
+                for value in values:
+                    label, dot, domain = value.partition('.')
+                    domain = dot + domain
+                    column.append(label)
+                    domains.append(codes[domain] if domain in codes else
+                                   self.add_category(index, domain))
+            elif kind == 'prefix':
+                prefixes = self.prefixes
+                column.extend([ prefixes[value] if value in prefixes else
+                                self.add_prefix(value)
+                                for value in values ])
             else:
-                logging.error(f'Cloud vendor {cloud} not found')
+                self.add_addresses(index, values)
+        self.length += len(batch)
+
+        return
+
+
+    def add_category(self, index:int, value:str) -> int:
+        '''
+        Add a value to the dictionary for a category column
+
+        Returns:
+            code for value
+        '''
+        code = len(self.values[index])
+        self.codes[index][value] = code
+        self.values[index].append(value)
+        self.formatted[index].append(self.quote(value))
+
+        return code
+
+
+    @staticmethod
+    def quote(value:str) -> str:
+        '''
+        Quote a CSV field if needed
+        '''
+        if ',' in value or '"' in value:
+            return '"' + value.replace('"', '""') + '"'
+
+        return value
+
+
+    def add_addresses(self, index:int, values:tuple):
+        '''
+        Add addresses, -1 when empty
+        '''
+        inet_aton = socket.inet_aton
+        try:
+            addresses = [ int.from_bytes(inet_aton(value), 'big') 
+                          for value in values ]
+        except OSError:
+            # Empty values or IPv6
+            addresses = [ -1 if not value else
+                          int(ipaddress.IPv6Address(value)) | self.IPV6
+                              if ':' in value else
+                          int.from_bytes(inet_aton(value), 'big')
+                          for value in values ]
+            column = self.columns[index]
+            if ( isinstance(column, array.array) and 
+                 max(addresses) > 0x7fffffffffffffff ):
+                # IPv6 addresses do not fit in an array
+                self.columns[index] = list(column)
+        self.columns[index].extend(addresses)
+
+        return
+
+
+    def add_prefix(self, value:str) -> int:
+        '''
+        Convert a prefix length or dotted netmask
+
+        Returns:
+            prefix length, plus DOTTED for a dotted netmask
+        '''
+        if '.' in value:
+            prefix = ( bin(int.from_bytes(socket.inet_aton(value), 'big'))
+                       .count('1') + self.DOTTED )
         else:
-            if self.cloud_providers():
-                for c in self.cloud_providers():
-                    zones.extend(self.config['cloud_providers'][c].get('zones'))
+            prefix = int(value)
+        self.prefixes[value] = prefix
+
+        return prefix
+
+
+    def format_column(self, index:int, start:int, stop:int) -> list:
+        '''
+        Format a range of a column as CSV field strings
+        '''
+        column = self.columns[index][start:stop]
+        kind = self.kinds[index]
+        if kind == 'category':
+            formatted = self.formatted[index]
+            return [ formatted[code] for code in column ]
+        if kind == 'name':
+            return [ self.quote(value) 
+                     for value in self.names_for(index, start, stop) ]
+        if kind == 'prefix':
+            return [ str(prefix) if prefix < self.DOTTED else
+                     socket.inet_ntoa(((0xffffffff << (32 - prefix + self.DOTTED))
+                                       & 0xffffffff).to_bytes(4, 'big'))
+                     for prefix in column ]
+
+        return [ '' if address < 0 else
+                 int_to_address(address & ~self.IPV6, 6) 
+                     if address & self.IPV6 else
+                 socket.inet_ntoa(address.to_bytes(4, 'big'))
+                 for address in column ]
+
+
+    def names_for(self, index:int, start:int, stop:int) -> list:
+        '''
+        DNS names for a range of a name column
+        '''
+        domains = self.values[index]
+
+        return [ label + domains[code] for label, code 
+                 in zip(self.columns[index][start:stop], 
+                        self.domains[index][start:stop]) ]
+
+
+    def format_rows(self, start:int, stop:int) -> list:
+        '''
+        Format rows start to stop as CSV strings
+        '''
+        columns = [ self.format_column(index, start, stop) 
+                    for index in range(len(self.names)) ]
+
+        return [ ','.join(fields) for fields in zip(*columns) ]
+
+
+    def to_arrow(self):
+        '''
+        Convert to a pyarrow Table
+
+        Addresses are exported as uint32 for IPv4 only columns or 16
+        byte binary otherwise, with nulls for empty values. The object
+        type column is not exported.
+
+        Returns:
+            pyarrow.Table
+        '''
+        self.flush()
+        arrays = []
+        for index, name in enumerate(self.names[1:], start=1):
+            column = self.columns[index]
+            kind = self.kinds[index]
+            if kind == 'category':
+                arrays.append(pyarrow.DictionaryArray.from_arrays(
+                                pyarrow.array(column, type=pyarrow.uint32()),
+                                pyarrow.array(self.values[index], 
+                                              type=pyarrow.string())))
+            elif kind == 'name':
+                arrays.append(pyarrow.array(self.names_for(index, 0, self.length),
+                                            type=pyarrow.string()))
+            elif kind == 'prefix':
+                arrays.append(pyarrow.array([ prefix % self.DOTTED 
+                                              for prefix in column ],
+                                            type=pyarrow.uint8()))
+            elif isinstance(column, array.array):
+                arrays.append(pyarrow.array([ None if address < 0 else address
+                                              for address in column ],
+                                            type=pyarrow.uint32()))
             else:
-                logging.error('No cloud_providers found')
-        
-        return zones
-            
+                arrays.append(pyarrow.array(
+                    [ None if address < 0 else
+                      (address & ~self.IPV6).to_bytes(16, 'big')
+                          if address & self.IPV6 else
+                      (address | 0xffff00000000).to_bytes(16, 'big')
+                      for address in column ],
+                    type=pyarrow.binary(16)))
+
+        return pyarrow.Table.from_arrays(arrays, names=self.names[1:])
+
 
+class COLUMN_STORE(dict):
+    '''
+    csv_sets replacement holding each object type as a COLUMN_TABLE
+    '''
+
+    def __init__(self, headers:dict):
+        '''
+        Parameters:
+            headers (dict): CSV header per object type
+        '''
+        super().__init__()
+        self.headers:dict = headers
+
+        return
+
+
+    def __setitem__(self, object_type:str, rows):
+        if not isinstance(rows, COLUMN_TABLE):
+            rows = COLUMN_TABLE(self.headers[object_type], rows)
+        super().__setitem__(object_type, rows)
+
+        return
+
+
+    def update(self, *args, **kwargs):
+        for object_type, rows in dict(*args, **kwargs).items():
+            self[object_type] = rows
+
+        return
+
+
+class LOCATION(NamedTuple):
+    '''
+    Flattened location_data entry
+    '''
+    region:str
+    country:str
+    location:str
+
+
+class LOCATION_INDEX:
+    '''
+    Lookup tables for location_data, built once at load time
+
+    All values are tuples so that lookups return shared, immutable
+    objects rather than building new lists on every call.
+    '''
+    __slots__ = ( 'regions', 'countries', 'locations', 'region_countries',
+                  'region_locations', 'country_region', 'country_locations',
+                  'region_country_locations' )
+
+    def __init__(self, location_data:dict):
+        '''
+        Parameters:
+            location_data (dict): region: country: [ locations ]
+        '''
+        countries:list = []
+        locations:list = []
+        self.region_countries:dict = {}
+        self.region_locations:dict = {}
+        self.country_region:dict = {}
+        self.country_locations:dict = {}
+        self.region_country_locations:dict = {}
+
+        for region, region_data in location_data.items():
+            region_data = region_data or {}
+            region_locations:list = []
+            for country, sites in region_data.items():
+                sites = tuple(sites or ())
+                countries.append(country)
+                self.country_region.setdefault(country, region)
+                self.country_locations.setdefault(country, sites)
+                self.region_country_locations[(region, country)] = sites
+                region_locations.extend(sites)
+                locations.extend(LOCATION(region, country, site) 
+                                 for site in sites)
+            self.region_countries[region] = tuple(region_data.keys())
+            self.region_locations[region] = tuple(region_locations)
+
+        self.regions:tuple = tuple(location_data.keys())
+        self.countries:tuple = tuple(countries)
+        self.locations:tuple = tuple(locations)
+
+        return
+
+
+class ZONE_INDEX:
+    '''
+    Forward and reverse zone lookup for DNS records
+
+    Reverse zones are held as sorted integer start and end addresses,
+    so the zone containing an address is found with bisect in
+    O(log n). Forward zones are held in a dict by name and found by
+    trying the suffixes of a name from the longest, so a lookup costs
+    O(labels) whatever the number of zones, and is cached per parent
+    domain as records share few domains.
+    '''
+
+    def __init__(self, forward=(), reverse=()):
+        '''
+        Parameters:
+            forward (iterable): Forward zone names
+            reverse (iterable): Disjoint reverse zone NETBLOCKs
+        '''
+        self.forward:dict = { zone.casefold().rstrip('.'): zone 
+                              for zone in forward }
+        self.reverse:list = sorted(reverse, key=lambda block: block.address)
+        self.starts:list = [ block.address for block in self.reverse ]
+        self.ends:list = [ block.broadcast for block in self.reverse ]
+        self.domains:dict = {}
+
+        return
+
+
+    def forward_zone(self, fqdn:str) -> str:
+        '''
+        Closest enclosing forward zone of fqdn
+
+        Returns:
+            zone name, empty if there is none
+        '''
+        zone = self.forward.get(fqdn)
+        if zone:
+            return zone
+
+        domain = fqdn.partition('.')[2]
+        zone = self.domains.get(domain)
+        if zone is None:
+            labels = domain.casefold().rstrip('.').split('.')
+            zone = ''
+            for index in range(len(labels)):
+                zone = self.forward.get('.'.join(labels[index:]), '')
+                if zone:
+                    break
+            self.domains[domain] = zone
+
+        return zone
+
+
+    def reverse_zone(self, address:int) -> NETBLOCK:
+        '''
+        Reverse zone containing integer address
+
+        Returns:
+            NETBLOCK or None
+        '''
+        index = bisect.bisect_right(self.starts, address) - 1
+        if index >= 0 and address <= self.ends[index]:
+            return self.reverse[index]
+
+        return None
+
+
+class METADATA:
+
+    def __init__(self,
+                 cfg:str = 'metadata.yaml',
+                 cache:bool = False,
+                 cache_dir:str = CACHE_DIR):
+        '''
+        Parameters:
+            cfg (str): Metadata YAML file
+            cache (bool): Use the compiled metadata cache
+            cache_dir (str): Directory for compiled metadata
+        '''
+        try:
+            with open(cfg, 'rb') as f:
+                content = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            logging.error(f'Metadata file {cfg} not found')
+            raise
+
+        self.metadata_path:str = os.path.abspath(cfg)
+        key = { 'version': CACHE_VERSION,
+                'path': self.metadata_path,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'sha256': hashlib.sha256(content).hexdigest() }
+        cache_file = ''
+        compiled = None
+        if cache:
+            cache_file = self.cache_file(key['path'], cache_dir)
+            compiled = self.read_cache(cache_file, key)
+
+        if compiled:
+            self.metadata, self.config, self.index = compiled
+        else:
+            data = yaml.load(content, Loader=YAML_LOADER)
+            self.metadata = data.get('metadata')
+            self.config = data.get('config')
+            self.index = LOCATION_INDEX(self.metadata['location_data'])
+            if cache:
+                self.write_cache(cache_file, key)
+
+        self.base_network = self.get_base_network()
+        self.def_headers()
+
+        return
+
+
+    def cache_file(self, path:str, cache_dir:str) -> str:
+        '''
+        Compiled metadata file name for path
+        '''
+        name = hashlib.sha256(path.encode('utf-8')).hexdigest()[:32]
+
+        return os.path.join(cache_dir, f'{name}.pickle')
+
+
+    def read_cache(self, cache_file:str, key:dict):
+        '''
+        Load compiled metadata if it matches key
+
+        Parameters:
+            cache_file (str): Compiled metadata file
+            key (dict): Path, size, mtime and content hash of the YAML
+
+        Returns:
+            (metadata, config, index) tuple or None
+        '''
+        compiled = None
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('key') == key:
+                compiled = ( cached['metadata'], 
+                             cached['config'], 
+                             cached['index'] )
+                logging.debug(f'Using compiled metadata {cache_file}')
+            else:
+                logging.debug(f'Compiled metadata {cache_file} is out of date')
+        except FileNotFoundError:
+            logging.debug(f'No compiled metadata for {key["path"]}')
+        except (AttributeError, ImportError):
+            # Saved from a different entry point e.g. __main__
+            logging.debug(f'Compiled metadata {cache_file} is not compatible')
+        except Exception as err:
+            logging.warning(f'Unable to read compiled metadata {cache_file}: {err}')
+
+        return compiled
+
+
+    def write_cache(self, cache_file:str, key:dict):
+        '''
+        Save compiled metadata, replacing any previous version
+        '''
+        cached = { 'key': key,
+                   'metadata': self.metadata,
+                   'config': self.config,
+                   'index': self.index }
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+            with open(fd, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, cache_file)
+            logging.debug(f'Saved compiled metadata {cache_file}')
+        except OSError as err:
+            logging.warning(f'Unable to save compiled metadata {cache_file}: {err}')
+
+        return
+    
+
+    def def_headers(self):
+        '''
+        Define the CSV headers, using the IPv6 object types when the
+        base network is IPv6
+        '''
+        try:
+            version = ipaddress.ip_network(self.base_network, strict=False).version
+        except (TypeError, ValueError):
+            version = 4
+
+        if version == 6:
+            self.container_header = ( 'header-ipv6networkcontainer,address*,cidr*,'
+                'network_view,EA-Region,EAInherited-Region,EA-Country'
+                ',EAInherited-Country,EA-Location,EAInherited-Location'
+                ',EA-Department,EA-Billing,EA-SecurityZone,EA-VLAN' )
+
+            self.net_header = ( 'header-ipv6network,address*,cidr*,disabled,'
+                'auto_create_reversezone,enable_discovery,'
+                'EA-Region,EAInherited-Region,EA-Country,EAInherited-Country,'
+                'EA-Location,EAInherited-Location,EA-Department,EA-Billing')
+
+            self.dhcp_range_header = 'header-ipv6dhcprange,start_address,end_address'
+            self.fixed_header = ( 'header-ipv6fixedaddress,address*,duid*,'
+                                  'network_view,name,EA-DeviceType' )
+            self.host_header = ( 'header-hostrecord,ipv6_addresses,configure_for_dns,'
+                                 'fqdn,EA-DeviceType' )
+            self.a_header = 'header-AaaaRecord,fqdn*,view,address*,EA-DeviceType'
+        else:
+            self.container_header = ( 'header-networkcontainer,address*,netmask*,'
+                'network_view,EA-Region,EAInherited-Region,EA-Country'
+                ',EAInherited-Country,EA-Location,EAInherited-Location'
+                ',EA-Department,EA-Billing,EA-SecurityZone,EA-VLAN' )
+
+            self.net_header = ( 'header-network,address*,netmask*,routers,disabled,'
+                'auto_create_reversezone,enable_discovery,'
+                'EA-Region,EAInherited-Region,EA-Country,EAInherited-Country,'
+                'EA-Location,EAInherited-Location,EA-Department,EA-Billing')
+
+            self.dhcp_range_header = 'header-DhcpRange,start_address,end_address'
+            self.fixed_header = ( 'header-fixedaddress,ip_address*,mac_address*,'
+                                  'network_view,name,EA-DeviceType' )
+            self.host_header = 'header-hostrecord,addresses,configure_for_dns,fqdn,EA-DeviceType'
+            self.a_header = 'header-ARecord,fqdn*,view,address*,EA-DeviceType'
+
+        self.nsg_header = ( 'header-nsgroup,group_name,grid_primaries,grid_secondaries,'
+                            'is_grid_default' )
+        self.zone_header = 'header-authzone,fqdn,zone_format,view,ns_group,soa_email'
+        self.cname_header = 'header-CnameRecord,fqdn,view,canonical_name,comment,EA-DeviceType'
+        self.ptr_header = 'header-PtrRecord,dname*,fqdn*,view,EA-DeviceType'
+        self.headers = { 'containers': self.container_header,
+                         'networks': self.net_header,
+                         'dhcp_ranges': self.dhcp_range_header,
+                         'fixed_addresses': self.fixed_header,
+                         'nsg': self.nsg_header,
+                         'auth_zones': self.zone_header,
+                         'hosts': self.host_header,
+                         'cnames': self.cname_header,
+                         'a_records': self.a_header,
+                         'ptr_records': self.ptr_header }
+        self.schemas = { object_type: ROW_SCHEMA(header) 
+                         for object_type, header in self.headers.items() }
+
+        return
+
+    
+    def names(self):
+        '''
+        '''
+        return self.metadata.get('names')
+
+
+    def regions(self) -> tuple:
+        '''
+        '''
+        return self.index.regions
+    
+
+    def countries(self, region:str = '') -> tuple:
+        '''
+        '''
+        if region:
+            return self.index.region_countries[region]
+        
+        return self.index.countries
+    
+
+    def get_region(self, country:str) -> str:
+        '''
+        '''
+        return self.index.country_region.get(country, '')
+
+
+    def locations(self, region:str = '', country:str = '') -> tuple:
+        '''
+        '''
+        if region and country:
+            return self.index.region_country_locations[(region, country)]
+        elif region:
+            return self.index.region_locations[region]
+        elif country:
+            return self.index.country_locations[country]
+
+        return ()
+
+
+    def location_table(self) -> tuple:
+        '''
+        Flattened tuple of LOCATION(region, country, location) entries
+        '''
+        return self.index.locations
+
+
+    def departments(self):
+        '''
+        '''
+        return self.metadata.get('departments')
+
+
+    def device_types(self):
+        '''
+        '''
+        return self.metadata.get('device_types')
+
+
+    def org_compartments(self):
+        '''
+        '''
+        return self.metadata.get('org_compartments')
+
+
+    def dns_view(self):
+        '''
+        '''
+        return self.config.get('dns_view')
+
+
+    def network_view(self):
+        '''
+        '''
+        return self.config.get('network_view')
+
+
+    def get_base_network(self):
+        '''
+        '''
+        return self.config.get('base_network')
+
+
+    def name_server_group(self):
+        '''
+        '''
+        return self.config.get('nsg')
+
+
+    def auth_zones(self):
+        '''
+        '''
+        return self.config.get('auth_zones')
+
+
+    def sub_domains(self):
+        '''
+        '''
+        return self.config.get('sub_domains')
+
+
+    def cloud_providers(self):
+        '''
+        '''
+        return (self.config.get('cloud_providers') or {}).keys()
+
+
+    def cloud_zones(self, cloud:str=''):
+        '''
+        '''
+        zones:list = []
+        cloud = cloud.casefold()
+
+        if cloud:
+            if cloud in self.cloud_providers():
+                zones = self.config['cloud_providers'][cloud].get('zones')
+            else:
+                logging.error(f'Cloud vendor {cloud} not found')
+        else:
+            if self.cloud_providers():
+                for c in self.cloud_providers():
+                    zones.extend(self.config['cloud_providers'][c].get('zones'))
+            else:
+                logging.error('No cloud_providers found')
+        
+        return zones
+            
+
+
+
+class DEMODATA(METADATA):
+
+    def __init__(self, 
+                 metadata:str = 'metadata.yaml',
+                 cache:bool = False,
+                 cache_dir:str = CACHE_DIR,
+                 postfix:str = 'demo',
+                 include_countries:bool = False,
+                 include_locations:bool = False,
+                 include_networks:bool = False,
+                 include_dhcp:bool = False,
+                 include_hosts:bool = False,
+                 include_records:bool = False,
+                 streaming:bool = False,
+                 scale:int = 1,
+                 dept_scale:int = 1,
+                 workers:int = 1,
+                 hosts_per_network:int = 0,
+                 fixed_per_network:int = 0,
+                 cname_fraction:float = 0.0,
+                 seed:int = None,
+                 incremental:bool = False,
+                 profile:bool = False,
+                 cprofile:bool = False,
+                 columnar:bool = False,
+                 compression:str = '',
+                 shards:int = 0,
+                 shard_rows:int = 0):
+        '''
+        '''
+        # Used by def_templates() during METADATA initialisation
+        self.include_hosts:bool = include_hosts
+        self.include_records:bool = include_records
+        self.columnar:bool = columnar
+        self.streaming:bool = streaming
+        super().__init__(metadata, cache=cache, cache_dir=cache_dir)
+        self.cache_dir:str = cache_dir
+        self.postfix = postfix
+        self.compression:str = compression
+        self.shards:int = max(shards, 0)
+        self.shard_rows:int = max(shard_rows, 0)
+        if columnar:
+            self.csv_sets:dict = COLUMN_STORE(self.headers)
+        else:
+            self.csv_sets:dict = {}
+        self.include_countries:bool = include_countries
+        self.include_locations:bool = include_locations
+        self.include_networks:bool = include_networks
+        self.include_dhcp:bool = include_dhcp
+        self.scale:int = scale
+        self.dept_scale:int = dept_scale
+        self.workers:int = workers
+        self.hosts_per_network:int = hosts_per_network
+        self.fixed_per_network:int = max(fixed_per_network, 0)
+        self.seed = seed
+        self.incremental:bool = incremental
+        self.profile:bool = profile
+        self.plan:dict = None
+        self.allocated:list = []
+        self.forward_zones:list = []
+        self.reverse_zones:list = []
+        self.cprofile:bool = cprofile
+        self.stage_hooks:list = []
+        self.stage_stats:list = []
+        self.host_seconds:float = 0.0
+        self.dhcp_seconds:float = 0.0
+        self.fixed_short:set = set()
+        self.rows_written:int = 0
+
+        # Domains for host records, <sub_domain>.<auth_zone>
+        sub_domains = self.sub_domains() or []
+        self.host_domains:tuple = tuple( f'{sub}.{zone}' if sub else zone
+                                         for zone in (self.auth_zones() or [])
+                                         for sub in (sub_domains or [ '' ]) )
+
+        # CNAME alias zones per host domain, excluding the domain itself
+        self.cname_fraction:float = min(max(cname_fraction, 0.0), 1.0)
+        alias_zones:list = list(self.auth_zones() or [])
+        if self.cname_fraction and self.cloud_providers():
+            alias_zones.extend(z for z in self.cloud_zones() 
+                               if z not in alias_zones)
+        self.alias_zones:dict = { domain: tuple(z for z in alias_zones 
+                                                if z != domain)
+                                  for domain in self.host_domains }
+        if self.cname_fraction and not self.include_hosts:
+            logging.warning('CNAMEs are only generated with include_hosts=True')
+        if self.include_records and not self.include_hosts:
+            logging.warning('A and PTR records are only generated with include_hosts=True')
+        if self.fixed_per_network and not self.include_dhcp:
+            logging.warning('Fixed addresses are only generated with include_dhcp=True')
+
+        if self.scale < 1:
+            logging.warning(f'Invalid scale {scale}, using 1')
+            self.scale = 1
+        if self.dept_scale < 1:
+            logging.warning(f'Invalid department scale {dept_scale}, using 1')
+            self.dept_scale = 1
+
+        return
+    
+
+    def def_headers(self):
+        '''
+        Define the CSV headers and compile the row templates for them
+        '''
+        super().def_headers()
+        self.def_templates()
+
+        return
+
+
+    def def_templates(self):
+        '''
+        Compile the row templates used to generate each object type
+
+        Templates are built from the header schemas, so a generator can
+        only produce rows with the column layout of its header.
+        '''
+        containers = self.schemas['containers']
+        networks = self.schemas['networks']
+        hosts = self.schemas['hosts']
+        fixed = self.schemas['fixed_addresses']
+        # Second column is netmask for IPv4 and cidr for IPv6
+        container_prefix = containers.columns[1]
+        network_prefix = networks.columns[1]
+        host_address = hosts.columns[0]
+        # Columnar tables take the field values without CSV encoding
+        typed = self.columnar and not self.streaming
+
+        container:dict = { 'address': '{address}',
+                           container_prefix: '{prefixlen}',
+                           'network_view': 'default',
+                           'EA-Billing': 'No' }
+        network:dict = { 'address': '{address}',
+                         network_prefix: '{netmask}',
+                         'disabled': 'FALSE',
+                         'auto_create_reversezone': '{reverse}',
+                         'enable_discovery': 'FALSE',
+                         'EAInherited-Region': 'INHERIT',
+                         'EAInherited-Country': 'INHERIT',
+                         'EAInherited-Location': 'INHERIT',
+                         'EA-Department': '{department}' }
+        if 'routers' in networks.columns:
+            network['routers'] = '{gateway}'
+        # With A and PTR records the hosts are IPAM only, so each name
+        # and address is only created once in DNS
+        records = self.include_records and self.include_hosts
+        host:dict = { 'configure_for_dns': 'FALSE' if records else 'TRUE',
+                      'EA-DeviceType': '{device}' }
+
+        self.templates = {
+            'base_container': containers.template(container, typed=typed),
+            'region_container': containers.template(
+                                    { **container,
+                                      'EA-Region': '{region}',
+                                      'EAInherited-Region': 'OVERRIDE' },
+                                    typed=typed),
+            'country_container': containers.template(
+                                    { **container,
+                                      'EAInherited-Region': 'INHERIT',
+                                      'EA-Country': '{country}',
+                                      'EAInherited-Country': 'OVERRIDE' },
+                                    typed=typed),
+            'location_container': containers.template(
+                                    { **container,
+                                      'EAInherited-Region': 'INHERIT',
+                                      'EAInherited-Country': 'INHERIT',
+                                      'EA-Location': '{location}',
+                                      'EAInherited-Location': 'OVERRIDE' },
+                                    typed=typed),
+            'network': networks.template(network, typed=typed),
+            'dhcp_range': self.schemas['dhcp_ranges'].template(
+                                    { 'start_address': '{start}',
+                                      'end_address': '{end}' },
+                                    fields=('start', 'end'),
+                                    typed=typed),
+            'fixed_address': self.schemas['fixed_addresses'].template(
+                                    { fixed.columns[0]: '{ip}',
+                                      # MAC address or DUID
+                                      fixed.columns[1]: '{client}',
+                                      'network_view': 'default',
+                                      'name': '{name}',
+                                      'EA-DeviceType': '{device}' },
+                                    fields=('ip', 'client', 'name', 'device'),
+                                    typed=typed),
+            'nsg': self.schemas['nsg'].template(
+                                    { 'group_name': '{nsg}',
+                                      'is_grid_default': 'TRUE' },
+                                    typed=typed),
+            'zone': self.schemas['auth_zones'].template(
+                                    { 'fqdn': '{fqdn}',
+                                      'zone_format': '{format}',
+                                      'view': '{view}',
+                                      'ns_group': '{nsg}',
+                                      'soa_email': 'demo@infoblox.com' },
+                                    fields=('fqdn',),
+                                    typed=typed),
+            # Only the last IPv4 octet or IPv6 group varies per host
+            'host_octet': hosts.template(
+                                    { **host,
+                                      host_address: '{prefix}{octet}',
+                                      'fqdn': '{name}{octet}.{domain}' },
+                                    fields=('octet', 'device'),
+                                    typed=typed),
+            'host_group': hosts.template(
+                                    { **host,
+                                      host_address: '{prefix}{group:04x}',
+                                      'fqdn': '{name}{group:04x}.{domain}' },
+                                    fields=('group', 'device'),
+                                    typed=typed),
+            'host': hosts.template(
+                                    { **host,
+                                      host_address: '{ip}',
+                                      'fqdn': '{name}.{domain}' },
+                                    fields=('ip', 'name', 'device'),
+                                    typed=typed),
+            'cname': self.schemas['cnames'].template(
+                                    { 'fqdn': '{name}.{zone}',
+                                      'view': '{view}',
+                                      'canonical_name': '{name}.{domain}',
+                                      'EA-DeviceType': '{device}' },
+                                    fields=('name', 'zone', 'device'),
+                                    typed=typed),
+            'a_record': self.schemas['a_records'].template(
+                                    { 'fqdn': '{fqdn}',
+                                      'view': '{view}',
+                                      'address': '{address}',
+                                      'EA-DeviceType': '{device}' },
+                                    fields=('fqdn', 'address', 'device'),
+                                    typed=typed),
+            'ptr_record': self.schemas['ptr_records'].template(
+                                    { 'dname': '{dname}',
+                                      'fqdn': '{fqdn}',
+                                      'view': '{view}',
+                                      'EA-DeviceType': '{device}' },
+                                    fields=('dname', 'fqdn', 'device'),
+                                    typed=typed),
+        }
+
+        return
+
+
+    def open_csv(self, filename:str = 'data.csv') -> object:
+        '''
+        Attempt to open output file
+
+        Parameters:
+            filename (str): Name of file to open.
+
+        Returns:
+            file handler object.
+
+        '''
+        if os.path.isfile(filename):
+            backup = filename+".bak"
+            try:
+                shutil.move(filename, backup)
+                logging.info("Outfile exists moved to {backup}")
+                try:
+                    handler = open(filename, mode='w')
+                    logging.info(f"Successfully opened output file {filename}.")
+                except IOError as err:
+                    logging.error(f"{err}")
+                    handler = False
+            except IOError:
+                logging.warning(f"Could not backup existing file {filename}.")
+                handler = False
+        else:
+            try:
+                handler = open(filename, mode='w')
+                logging.info(f"Successfully opened output file {filename}.")
+            except IOError as err:
+                logging.error(f"{err}")
+                handler = False
+
+        return handler
+    
+    
+    def output_csv(self,
+                   object_type:str = 'all',
+                   to_file:bool = False,
+                   rows = None):
+        '''
+        Output CSV for object type(s)
+
+        Parameters:
+            object_type (str): Object type to output, or 'all'
+            to_file (bool): Output each object type to its own file
+            rows (iterable): (object_type, row) tuples to stream instead
+                             of outputting csv_sets
+
+        Returns:
+            list of dicts with the file, rows and bytes written per file
+        '''
+        stats:list = []
+        self.rows_written = 0
+
+        if rows is not None:
+            return self.stream_csv(rows=rows, 
+                                   object_type=object_type, 
+                                   to_file=to_file)
+
+        if object_type == 'all':
+            objects = self.dependency_order(self.csv_sets)
+        elif object_type in self.csv_sets.keys():
+            objects = [ object_type ]
+        else:
+            logging.error(f'No data generated for object type: {object_type}')
+            objects = []
+
+        if to_file and objects and ( self.shards or self.shard_rows ):
+            stats = self.write_shards(object_type=object_type)
+            self.rows_written = sum(stat['rows'] for stat in stats)
+            self.report_stats(stats)
+        elif to_file and objects:
+            # Write each file on its own thread
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(objects)) as pool:
+                futures = [ pool.submit(self.write_csv, object) 
+                            for object in objects ]
+                for future in futures:
+                    stats.append(future.result())
+                    self.rows_written += stats[-1]['rows']
+            self.report_stats(stats)
+        else:
+            for object in objects:
+                self.rows_written += len(self.csv_sets[object])
+                # Output header for object
+                header = self.headers.get(object)
+                sys.stdout.write(header + '\n')
+                # Ouput lines in batches
+                lines = self.csv_sets[object]
+                for i in range(0, len(lines), 10000):
+                    sys.stdout.write('\n'.join(lines[i:i + 10000]) + '\n')
+        
+        return stats
+
+
+    @staticmethod
+    def dependency_order(objects) -> list:
+        '''
+        Object types in the order they must be created
+
+        Parameters:
+            objects (iterable): Object types
+
+        Returns:
+            list of object types in WAPI_OBJECTS order
+        '''
+        return [ object for object in WAPI_OBJECTS.keys() if object in objects ]
+
+
+    def write_csv(self, object_type:str) -> dict:
+        '''
+        Write csv_sets for object type to <object_type>_<postfix>.csv
+
+        Parameters:
+            object_type (str): Object type
+
+        Returns:
+            dict of file, rows and bytes written
+        '''
+        writer = CSV_WRITER(filename=self.csv_filename(object_type),
+                            header=self.headers.get(object_type),
+                            compression=self.compression)
+        try:
+            writer.write_rows(self.csv_sets[object_type])
+        except Exception:
+            writer.abort()
+            raise
+
+        return writer.close()
+
+
+    def csv_filename(self, object_type:str, shard:int = 0) -> str:
+        '''
+        Output file name for object type, with the shard number and
+        compression suffix
+        '''
+        if shard:
+            return ( f'{object_type}_{self.postfix}_{shard:03d}.csv'
+                     f'{COMPRESSION[self.compression]}' )
+
+        return f'{object_type}_{self.postfix}.csv{COMPRESSION[self.compression]}'
+
+
+    def write_shards(self, object_type:str = 'all') -> list:
+        '''
+        Write csv_sets as shards for parallel CSV imports
+
+        Each phase from object_phases() is split in to shards of at
+        most shard_rows rows, or at least shards files, and the shards
+        are listed phase by phase in manifest_<postfix>.json. Shards of
+        one phase can be imported in parallel once all shards of the
+        previous phases are imported. When a single object type is
+        output, its shards replace those of the same type in an existing
+        manifest and the other types are kept. Shard files of earlier
+        runs for the output object types are removed.
+
+        Parameters:
+            object_type (str): Object type to output, or 'all'
+
+        Returns:
+            list of dicts with the file, rows and bytes written per shard
+        '''
+        jobs:list = []
+        shard_counts:dict = collections.Counter()
+        for phase, ( object, rows ) in enumerate(self.object_phases(object_type)):
+            count = max(self.shards, 1)
+            if self.shard_rows:
+                count = max(count, -(-len(rows) // self.shard_rows))
+            count = min(count, len(rows))
+            size = -(-len(rows) // count)
+            for offset in range(0, len(rows), size):
+                shard_counts[object] += 1
+                jobs.append(( phase, object, 
+                              self.csv_filename(object, shard_counts[object]),
+                              rows[offset:offset + size] ))
+
+        stats:list = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            futures = [ pool.submit(self.write_shard, filename, object, rows)
+                        for _, object, filename, rows in jobs ]
+            for future in futures:
+                stats.append(future.result())
+
+        phases:list = []
+        for ( phase, object, _, _ ), stat in zip(jobs, stats):
+            if len(phases) <= phase:
+                phases.append([])
+            phases[phase].append({ 'object_type': object, **stat })
+
+        if object_type == 'all':
+            object_types = set(WAPI_OBJECTS)
+        else:
+            object_types = { object_type }
+        manifest = f'manifest_{self.postfix}.json'
+        self.remove_shards(object_types=object_types,
+                           keep={ filename for _, _, filename, _ in jobs })
+        if object_type != 'all':
+            phases = self.merge_manifest(manifest, phases, object_types)
+        self.write_manifest(filename=manifest, phases=phases)
+
+        return stats
+
+
+    def merge_manifest(self, filename:str, phases:list, object_types:set) -> list:
+        '''
+        Merge phases in to the phases of an existing manifest
+
+        Phases of object_types in the manifest are replaced by phases,
+        phases of other object types are kept. Each phase holds a single
+        object type, so they are merged in WAPI_OBJECTS order.
+
+        Returns:
+            list per phase of shard stat dicts
+        '''
+        try:
+            with open(filename) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return phases
+        except (OSError, ValueError) as err:
+            logging.warning(f'Unable to read manifest {filename}: {err}')
+            return phases
+        if manifest.get('base_network') != self.base_network:
+            logging.warning(f'Manifest {filename} is for '
+                            f"{manifest.get('base_network')}, replacing it")
+            return phases
+
+        merged:list = []
+        for object in WAPI_OBJECTS:
+            if object in object_types:
+                source = phases
+            else:
+                source = manifest.get('phases', [])
+            merged.extend( phase for phase in source 
+                           if phase and phase[0]['object_type'] == object )
+
+        return merged
+
+
+    def remove_shards(self, object_types:set, keep:set):
+        '''
+        Remove shard files of object_types for this postfix that are not
+        in keep, so a rerun with fewer shards leaves only the shards of
+        its manifest
+
+        Parameters:
+            object_types (set): Object types output by this run
+            keep (set): Shard file names written by this run
+        '''
+        pattern = re.compile(f"({'|'.join(map(re.escape, object_types))})"
+                             f'_{re.escape(self.postfix)}_[0-9]{{3,}}'
+                             r'\.csv(\.gz|\.zst)?')
+        for filename in os.listdir('.'):
+            if filename in keep or not pattern.fullmatch(filename):
+                continue
+            try:
+                os.remove(filename)
+                logging.info(f'Removed shard {filename}')
+            except OSError as err:
+                logging.warning(f'Unable to remove shard {filename}: {err}')
+
+        return
+
+
+    def write_shard(self, filename:str, object_type:str, rows) -> dict:
+        '''
+        Write rows of object type to filename with the object's header
+
+        Returns:
+            dict of file, rows and bytes written
+        '''
+        writer = CSV_WRITER(filename=filename,
+                            header=self.headers.get(object_type),
+                            compression=self.compression)
+        try:
+            writer.write_rows(rows)
+        except Exception:
+            writer.abort()
+            raise
+
+        return writer.close()
+
+
+    def write_manifest(self, filename:str, phases:list):
+        '''
+        Write the shard manifest as JSON
+
+        Parameters:
+            filename (str): Manifest file name
+            phases (list): List per phase of shard stat dicts
+        '''
+        manifest = { 'version': __version__,
+                     'base_network': self.base_network,
+                     'phases': phases }
+        try:
+            with open(filename, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            logging.info(f'Saved shard manifest to {filename}')
+        except OSError as err:
+            logging.error(f'Unable to save manifest {filename}: {err}')
+
+        return
+
+
+    def report_stats(self, stats:list):
+        '''
+        Log rows and bytes written per file
+        '''
+        for stat in stats:
+            if 'compressed' in stat:
+                logging.info(f"Wrote {stat['rows']} rows, {stat['bytes']} bytes "
+                             f"({stat['compressed']} compressed) to {stat['file']}")
+            else:
+                logging.info(f"Wrote {stat['rows']} rows, {stat['bytes']} bytes "
+                             f"to {stat['file']}")
+
+        return
+
+
+    def stream_csv(self,
+                   rows,
+                   object_type:str = 'all',
+                   to_file:bool = False):
+        '''
+        Write rows to a sink per object type as they are generated
+
+        Each object type has its own CSV_WRITER, with batches written on a
+        thread pool. When outputting to stdout each object type is
+        spooled to a temporary file so that sections are output one
+        after another in dependency order, as without streaming.
+
+        Parameters:
+            rows (iterable): (object_type, row) tuples
+            object_type (str): Object type to output, or 'all'
+            to_file (bool): Output each object type to its own file
+
+        Returns:
+            list of dicts with the file, rows and bytes written per file
+        '''
+        sinks:dict = {}
+        stats:list = []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.headers)) as pool:
+            try:
+                for object, line in rows:
+                    if object_type != 'all' and object != object_type:
+                        continue
+                    output = sinks.get(object)
+                    if output is None:
+                        if to_file:
+                            output = CSV_WRITER(filename=self.csv_filename(object),
+                                                header=self.headers.get(object),
+                                                executor=pool,
+                                                compression=self.compression)
+                        else:
+                            output = CSV_WRITER(fileobj=tempfile.TemporaryFile(),
+                                                executor=pool)
+                        sinks[object] = output
+                    output.write(line)
+            except Exception:
+                for output in sinks.values():
+                    output.abort()
+                raise
+
+            if object_type != 'all' and not sinks:
+                logging.error(f'No data generated for object type: {object_type}')
+
+            for object in self.dependency_order(sinks):
+                output = sinks[object]
+                stat = output.close()
+                self.rows_written += stat['rows']
+                if to_file:
+                    stats.append(stat)
+                else:
+                    sys.stdout.write(self.headers.get(object) + '\n')
+                    output.output.seek(0)
+                    shutil.copyfileobj(io.TextIOWrapper(output.output, 
+                                                        encoding='utf-8'), 
+                                       sys.stdout)
+
+        if to_file:
+            self.report_stats(stats)
+        
+        return stats
+
+
+    def wapi_item(self, object_type:str, row:str) -> dict:
+        '''
+        Convert a CSV row to a /request item creating the object
+
+        Parameters:
+            object_type (str): Object type of row
+            row (str): CSV row
+
+        Returns:
+            /request item dict
+        '''
+        names = self.schemas[object_type].columns
+        fields = dict(zip(names, next(csv.reader([ row ]))[1:]))
+        flags = { name: value == 'TRUE' for name, value in fields.items()
+                  if value in [ 'TRUE', 'FALSE' ] }
+
+        if object_type in [ 'containers', 'networks' ]:
+            network = ipaddress.ip_network(
+                        f"{fields['address']}/"
+                        f"{fields.get('netmask') or fields.get('cidr')}",
+                        strict=False)
+            data = { 'network': network.with_prefixlen }
+            if fields.get('network_view'):
+                data['network_view'] = fields['network_view']
+            if fields.get('routers'):
+                data['options'] = [ { 'name': 'routers', 
+                                      'value': fields['routers'] } ]
+            if 'disabled' in flags:
+                data['disable'] = flags['disabled']
+            if 'auto_create_reversezone' in flags:
+                data['auto_create_reversezone'] = flags['auto_create_reversezone']
+            if flags.get('enable_discovery'):
+                data['enable_discovery'] = True
+        elif object_type == 'dhcp_ranges':
+            data = { 'start_addr': fields['start_address'],
+                     'end_addr': fields['end_address'] }
+        elif object_type == 'fixed_addresses':
+            if fields.get('ip_address'):
+                data = { 'ipv4addr': fields['ip_address'],
+                         'mac': fields['mac_address'] }
+            else:
+                data = { 'ipv6addr': fields['address'],
+                         'duid': fields['duid'] }
+            for name in [ 'network_view', 'name' ]:
+                if fields.get(name):
+                    data[name] = fields[name]
+        elif object_type == 'nsg':
+            data = { 'name': fields['group_name'],
+                     'is_grid_default': flags.get('is_grid_default', False) }
+        elif object_type == 'auth_zones':
+            data = { name: fields[name] 
+                     for name in [ 'fqdn', 'zone_format', 'view', 
+                                   'ns_group', 'soa_email' ]
+                     if fields.get(name) }
+            data['zone_format'] = data.get('zone_format', 'FORWARD').upper()
+        elif object_type == 'hosts':
+            data = { 'name': fields['fqdn'],
+                     'configure_for_dns': flags.get('configure_for_dns', True) }
+            if fields.get('addresses'):
+                data['ipv4addrs'] = [ { 'ipv4addr': address } for address 
+                                      in fields['addresses'].split(',') ]
+            if fields.get('ipv6_addresses'):
+                data['ipv6addrs'] = [ { 'ipv6addr': address } for address 
+                                      in fields['ipv6_addresses'].split(',') ]
+        elif object_type == 'a_records':
+            address_field = 'ipv6addr' if ':' in fields['address'] else 'ipv4addr'
+            data = { 'name': fields['fqdn'],
+                     address_field: fields['address'] }
+            if fields.get('view'):
+                data['view'] = fields['view']
+        elif object_type == 'ptr_records':
+            data = { 'ptrdname': fields['dname'],
+                     'name': fields['fqdn'] }
+            if fields.get('view'):
+                data['view'] = fields['view']
+        elif object_type == 'cnames':
+            data = { 'name': fields['fqdn'],
+                     'canonical': fields['canonical_name'] }
+            for name in [ 'view', 'comment' ]:
+                if fields.get(name):
+                    data[name] = fields[name]
+
+        extattrs = { name[3:]: { 'value': value } 
+                     for name, value in fields.items()
+                     if name.startswith('EA-') and value }
+        if extattrs:
+            data['extattrs'] = extattrs
+
+        wapi_object = WAPI_OBJECTS[object_type]
+        if row.startswith('ipv6'):
+            wapi_object = 'ipv6' + wapi_object
+        elif row.startswith('AaaaRecord'):
+            wapi_object = 'record:aaaa'
+
+        return { 'method': 'POST',
+                 'object': wapi_object,
+                 'data': data }
+
+
+    def object_phases(self, object_type:str='all') -> list:
+        '''
+        Generated rows grouped in the order they must be created
+
+        Containers are split by prefix length so that a container is
+        never created in parallel with its parent. Used for WAPI pushes
+        and sharded CSV output.
+
+        Returns:
+            list of (object_type, rows) tuples
+        '''
+        phases:list = []
+        for object in WAPI_OBJECTS.keys():
+            if object_type not in [ 'all', object ]:
+                continue
+            rows = self.csv_sets.get(object, [])
+            if object == 'containers':
+                levels = collections.defaultdict(list)
+                for row in rows:
+                    levels[int(row.split(',')[2])].append(row)
+                for prefixlen in sorted(levels.keys()):
+                    phases.append((object, levels[prefixlen]))
+            elif rows:
+                phases.append((object, rows))
+
+        return phases
+
+
+    def read_checkpoint(self, checkpoint:str, fingerprint:str) -> int:
+        '''
+        Number of objects already loaded for this data set
+
+        Returns:
+            Objects to skip, 0 if there is no matching checkpoint
+        '''
+        try:
+            with open(checkpoint) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as err:
+            logging.warning(f'Ignoring checkpoint {checkpoint}: {err}')
+            return 0
+
+        if saved.get('fingerprint') != fingerprint:
+            logging.warning(f'Checkpoint {checkpoint} is for a different '
+                            'data set, starting from the beginning')
+            return 0
+
+        return saved.get('done', 0)
+
+
+    def write_checkpoint(self, checkpoint:str, fingerprint:str, done:int):
+        '''
+        Save the number of objects loaded, replacing any previous version
+        '''
+        try:
+            fd, tmpname = tempfile.mkstemp(
+                            dir=os.path.dirname(os.path.abspath(checkpoint)))
+            with open(fd, 'w') as f:
+                json.dump({ 'fingerprint': fingerprint, 'done': done }, f)
+            os.replace(tmpname, checkpoint)
+        except OSError as err:
+            logging.warning(f'Unable to save checkpoint {checkpoint}: {err}')
+
+        return
+
+
+    def push_wapi(self, client, object_type:str='all', 
+                  chunk_size:int=1000, checkpoint:str='') -> dict:
+        '''
+        Create the generated objects directly via WAPI
+
+        Objects are sent in dependency order as chunked /request calls
+        with up to client.concurrency calls in flight. Progress is
+        saved to the checkpoint file after each window of calls, so a
+        load that stops on a connection error or 5xx restarts from the
+        first object not known to be loaded. Objects that already exist
+        are counted as loaded.
+
+        Parameters:
+            client (wapi.WAPI_CLIENT): WAPI client
+            object_type (str): Object type to push, or 'all'
+            chunk_size (int): Objects per /request call
+            checkpoint (str): Checkpoint file, 
+                              default wapi_checkpoint_<postfix>.json
+
+        Returns:
+            dict of loaded, existing, failed and remaining object counts
+        '''
+        if not checkpoint:
+            checkpoint = f'wapi_checkpoint_{self.postfix}.json'
+        phases = self.object_phases(object_type)
+        digest = hashlib.sha256()
+        for object, rows in phases:
+            digest.update(object.encode())
+            for row in rows:
+                digest.update(row.encode())
+        fingerprint = digest.hexdigest()
+        total = sum(len(rows) for _, rows in phases)
+
+        done = self.read_checkpoint(checkpoint, fingerprint)
+        if done:
+            logging.info(f'Resuming from checkpoint, {done} of {total} '
+                         'objects already loaded')
+        counts = { 'loaded': 0, 'existing': 0, 'failed': 0, 'remaining': 0 }
+        window = max(1, chunk_size) * client.concurrency
+        position = 0
+        error = None
+
+        for object, rows in phases:
+            start = min(len(rows), max(0, done - position))
+            for offset in range(start, len(rows), window):
+                batch = rows[offset:offset + window]
+                results = client.run_batches(
+                            [ [ self.wapi_item(object, row) ] for row in batch ],
+                            chunk_size=chunk_size)
+                for index, (ok, result) in enumerate(results):
+                    if ok:
+                        counts['loaded'] += 1
+                    elif isinstance(result, Exception):
+                        error = result
+                        done = position + offset + index
+                        break
+                    elif 'IBDataConflictError' in str(result):
+                        counts['existing'] += 1
+                    else:
+                        counts['failed'] += 1
+                        logging.error(f'Failed to create {object}: '
+                                      f'{batch[index]}: {result}')
+                if error:
+                    break
+                done = position + offset + len(batch)
+                self.write_checkpoint(checkpoint, fingerprint, done)
+                logging.debug(f'Loaded {done} of {total} objects')
+            if error:
+                break
+            position += len(rows)
+
+        if error:
+            self.write_checkpoint(checkpoint, fingerprint, done)
+            counts['remaining'] = total - done
+            logging.error(f'WAPI load stopped at object {done} of {total}: '
+                          f'{error}')
+            logging.error(f'Rerun to resume from checkpoint {checkpoint}')
+        else:
+            try:
+                os.remove(checkpoint)
+            except FileNotFoundError:
+                pass
+            logging.info(f"Loaded {counts['loaded']} objects, "
+                         f"{counts['existing']} already existed, "
+                         f"{counts['failed']} failed")
+
+        return counts
+
+
+    def export_columns(self, format:str = 'parquet', 
+                       object_type:str = 'all') -> list:
+        '''
+        Export generated object types to <object_type>_<postfix>.<format>
+
+        Parameters:
+            format (str): parquet or arrow (Arrow IPC/Feather)
+            object_type (str): Object type to export, or 'all'
+
+        Returns:
+            list of files written
+        '''
+        files:list = []
+        if pyarrow is None:
+            logging.error(f'Export to {format} requires the pyarrow package')
+            return files
+
+        for object in self.csv_sets.keys():
+            if object_type not in [ 'all', object ]:
+                continue
+            rows = self.csv_sets[object]
+            if not isinstance(rows, COLUMN_TABLE):
+                rows = COLUMN_TABLE(self.headers[object], rows)
+            filename = f'{object}_{self.postfix}.{format}'
+            if format == 'parquet':
+                pyarrow.parquet.write_table(rows.to_arrow(), filename)
+            else:
+                pyarrow.feather.write_feather(rows.to_arrow(), filename)
+            logging.info(f'Exported {len(rows)} rows to {filename}')
+            files.append(filename)
+
+        return files
+
+
+    def get_header_for_obj(self, object_type:str=''):
+        '''
+        '''
+        # Match object type and return header
+        return self.headers.get(object_type)
+
+
+    def gen_data(self, base:str='', to_file:bool=False, object_type:str='',
+                 client=None, wapi_batch:int=1000):
+        '''
+        Generate and output the data set
+
+        Parameters:
+            base (str): Base network
+            to_file (bool): Output each object type to its own file
+            object_type (str): Object type to output, or 'all'
+            client (wapi.WAPI_CLIENT): Push objects to WAPI instead
+                                       of outputting CSV
+            wapi_batch (int): Objects per /request call when pushing
+
+        Returns:
+            bool, False if the layout did not fit the base network
+        '''
+        if not object_type:
+            object_type = 'all'
+
+        # Nothing is generated or output for a layout that does not fit
+        if not self.check_layout(base=base):
+            return False
+
+        self.stage_stats = []
+        self.host_seconds = 0.0
+        self.dhcp_seconds = 0.0
+        if self.profile:
+            tracemalloc.start()
+        if self.cprofile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+
+        if self.streaming and client is None:
+            # Generation stages are timed as rows are pulled by the output,
+            # the time spent pulling rows is not part of the output stage
+            pulled = { 'seconds': 0.0 }
+            self.output_csv(object_type=object_type, 
+                            to_file=to_file,
+                            rows=self.iter_pulled(self.iter_rows(base=base),
+                                                  pulled))
+            stats = self.start_stage('output_csv')
+            stats['seconds'] = time.perf_counter() - start - pulled['seconds']
+            stats['rows'] = self.rows_written
+            self.end_stage(stats)
+        else:
+            self.gen_sets(base=base)
+            
+            if client is not None:
+                with self.stage('push_wapi') as stats:
+                    loaded = self.push_wapi(client, object_type=object_type,
+                                            chunk_size=wapi_batch)
+                stats['rows'] = loaded['loaded'] + loaded['existing']
+            else:
+                with self.stage('output_csv') as stats:
+                    self.output_csv(object_type=object_type, to_file=to_file)
+                stats['rows'] = self.rows_written
+
+        total = time.perf_counter() - start
+        if self.cprofile:
+            profiler.disable()
+            profiler.dump_stats(f'profile_{self.postfix}.prof')
+            logging.info(f'Saved cProfile stats to profile_{self.postfix}.prof')
+        if self.profile:
+            self.write_profile(filename=f'profile_{self.postfix}.json', 
+                               seconds=total)
+            tracemalloc.stop()
+
+        return True
+
+
+    def gen_sets(self, base:str = ''):
+        '''
+        Generate every object type in to csv_sets, timing each stage
+
+        Parameters:
+            base (str): Base network
+
+        Returns:
+            csv_sets, empty if the layout did not fit the base network
+        '''
+        if not self.check_layout(base=base):
+            return self.csv_sets
+
+        with self.stage('gen_networks'):
+            if base:
+                self.gen_networks(base=base)
+            else:
+                self.gen_networks()
+        with self.stage('gen_zones'):
+            self.gen_zones()
+        with self.stage('gen_reverse'):
+            self.gen_reverse()
+        if self.include_records and self.include_hosts:
+            with self.stage('gen_records'):
+                self.gen_records()
+
+        return self.csv_sets
+
+
+    def add_stage_hook(self, hook):
+        '''
+        Register a callable to receive stage timings
+
+        The hook is called as hook(stage, stats) at the end of each
+        stage of gen_data, where stats is a dict of stage, rows,
+        seconds, peak_kb (None unless profiling) and objects (rows per
+        object type). The gen_dhcp and gen_hosts stages run within
+        gen_networks and have no peak_kb of their own.
+
+        Parameters:
+            hook (callable): Function to call
+        '''
+        self.stage_hooks.append(hook)
+
+        return
+
+
+    def start_stage(self, name:str) -> dict:
+        '''
+        Start recording a stage
+
+        Returns:
+            stats dict for the stage
+        '''
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        return { 'stage': name, 'rows': 0, 'seconds': 0.0, 
+                 'peak_kb': None, 'objects': {} }
+
+
+    def end_stage(self, stats:dict):
+        '''
+        Record a completed stage and call the stage hooks
+
+        DHCP objects, host and CNAME records are generated with their
+        networks, the time spent formatting them is reported as separate
+        gen_dhcp and gen_hosts stages. With workers > 1 that time is
+        summed over the worker processes, so it is not subtracted from
+        the gen_networks wall clock time. Their memory is part of the
+        gen_networks peak, so they are left out of the peak_kb report.
+        '''
+        if tracemalloc.is_tracing():
+            stats['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+
+        stages = [ stats ]
+        if stats['stage'] == 'gen_networks':
+            splits = [ ( 'gen_dhcp', [ 'dhcp_ranges', 'fixed_addresses' ], 
+                         self.dhcp_seconds, self.include_dhcp ),
+                       ( 'gen_hosts', [ 'hosts', 'cnames' ],
+                         self.host_seconds, self.include_hosts ) ]
+            for name, object_types, seconds, included in splits:
+                if not included:
+                    continue
+                objects = { k: v for k, v in stats['objects'].items() 
+                            if k in object_types }
+                split = { 'stage': name,
+                          'rows': sum(objects.values()),
+                          'seconds': seconds,
+                          'objects': objects }
+                if self.workers <= 1:
+                    stats['seconds'] -= seconds
+                stats['rows'] -= split['rows']
+                for k in objects:
+                    del stats['objects'][k]
+                stages.append(split)
+
+        for stage in stages:
+            self.stage_stats.append(stage)
+            logging.debug(f"Stage {stage['stage']}: {stage['rows']} rows in "
+                          f"{stage['seconds']:.3f}s")
+            for hook in self.stage_hooks:
+                hook(stage['stage'], stage)
+
+        return
+
+
+    @contextlib.contextmanager
+    def stage(self, name:str):
+        '''
+        Record a stage that adds rows to csv_sets
+        '''
+        before = { k: len(v) for k, v in self.csv_sets.items() }
+        stats = self.start_stage(name)
+        start = time.perf_counter()
+
+        yield stats
+
+        stats['seconds'] = time.perf_counter() - start
+        stats['objects'] = { k: len(v) - before.get(k, 0) 
+                             for k, v in self.csv_sets.items()
+                             if len(v) != before.get(k, 0) }
+        stats['rows'] = sum(stats['objects'].values())
+        self.end_stage(stats)
+
+        return
+
+
+    def iter_stage(self, name:str, rows):
+        '''
+        Record a streaming stage, timing only the generator itself
+
+        Yields:
+            (object_type, row) tuples from rows
+        '''
+        if not ( self.profile or self.stage_hooks ):
+            yield from rows
+            return
+
+        stats = self.start_stage(name)
+        objects = collections.Counter()
+        seconds = 0.0
+        rows = iter(rows)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(rows)
+            except StopIteration:
+                seconds += time.perf_counter() - start
+                break
+            seconds += time.perf_counter() - start
+            objects[item[0]] += 1
+            yield item
+
+        stats['seconds'] = seconds
+        stats['objects'] = dict(objects)
+        stats['rows'] = sum(objects.values())
+        self.end_stage(stats)
+
+        return
+
+
+    def iter_pulled(self, rows, pulled:dict):
+        '''
+        Add the time spent generating each row to pulled['seconds']
+
+        Only wraps rows when stages are being recorded, as iter_stage()
+
+        Yields:
+            (object_type, row) tuples from rows
+        '''
+        if not ( self.profile or self.stage_hooks ):
+            yield from rows
+            return
+
+        rows = iter(rows)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(rows)
+            except StopIteration:
+                pulled['seconds'] += time.perf_counter() - start
+                break
+            pulled['seconds'] += time.perf_counter() - start
+            yield item
+
+        return
+
+
+    def write_profile(self, filename:str, seconds:float):
+        '''
+        Write stage statistics as JSON
+
+        Parameters:
+            filename (str): Report file name
+            seconds (float): Total run time
+        '''
+        report = { 'version': __version__,
+                   'base_network': self.base_network,
+                   'streaming': self.streaming,
+                   'workers': self.workers,
+                   'seconds': seconds,
+                   'peak_kb': tracemalloc.get_traced_memory()[1] // 1024,
+                   'stages': self.stage_stats }
+        try:
+            with open(filename, 'w') as f:
+                json.dump(report, f, indent=2)
+            logging.info(f'Saved profile to {filename}')
+        except OSError as err:
+            logging.error(f'Unable to save profile {filename}: {err}')
+
+        return
+    
+
+    def gen_networks(self, 
+                       base:str = ''):
+        '''
+        '''
+        if base:
+            # Headers depend on the IP version of the base network
+            self.set_base_network(base)
+        rows = self.sort_rows(self.iter_allocated(self.iter_networks(base=base)))
+        if rows['containers']:
+            self.csv_sets.update({ 'containers': rows['containers'] })
+
+        return self.csv_sets
+
+
+    def iter_networks(self, base:str = '', defer:bool = False):
+        '''
+        Generate the container hierarchy for base network
+
+        With workers > 1 the country subtrees are generated on a
+        process pool. In incremental mode the rows for each region are
+        read from the region cache when its inputs are unchanged.
+
+        Parameters:
+            base (str): Override base network
+            defer (bool): Yield country placeholders and region cache
+                          markers, see iter_parallel and
+                          iter_region_cache
+
+        Yields:
+            (object_type, row) tuples for containers, networks and
+            dhcp_ranges in the order they are generated
+        '''
+        if base:
+            self.set_base_network(base)
+        else:
+            base = self.base_network
+
+        if not defer and not self.check_layout(base=base):
+            return
+
+        if ( self.workers > 1 or self.incremental ) and not defer:
+            rows = self.iter_networks(base=base, defer=True)
+            if self.workers > 1:
+                rows = self.iter_parallel(rows)
+            if self.incremental:
+                rows = self.iter_region_cache(rows)
+            yield from rows
+            return
+
+        regions = self.regions()
+        base_block = NETBLOCK.from_network(base)
+        next_prefix = self.plan['prefix']
+
+        # Create Top Level container
+        yield ('containers', self.templates['base_container'].encode(
+                                address=base_block.network_address,
+                                prefixlen=base_block.prefixlen))
+
+        # Create block per Region
+        for region, subnet in self.planned_blocks('regions', regions,
+                                                  base_block, next_prefix):
+
+            if defer and self.incremental:
+                cache_file = self.region_cache_file(subnet=subnet, 
+                                                    region=region)
+                if os.path.isfile(cache_file):
+                    logging.debug(f'Using cached rows for region {region}')
+                    yield ('region_cached', cache_file)
+                    yield from self.read_region_cache(cache_file)
+                    continue
+                yield ('region_start', cache_file)
+
+            yield ('containers', self.templates['region_container'].encode(
+                                    address=subnet.network_address,
+                                    prefixlen=subnet.prefixlen,
+                                    region=region))
+
+            # Add countries if included
+            if self.include_countries:
+                yield from self.iter_country_containers(subnet=subnet, 
+                                                        region=region,
+                                                        defer=defer and self.workers > 1)
+            elif self.include_locations:
+                logging.warning(f'To create city containers for {region} include_country=True is required')
+
+            if defer and self.incremental:
+                yield ('region_end', cache_file)
+
+        return
+
+
+    def check_layout(self, base:str = '') -> bool:
+        '''
+        Plan the address hierarchy in to self.plan, logging any errors
+
+        Returns:
+            bool, False if the layout does not fit the base network
+        '''
+        plan = self.fit_layout(base=base)
+        if plan['compact'] and plan != self.plan:
+            logging.warning(f"Layout does not fit {plan['base']}, "
+                            'using compact layout')
+        self.plan = plan
+        for error in self.plan['errors']:
+            logging.error(error)
+
+        return not self.plan['errors']
+
+
+    def fit_layout(self, base:str = '') -> dict:
+        '''
+        Plan the address hierarchy, falling back to the compact layout
+        when the demo layout does not fit the base network
+
+        Returns:
+            plan dict, see plan_layout()
+        '''
+        plan = self.plan_layout(base=base)
+        if plan['errors']:
+            compact = self.plan_layout(base=base, compact=True)
+            if not compact['errors']:
+                return compact
+
+        return plan
+
+
+    def plan_layout(self, base:str = '', compact:bool = False) -> dict:
+        '''
+        Plan the prefix of each level of the address hierarchy
+
+        The whole metadata tree is sized before any rows are generated,
+        so a layout that does not fit the base network is reported up
+        front instead of subtrees being dropped part way through a run.
+        The demo layout sizes levels with child_prefix(), see
+        plan_compact() for the compact layout.
+
+        Parameters:
+            base (str): Base network, default base_network
+            compact (bool): Size every block from its subtree's demand
+
+        Returns:
+            dict of the base network, region prefix, the block and
+            child prefix of each region and country, container and
+            network totals, and a list of errors that is empty when
+            the layout fits
+        '''
+        if compact:
+            return self.plan_compact(base=base)
+
+        base_block = NETBLOCK.from_network(base or self.base_network)
+        regions = self.regions()
+        num_networks = len(self.departments()) * self.dept_scale
+        limit = 29 if base_block.version == 4 else IPV6_NETWORK_PREFIX
+        errors:list = []
+        plan = { 'base': base_block.exploded,
+                 'compact': compact,
+                 'prefix': self.child_prefix(base_block.prefixlen, 
+                                             len(regions), 1),
+                 'regions': {},
+                 'countries': {},
+                 'containers': 1,
+                 'networks': 0,
+                 'errors': errors }
+
+        if not len(regions) < base_block.num_subnets(plan['prefix']):
+            errors.append(f'Base subnet {base_block.exploded} cannot be '
+                          f'subnetted in to {len(regions)} regions.')
+            return plan
+
+        for index, region in enumerate(regions):
+            block = base_block.subnet(index, plan['prefix'])
+            countries = self.countries(region=region)
+            prefix = self.child_prefix(block.prefixlen, len(countries))
+            plan['regions'][region] = { 'network': block.exploded, 
+                                        'prefix': prefix }
+            plan['containers'] += 1
+            if not self.include_countries:
+                continue
+            if not len(countries) < block.num_subnets(prefix):
+                errors.append(f'subnet {block.exploded} cannot be subnetted in'
+                              f'to {len(countries)} countries.')
+                continue
+
+            for country_index, country in enumerate(countries):
+                sub = block.subnet(country_index, prefix)
+                num_sites = len(self.locations(country=country)) * self.scale
+                site_prefix = self.child_prefix(sub.prefixlen, num_sites)
+                entry = { 'network': sub.exploded, 
+                          'prefix': site_prefix,
+                          'sites': num_sites }
+                plan['countries'][country] = entry
+                plan['containers'] += 1
+                if not self.include_locations:
+                    continue
+                if ( site_prefix >= limit or 
+                     not num_sites < sub.num_subnets(site_prefix) ):
+                    errors.append(f'subnet {sub.exploded} cannot be subnetted in'
+                                  f'to {num_sites} locations.')
+                    continue
+                plan['containers'] += num_sites
+                if not self.include_networks:
+                    continue
+
+                network_prefix = self.network_prefix(site_prefix, num_networks,
+                                                     sub.version)
+                site = NETBLOCK(sub.address, site_prefix, sub.version)
+                if not num_networks < site.num_subnets(network_prefix):
+                    errors.append(f'Locations in {sub.exploded} cannot be '
+                                  f'subnetted in to {num_networks} networks.')
+                    continue
+                entry['network_prefix'] = network_prefix
+                plan['networks'] += num_sites * num_networks
+
+        return plan
+
+
+    def plan_compact(self, base:str = '') -> dict:
+        '''
+        Plan the compact layout, sizing each block from its subtree
+
+        IPv4 networks are the largest, from /24 down to /30, that let
+        the whole tree fit. Each site holds its networks, each
+        country its sites, in the fewest bits that hold them. Regions
+        and countries get the smallest power of two block holding their
+        children, packed largest first so every block stays aligned.
+
+        Parameters:
+            base (str): Base network, default base_network
+
+        Returns:
+            plan dict, see plan_layout(), region and plan prefixes
+            are None as blocks at these levels differ in size
+        '''
+        base_block = NETBLOCK.from_network(base or self.base_network)
+        bits = 32 if base_block.version == 4 else 128
+        regions = { region: { country: len(self.locations(country=country)) 
+                                       * self.scale
+                              for country in self.countries(region=region) }
+                    for region in self.regions() }
+        num_networks = len(self.departments()) * self.dept_scale
+        limit = 29 if base_block.version == 4 else IPV6_NETWORK_PREFIX
+        errors:list = []
+        plan = { 'base': base_block.exploded,
+                 'compact': True,
+                 'prefix': None,
+                 'regions': {},
+                 'countries': {},
+                 'containers': 1,
+                 'networks': 0,
+                 'errors': errors }
+
+        if base_block.version == 4:
+            network_prefixes = range(24, 31)
+        else:
+            network_prefixes = [ IPV6_NETWORK_PREFIX ]
+        for network_prefix in network_prefixes:
+            site_bits = bits - network_prefix + num_networks.bit_length()
+            country_bits = { country: site_bits + num_sites.bit_length()
+                             for countries in regions.values()
+                             for country, num_sites in countries.items() }
+            region_bits = { region: block_bits(country_bits[country] 
+                                               for country in countries)
+                            for region, countries in regions.items() }
+            if block_bits(region_bits.values()) <= bits - base_block.prefixlen:
+                break
+        else:
+            num_sites = sum( sum(countries.values()) 
+                             for countries in regions.values() )
+            errors.append(f'Base subnet {base_block.exploded} cannot hold '
+                          f'{num_sites} locations of {num_networks} networks.')
+            return plan
+        site_prefix = bits - site_bits
+        if self.include_locations and site_prefix >= limit:
+            errors.append(f'Locations of {num_networks} networks need a '
+                          f'/{site_prefix} block, larger than /{limit - 1}.')
+            return plan
+
+        address = base_block.address
+        for region in sorted(regions, key=lambda r: -region_bits[r]):
+            block = NETBLOCK(address, bits - region_bits[region], 
+                             base_block.version)
+            address += 1 << region_bits[region]
+            plan['regions'][region] = { 'network': block.exploded,
+                                        'prefix': None }
+            plan['containers'] += 1
+            if not self.include_countries:
+                continue
+
+            country_address = block.address
+            for country in sorted(regions[region], 
+                                  key=lambda c: -country_bits[c]):
+                sub = NETBLOCK(country_address, bits - country_bits[country],
+                               base_block.version)
+                country_address += 1 << country_bits[country]
+                num_sites = regions[region][country]
+                entry = { 'network': sub.exploded, 
+                          'prefix': site_prefix,
+                          'sites': num_sites }
+                plan['countries'][country] = entry
+                plan['containers'] += 1
+                if not self.include_locations:
+                    continue
+                plan['containers'] += num_sites
+                if not self.include_networks:
+                    continue
+                entry['network_prefix'] = network_prefix
+                plan['networks'] += num_sites * num_networks
+
+        return plan
+
+
+    def planned(self, level:str, name:str, subnet:NETBLOCK) -> dict:
+        '''
+        Plan entry for a region or country, if it was planned for subnet
+
+        Parameters:
+            level (str): regions or countries
+            name (str): Region or country
+            subnet (NETBLOCK): Block being generated
+
+        Returns:
+            plan entry dict, empty if not planned
+        '''
+        entry = (self.plan or {}).get(level, {}).get(name)
+        if entry and entry['network'] == subnet.exploded:
+            return entry
+
+        return {}
+
+
+    def planned_blocks(self, 
+                       level:str, 
+                       names:tuple, 
+                       subnet:NETBLOCK, 
+                       prefix:int) -> list:
+        '''
+        Blocks for the regions or countries within subnet
+
+        Blocks are taken from the plan, where the compact layout packs
+        them largest first, or are prefix sized blocks in name order
+        when not planned. They are returned in address order so rows
+        are generated in address order.
+
+        Parameters:
+            level (str): regions or countries
+            names (tuple): Regions or countries within subnet
+            subnet (NETBLOCK): Parent block
+            prefix (int): Prefix of unplanned blocks
+
+        Returns:
+            list of (name, NETBLOCK) tuples
+        '''
+        planned = (self.plan or {}).get(level, {})
+        blocks:list = []
+        for index, name in enumerate(names):
+            block = None
+            if name in planned:
+                block = NETBLOCK.from_network(planned[name]['network'])
+                if not ( subnet.address <= block.address and 
+                         block.broadcast <= subnet.broadcast ):
+                    block = None
+            if block is None:
+                block = subnet.subnet(index, prefix)
+            blocks.append(( name, block ))
+
+        return sorted(blocks, key=lambda item: item[1].address)
+
+
+    def set_base_network(self, base:str):
+        '''
+        Set the base network, switching the CSV headers between IPv4
+        and IPv6 object types to match
+        '''
+        if base != self.base_network:
+            self.allocated = []
+        self.base_network = base
+        self.def_headers()
+        if isinstance(self.csv_sets, COLUMN_STORE):
+            self.csv_sets.headers = self.headers
+
+        return
+
+
+    def iter_allocated(self, rows, hosts = None):
+        '''
+        Record the address range of each network row passing through
+
+        Rows are recorded in this process after any process pool or
+        region cache, so allocated covers every generated network.
+        Networks arrive in address order, so each one is merged in to
+        the last interval as it arrives and memory grows with the number
+        of gaps between networks rather than the number of networks.
+
+        Parameters:
+            rows (iterable): (object_type, row) tuples
+            hosts (file): Also write host rows to this file, a line each
+
+        Yields:
+            (object_type, row) tuples, unchanged
+        '''
+        self.allocated = []
+        allocated = self.allocated
+        for object_type, row in rows:
+            if object_type == 'hosts' and hosts is not None:
+                hosts.write(row + '\n')
+            elif object_type == 'networks':
+                if isinstance(row, tuple):
+                    address, mask = row[1], row[2]
+                else:
+                    _, address, mask, _ = row.split(',', 3)
+                if ':' in address:
+                    start = address_to_int(address, 6)
+                    size = 1 << (128 - int(mask))
+                else:
+                    start = address_to_int(address)
+                    if '.' in mask:
+                        size = ( ~address_to_int(mask) & 0xffffffff ) + 1
+                    else:
+                        size = 1 << (32 - int(mask))
+                end = start + size - 1
+                if ( allocated and allocated[-1][0] <= start 
+                     and start <= allocated[-1][1] + 1 ):
+                    if end > allocated[-1][1]:
+                        allocated[-1] = ( allocated[-1][0], end )
+                else:
+                    allocated.append(( start, end ))
+            yield (object_type, row)
+
+        return
+
+
+    def allocated_blocks(self, prefix:int, version:int = 4) -> list:
+        '''
+        Blocks of size prefix covering the allocated networks
+
+        The allocated ranges are merged in to a sorted interval set, so
+        the covering blocks are found in O(n log n) for n networks
+        without visiting unused parts of the base network.
+
+        Parameters:
+            prefix (int): Prefix length of the blocks
+            version (int): IP version
+
+        Returns:
+            list of NETBLOCK objects in address order
+        '''
+        shift = ( 32 if version == 4 else 128 ) - prefix
+        blocks:list = []
+        next_index = 0
+        for start, end in merge_intervals(self.allocated):
+            for index in range(max(start >> shift, next_index), (end >> shift) + 1):
+                blocks.append(NETBLOCK(index << shift, prefix, version))
+            next_index = (end >> shift) + 1
+
+        return blocks
+
+
+    def region_cache_file(self, subnet:NETBLOCK, region:str) -> str:
+        '''
+        Region cache file for the current inputs of region
+
+        The file name is a hash of the region's location_data subtree,
+        its address block, its entries in the layout plan and every other
+        input that affects the rows generated for it. The plan depends on
+        the whole metadata tree, so an edit to another region that
+        switches the layout also changes this region's key. The columns
+        of the row templates are included so that a change to a row
+        layout is not served from the cache.
+
+        Returns:
+            file name
+        '''
+        plan = self.plan or {}
+        inputs = { 'version': [ __version__, CACHE_VERSION ],
+                   'region': region,
+                   'location_data': self.metadata['location_data'][region],
+                   'block': [ subnet.address, subnet.prefixlen, subnet.version ],
+                   'plan': [ plan.get('compact'),
+                             plan.get('regions', {}).get(region),
+                             { country: plan.get('countries', {}).get(country)
+                               for country in self.countries(region=region) } ],
+                   'departments': self.departments(),
+                   'device_types': self.device_types(),
+                   'config': self.config,
+                   'include': [ self.include_countries, self.include_locations,
+                                self.include_networks, self.include_dhcp,
+                                self.include_hosts, self.include_records ],
+                   'scale': [ self.scale, self.dept_scale ],
+                   'hosts_per_network': self.hosts_per_network,
+                   'fixed_per_network': self.fixed_per_network,
+                   'cname_fraction': self.cname_fraction,
+                   'seed': self.seed,
+                   'templates': { name: [ template.schema.header, template.columns ]
+                                  for name, template in self.templates.items() } }
+        key = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str)
+                             .encode('utf-8')).hexdigest()
+
+        return os.path.join(self.region_cache_dir(), f'{key}.rows')
+
+
+    def region_cache_dir(self) -> str:
+        '''
+        Region cache directory of the metadata file
+
+        Each metadata file has its own directory, so runs of different
+        metadata files sharing a cache directory keep their own regions.
+        '''
+        name = hashlib.sha256(self.metadata_path.encode('utf-8')).hexdigest()[:32]
+
+        return os.path.join(self.cache_dir, 'regions', name)
+
+
+    def read_region_cache(self, cache_file:str):
+        '''
+        Read rows from a region cache file
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        with open(cache_file, 'r', encoding='utf-8', buffering=1024 * 1024) as f:
+            for line in f:
+                object_type, row = line.rstrip('\n').split('\t', 1)
+                yield (object_type, row)
+
+        return
+
+
+    def iter_region_cache(self, rows):
+        '''
+        Save the rows between ('region_start', file) and
+        ('region_end', file) markers to the region cache
+
+        Files are written to a temporary name and only renamed in to
+        place once the region is complete. ('region_cached', file)
+        marks a region read from the cache. Once every region has been
+        generated, cache files not used by this run are removed.
+
+        Parameters:
+            rows (iterable): (object_type, row) tuples with markers
+
+        Yields:
+            (object_type, row) tuples without markers
+        '''
+        output = None
+        tmpname = ''
+        used:set = set()
+        try:
+            for object_type, row in rows:
+                if object_type == 'region_cached':
+                    used.add(row)
+                elif object_type == 'region_start':
+                    used.add(row)
+                    os.makedirs(os.path.dirname(row), exist_ok=True)
+                    fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(row))
+                    output = open(fd, 'w', encoding='utf-8', 
+                                  buffering=1024 * 1024)
+                elif object_type == 'region_end':
+                    output.close()
+                    os.replace(tmpname, row)
+                    logging.debug(f'Saved region cache {row}')
+                    output = None
+                else:
+                    if output:
+                        if isinstance(row, tuple):
+                            row = ','.join(map(COLUMN_TABLE.quote, row))
+                        output.write(f'{object_type}\t{row}\n')
+                    yield (object_type, row)
+        finally:
+            if output:
+                output.close()
+                os.remove(tmpname)
+        self.prune_region_cache(used)
+
+        return
+
+
+    def prune_region_cache(self, used:set):
+        '''
+        Remove region cache files of the metadata file that are not
+        in used
+
+        Every change to the metadata, seed or options creates new region
+        files, so only the files of the latest run of each metadata file
+        are kept.
+
+        Parameters:
+            used (set): Region cache file names to keep
+        '''
+        directory = self.region_cache_dir()
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            cache_file = os.path.join(directory, name)
+            if name.endswith('.rows') and cache_file not in used:
+                try:
+                    os.remove(cache_file)
+                    logging.debug(f'Removed region cache {cache_file}')
+                except OSError as err:
+                    logging.warning(f'Unable to remove region cache '
+                                    f'{cache_file}: {err}')
+
+        return
+
+
+    def country_containers(self, 
+                           subnet:NETBLOCK, 
+                           region:str):
+        '''
+        '''
+        rows = self.sort_rows(self.iter_country_containers(subnet=subnet,
+                                                           region=region))
+
+        return rows['containers']
+
+
+    def iter_country_containers(self, 
+                                subnet:NETBLOCK, 
+                                region:str,
+                                defer:bool = False):
+        '''
+        Generate country containers for region
+
+        Parameters:
+            subnet (NETBLOCK): Region block
+            region (str): Region
+            defer (bool): Yield ('country', (address, prefixlen, version,
+                          country)) placeholders instead of the country
+                          subtrees, for generation on a process pool
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        subnet = NETBLOCK.from_network(subnet)
+        countries = self.countries(region=region)
+        # Create block per country 
+        planned = self.planned('regions', region, subnet)
+        country_prefix = planned.get('prefix') or self.child_prefix(
+                                                    subnet.prefixlen, len(countries))
+        if planned or len(countries) < subnet.num_subnets(country_prefix):
+            for country, sub in self.planned_blocks('countries', countries,
+                                                    subnet, country_prefix):
+                if defer:
+                    yield ('country', 
+                           (sub.address, sub.prefixlen, sub.version, country))
+                else:
+                    yield from self.iter_country(subnet=sub, country=country)
+
+        else:
+            logging.error(f'subnet {subnet.exploded} cannot be subnetted in'
+                        f'to {len(countries)} countries.')
+
+        return
+
+
+    def iter_country(self, subnet:NETBLOCK, country:str):
+        '''
+        Generate the container and location subtree for a country
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        yield ('containers', self.templates['country_container'].encode(
+                                address=subnet.network_address,
+                                prefixlen=subnet.prefixlen,
+                                country=country))
+        # Add locations if included
+        if self.include_locations:
+            yield from self.iter_location_containers(subnet=subnet, 
+                                                     country=country)
+
+        return
+
+
+    def iter_parallel(self, rows):
+        '''
+        Expand deferred country subtrees on a process pool
+
+        Country subtrees are submitted as they are reached and merged
+        back in order, so rows are identical to the serial path. The
+        number of subtrees in flight is bounded to keep memory flat.
+
+        Parameters:
+            rows (iterable): (object_type, row) tuples including
+                             ('country', ...) placeholders
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        window = self.workers * 4
+        in_flight = 0
+        pending = collections.deque()
+
+        worker = copy.copy(self)
+        worker.csv_sets = {}
+        worker.workers = 1
+        # Hooks run in this process and may not be picklable
+        worker.stage_hooks = []
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(worker,)) as pool:
+            for object_type, row in rows:
+                if object_type == 'country':
+                    pending.append(pool.submit(_country_rows, *row))
+                    in_flight += 1
+                else:
+                    pending.append((object_type, row))
+                # Output completed subtrees in order
+                while in_flight > window:
+                    item = pending.popleft()
+                    if isinstance(item, concurrent.futures.Future):
+                        in_flight -= 1
+                        yield from self.worker_result(item)
+                    else:
+                        yield item
+
+            while pending:
+                item = pending.popleft()
+                if isinstance(item, concurrent.futures.Future):
+                    yield from self.worker_result(item)
+                else:
+                    yield item
+
+        return
+
+
+    def worker_result(self, future) -> list:
+        '''
+        Rows of a completed country subtree, adding the worker's DHCP
+        and host formatting time to this process's totals
+
+        Returns:
+            list of (object_type, row) tuples
+        '''
+        rows, dhcp_seconds, host_seconds = future.result()
+        self.dhcp_seconds += dhcp_seconds
+        self.host_seconds += host_seconds
+
+        return rows
+
+
+    def location_containers(self, 
+                            subnet:NETBLOCK, 
+                            country:str):
+        '''
+        '''
+        rows = self.sort_rows(self.iter_location_containers(subnet=subnet,
+                                                            country=country))
+
+        return rows['containers']
+
+
+    def iter_location_containers(self, 
+                                 subnet:NETBLOCK, 
+                                 country:str):
+        '''
+        Generate location containers for country
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        subnet = NETBLOCK.from_network(subnet)
+        num_sites = len(self.locations(country=country)) * self.scale
+        plan = self.planned('countries', country, subnet)
+        # Create block per country 
+        prefix = plan.get('prefix') or self.child_prefix(subnet.prefixlen, num_sites)
+        # Leave room for networks in each location
+        if prefix < ( 29 if subnet.version == 4 else IPV6_NETWORK_PREFIX ):
+            num_blocks = subnet.num_subnets(prefix)
+            if num_sites < num_blocks:
+                index = 0
+                for location in self.sites(country=country):
+                    sub = subnet.subnet(index, prefix)
+                    yield ('containers', self.templates['location_container'].encode(
+                                            address=sub.network_address,
+                                            prefixlen=sub.prefixlen,
+                                            location=location))
+                    # Add networks if included
+                    if self.include_networks:
+                        yield from self.iter_create_networks(
+                                    subnet=sub, 
+                                    location=location,
+                                    prefix=plan.get('network_prefix', 0))
+                    index += 1
+                    # Check for out of bounds
+                    if index > num_blocks:
+                        break
+
+            else:
+                logging.error(f'subnet {subnet.exploded} cannot be subnetted in'
+                            f'to {num_sites} countries.')
+        else:
+            logging.debug('Prefix too small - unable to create location blocks')
+
+        return
+
+
+    def create_networks(self, 
+                        subnet:NETBLOCK,
+                        location:str):
+        '''
+        '''
+        rows = self.sort_rows(self.iter_create_networks(subnet=subnet,
+                                                        location=location))
+
+        return rows['networks']
+
+
+    def iter_create_networks(self, 
+                             subnet:NETBLOCK,
+                             location:str,
+                             prefix:int = 0):
+        '''
+        Generate a network, and optionally a DHCP range and hosts, per
+        department
+
+        Parameters:
+            subnet (NETBLOCK): Location block
+            location (str): Location
+            prefix (int): Network prefix length from the plan, 
+                          calculated if 0
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        departments = self.departments()
+        num_networks = len(departments) * self.dept_scale
+        reverse:str = 'FALSE'
+        network = self.templates['network'].encode
+
+        subnet = NETBLOCK.from_network(subnet)
+        # Gen prefix
+        if not prefix:
+            prefix = self.network_prefix(subnet.prefixlen, num_networks, 
+                                         subnet.version)
+        
+        num_subnets = subnet.num_subnets(prefix)
+        if num_networks < num_subnets:
+            depts = list(self.scaled_departments())
+            subnets = [ subnet.subnet(index, prefix) 
+                        for index in range(len(depts)) ]
+            for sub, dept in zip(subnets, depts):
+                if sub.version == 6:
+                    # Routers are advertised rather than a DHCP option
+                    yield ('networks', network(address=sub.network_address,
+                                               netmask=sub.prefixlen,
+                                               reverse='FALSE',
+                                               department=dept))
+                else:
+                    gw = int_to_address(sub.address + 1, sub.version)
+                    # Auto create reverse zone flag
+                    if sub.prefixlen == 24:
+                        reverse = 'TRUE'
+                    else:
+                        reverse = 'FALSE'
+                    # Gen network CSV
+                    yield ('networks', network(address=sub.network_address,
+                                               netmask=sub.netmask,
+                                               gateway=gw,
+                                               reverse=reverse,
+                                               department=dept))
+
+            # DHCP objects for all networks of the location in one pass
+            if self.include_dhcp:
+                start = time.perf_counter()
+                ranges = self.dhcp_rows(subnets=subnets)
+                fixed = self.fixed_address_rows(subnets=subnets, 
+                                                location=location,
+                                                departments=depts)
+                self.dhcp_seconds += time.perf_counter() - start
+                for row in ranges:
+                    yield ('dhcp_ranges', row)
+                for row in fixed:
+                    yield ('fixed_addresses', row)
+
+            # Add hosts if included
+            if self.include_hosts:
+                for dept_index, (sub, dept) in enumerate(zip(subnets, depts)):
+                    start = time.perf_counter()
+                    hosts = self.host_rows(subnet=sub, 
+                                           location=location,
+                                           department=dept,
+                                           index=dept_index)
+                    cnames = self.cname_rows(subnet=sub, 
+                                             location=location,
+                                             department=dept,
+                                             index=dept_index)
+                    self.host_seconds += time.perf_counter() - start
+                    for row in hosts:
+                        yield ('hosts', row)
+                    for row in cnames:
+                        yield ('cnames', row)
+
+        else:
+            logging.error(f'subnet {subnet.exploded} cannot be subnetted in'
+                          f'to {num_networks} countries.')
+        
+        return
+        
+
+    def network_prefix(self, 
+                       prefixlen:int, 
+                       count:int, 
+                       version:int = 4) -> int:
+        '''
+        Prefix length of the networks in a location block
+
+        IPv4 networks are kept between /24 and /30, IPv6 networks are
+        always IPV6_NETWORK_PREFIX.
+
+        Parameters:
+            prefixlen (int): Prefix length of the location block
+            count (int): Number of networks
+            version (int): IP version
+
+        Returns:
+            Prefix length as int
+        '''
+        if version == 6:
+            return IPV6_NETWORK_PREFIX
+
+        prefix = self.child_prefix(prefixlen, count)
+        # Don't create networks larger that /24
+        if prefix < 24:
+            logging.debug('Adjusting prefix for networks to /24')
+            prefix = 24
+        elif prefix > 30:
+            logging.debug('Adjusting prefix for networks to /30')
+            prefix = 30
+        else:
+            logging.debug(f'Prefix for networks set to /{prefix}')
+
+        return prefix
+
+
+    def child_prefix(self, prefixlen:int, count:int, spare:int = 2) -> int:
+        '''
+        Prefix length of the child blocks used to hold count items
+
+        Scaled datasets size each level with log2 so that large site
+        counts still fit the base network, otherwise the square root
+        sizing of the demo layout is used.
+
+        Parameters:
+            prefixlen (int): Prefix length of the parent block
+            count (int): Number of child blocks required
+            spare (int): Additional bits for unscaled layouts
+
+        Returns:
+            Prefix length as int
+        '''
+        if self.scale > 1 or self.dept_scale > 1:
+            return prefixlen + count.bit_length()
+
+        return int(prefixlen + math.sqrt(count) + spare)
+
+
+    def sites(self, country:str):
+        '''
+        Generate site names for country
+
+        With a scale greater than 1 each location is expanded in to
+        numbered sites e.g. LHR-001 .. LHR-500.
+
+        Parameters:
+            country (str): Country
+
+        Yields:
+            Site names
+        '''
+        if self.scale == 1:
+            yield from self.locations(country=country)
+        else:
+            width = max(3, len(str(self.scale)))
+            for location in self.locations(country=country):
+                for n in range(1, self.scale + 1):
+                    yield f'{location}-{n:0{width}d}'
+
+        return
+
+
+    def scaled_departments(self):
+        '''
+        Generate a department name per network to create for each site
+
+        Yields:
+            Department names, each repeated dept_scale times
+        '''
+        for dept in self.departments():
+            for _ in range(self.dept_scale):
+                yield dept
+
+        return
+
+
+    def dhcp_range(self, 
+                   subnet:NETBLOCK):
+        '''
+        Generate DHCP Ranges
+    
+        '''
+        range = self.dhcp_range_row(subnet=subnet)
+        self.add_rows('dhcp_ranges', [ range ])
+
+        return range
+
+
+    def dhcp_range_row(self, 
+                       subnet:NETBLOCK):
+        '''
+        Format DHCP range CSV row for subnet
+
+        Parameters:
+            subnet (NETBLOCK): Network for the range
+
+        Returns:
+            CSV row as string
+        '''
+        return self.dhcp_rows(subnets=[ NETBLOCK.from_network(subnet) ])[0]
+
+
+    def dhcp_rows(self, subnets:list) -> list:
+        '''
+        Format DHCP range CSV rows for a list of networks in one pass
+
+        Networks of the same size have their ranges at the same offsets,
+        so the bounds are calculated once per prefix length and only
+        added to each network address.
+
+        Parameters:
+            subnets (list): NETBLOCK per network
+
+        Returns:
+            list of CSV rows
+        '''
+        offsets:dict = {}
+        bounds:list = []
+        for sub in subnets:
+            offset = offsets.get(( sub.prefixlen, sub.version ))
+            if offset is None:
+                start, end = self.dhcp_bounds(subnet=sub)
+                offset = ( start - sub.address, end - sub.address )
+                offsets[( sub.prefixlen, sub.version )] = offset
+            bounds.append(( int_to_address(sub.address + offset[0], sub.version),
+                            int_to_address(sub.address + offset[1], sub.version) ))
+
+        return self.templates['dhcp_range'].encode_rows(bounds)
+
+
+    def fixed_address_rows(self, 
+                           subnets:list, 
+                           departments:list,
+                           location:str = '') -> list:
+        '''
+        Format fixed address reservations for a list of networks
+
+        Each network gets fixed_per_network reservations directly below
+        its DHCP range, with a synthetic locally administered MAC
+        address (or DUID-UUID for IPv6) derived from the address so
+        reservations are unique and reproducible.
+
+        Parameters:
+            subnets (list): NETBLOCK per network
+            departments (list): Department per network, used with
+                                location in reservation names
+            location (str): Location used in reservation names
+
+        Returns:
+            list of CSV rows
+        '''
+        rows:list = []
+        if not self.fixed_per_network:
+            return rows
+
+        fixed = self.templates['fixed_address'].encode_rows
+        offsets:dict = {}
+        for sub, dept in zip(subnets, departments):
+            offset = offsets.get(( sub.prefixlen, sub.version ))
+            if offset is None:
+                first, last = self.fixed_bounds(subnet=sub)
+                offset = ( first - sub.address, last - sub.address )
+                offsets[( sub.prefixlen, sub.version )] = offset
+                count = max(last - first + 1, 0)
+                if ( count < self.fixed_per_network and
+                     ( sub.prefixlen, sub.version ) not in self.fixed_short ):
+                    self.fixed_short.add(( sub.prefixlen, sub.version ))
+                    logging.warning(f'Only {count} of {self.fixed_per_network} '
+                                    f'fixed addresses fit in /{sub.prefixlen} '
+                                    f'networks')
+            first = sub.address + offset[0]
+            last = sub.address + offset[1]
+            if last < first:
+                continue
+            label = self.host_label(location=location, department=dept)
+            addresses = range(first, last + 1)
+            ips = [ int_to_address(address, sub.version) for address in addresses ]
+            client_id = synthetic_mac if sub.version == 4 else synthetic_duid
+            rows.extend(fixed(zip(ips,
+                                  [ client_id(address) for address in addresses ],
+                                  [ self.host_name(label, ip) for ip in ips ],
+                                  self.host_devices(subnet=sub, first=first, 
+                                                    last=last))))
+
+        return rows
+
+
+    def fixed_bounds(self, subnet:NETBLOCK) -> tuple:
+        '''
+        First and last fixed address of subnet, directly below the DHCP
+        range and above the network and gateway addresses
+
+        Returns:
+            (first, last) tuple of integer addresses, last < first if
+            there are no fixed addresses
+        '''
+        last = self.dhcp_bounds(subnet=subnet)[0] - 1
+
+        return ( max(subnet.address + 2, last - self.fixed_per_network + 1), last )
+
+
+    def dhcp_bounds(self, subnet:NETBLOCK) -> tuple:
+        '''
+        First and last address of the DHCP range for subnet
+
+        When hosts are included the range is limited to the upper half
+        of the network, leaving the lower half for host records, and
+        IPv6 ranges to the top IPV6_RANGE addresses. Otherwise the range
+        starts above the gateway and any fixed address reservations.
+
+        Parameters:
+            subnet (NETBLOCK): Network for the range
+
+        Returns:
+            (start, end) tuple of integer addresses
+        '''
+        net_size = subnet.num_addresses
+        broadcast = subnet.broadcast
+        if self.include_hosts:
+            start = subnet.address + net_size // 2
+            if subnet.version == 6:
+                start = max(start, broadcast - IPV6_RANGE)
+            return ( start, broadcast - 1 )
+
+        if net_size > 254:
+            range_size = 253
+        elif net_size > 15:
+            range_size = int(net_size / 2)
+        else:
+            range_size = int(net_size)
+        # Small networks keep the range above the gateway
+        start = max(broadcast - (range_size + 1), subnet.address + 2)
+        if self.fixed_per_network:
+            # Leave room for reservations above the gateway
+            start = min(max(start, subnet.address + 2 + self.fixed_per_network),
+                        broadcast - 1)
+
+        return ( start, broadcast - 1 )
+
+
+    def gen_zones(self):
+        '''
+        '''
+        lines:list = []
+
+        for object_type, row in self.iter_zones():
+            if object_type == 'nsg':
+                # Gen NSG CSV
+                self.csv_sets.update({ 'nsg': [ row ] })
+            else:
+                lines.append(row)
+        self.add_rows('auth_zones', lines)
+
+        return lines
+
+
+    def iter_zones(self):
+        '''
+        Generate name server group and forward auth zones
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        dns_view = self.dns_view()
+        nsg = self.name_server_group()
+        zones = self.auth_zones()
+
+        yield ('nsg', self.templates['nsg'].encode(nsg=nsg))
+        zone_rows = self.templates['zone'].encode_rows
+        self.forward_zones = list(zones)
+        for row in zone_rows(zones, format='FORWARD', view=dns_view, nsg=nsg):
+            yield ('auth_zones', row)
+
+        # Cloud zones are needed for CNAMEs
+        if self.include_hosts and self.cname_fraction:
+            cloud_zones = [ z for z in self.cloud_zones() if z not in zones ]
+            self.forward_zones.extend(cloud_zones)
+            for row in zone_rows(cloud_zones, format='FORWARD', 
+                                 view=dns_view, nsg=nsg):
+                yield ('auth_zones', row)
+
+        return
+    
+
+    def gen_reverse(self, prefix:int = 16, base:str = ''):
+        '''
+        '''
+        lines = [ row for _, row in self.iter_reverse(prefix=prefix, base=base) ]
+        self.add_rows('auth_zones', lines)
+
+        return lines
+
+
+    def iter_reverse(self, prefix:int = 16, base:str = ''):
+        '''
+        Generate reverse zones for the base network
+
+        Only zones covering generated networks are created, the whole
+        base network is covered when no networks have been generated.
+        IPv6 zones are placed as far above the /64 networks as IPv4
+        zones are above /24 networks, /56 for the default /16, so they
+        are always on a nibble boundary. Without generated networks an
+        IPv6 base network gets the nibble aligned zones covering it.
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        dns_view = self.dns_view()
+        nsg = self.name_server_group()
+        zone = self.templates['zone'].encode
+        supported_prefixes = [ 8, 16, 24 ]
+
+        if prefix not in supported_prefixes:
+            if prefix > 8 and prefix < 16:
+                prefix = 8
+                logging.warning(f'Adjusting prefix to /{prefix}')
+            elif prefix > 16 and prefix < 24:
+                prefix = 16
+                logging.warning(f'Adjusting prefix to /{prefix}')
+            elif prefix > 24:
+                prefix = 24
+                logging.warning(f'Adjusting prefix to /{prefix}')
+            else:
+                # Adjusting to default /16
+                prefix = 16
+                logging.warning(f'Adjusting prefix to default /{prefix}')
+
+        # Check for base network
+        if base:
+            self.set_base_network(base)
+
+        if self.base_network:
+            net = NETBLOCK.from_network(self.base_network)
+            if net.version == 6:
+                prefix = IPV6_NETWORK_PREFIX - (24 - prefix)
+                zone_format = 'IPv6'
+            else:
+                zone_format = 'IPv4'
+
+            if self.allocated:
+                zones = self.allocated_blocks(prefix=prefix, version=net.version)
+            elif net.version == 6:
+                # ip6.arpa zones on the nibble boundary covering the base
+                zones = list(net.subnets(new_prefix=-(-net.prefixlen // 4) * 4))
+            elif net.prefixlen >= prefix:
+                # Just create reverse for prefix
+                zones = [ net.supernet(new_prefix=prefix) ]
+            else:
+                zones = list(net.subnets(new_prefix=prefix))
+            self.reverse_zones = zones
+            for rnet in zones:
+                yield ('auth_zones', zone(fqdn=rnet.exploded, format=zone_format,
+                                          view=dns_view, nsg=nsg))
+
+        else:
+            logging.error('Base network not set. (Either call gen_networks,'
+                          ' or set base parameter)')
+        
+        return
+        
+
+    def gen_hosts(self, 
+                  subnet:NETBLOCK,
+                  location:str = '',
+                  department:str = '',
+                  index:int = 0):
+        '''
+        Generate host records for subnet
+
+        Hosts are normally generated for every network by
+        create_networks when include_hosts is set.
+
+        Parameters:
+            subnet (NETBLOCK): Network
+            location (str): Location used in host names
+            department (str): Department used in host names
+            index (int): Selects the sub domain/zone for the hosts
+
+        Returns:
+            list of CSV rows
+        '''
+        rows = self.host_rows(subnet=subnet, 
+                              location=location, 
+                              department=department,
+                              index=index)
+        self.add_rows('hosts', rows)
+
+        return rows
+
+
+    def host_rows(self, 
+                  subnet:NETBLOCK,
+                  location:str = '',
+                  department:str = '',
+                  index:int = 0) -> list:
+        '''
+        Format host records for the addresses of subnet outside of the
+        gateway and DHCP range
+
+        Rows are built per network in one pass using integer arithmetic.
+        For IPv4 networks of /24 or smaller the first three octets are
+        formatted once and only the last octet varies per host, and
+        likewise the first seven groups of IPv6 addresses.
+
+        Parameters:
+            subnet (NETBLOCK): Network
+            location (str): Location used in host names
+            department (str): Department used in host names
+            index (int): Selects the sub domain/zone for the hosts
+
+        Returns:
+            list of CSV rows
+        '''
+        subnet = NETBLOCK.from_network(subnet)
+        first, last = self.host_bounds(subnet=subnet)
+        if last < first or not self.host_domains:
+            return []
+
+        domain = self.host_domains[index % len(self.host_domains)]
+        label = self.host_label(location=location, department=department)
+        devices = self.host_devices(subnet=subnet, first=first, last=last)
+
+        if subnet.version == 4 and subnet.prefixlen >= 24:
+            network = int_to_address(subnet.address, 4)
+            prefix = network[:network.rindex('.') + 1]
+            name = f'{label}-{prefix.replace(".", "-")}'
+            rows = self.templates['host_octet'].encode_rows(
+                        zip(range(first & 0xff, (last & 0xff) + 1), devices),
+                        prefix=prefix, name=name, domain=domain)
+        elif subnet.version == 6 and first >> 16 == last >> 16:
+            # Only the last group varies
+            network = int_to_address(first, 6)
+            prefix = network[:network.rindex(':') + 1]
+            name = f'{label}-{prefix.replace(":", "-")}'
+            rows = self.templates['host_group'].encode_rows(
+                        zip(range(first & 0xffff, (last & 0xffff) + 1), devices),
+                        prefix=prefix, name=name, domain=domain)
+        else:
+            ips = [ int_to_address(address, subnet.version) 
+                    for address in range(first, last + 1) ]
+            rows = self.templates['host'].encode_rows(
+                        zip(ips, ( self.host_name(label, ip) for ip in ips ), 
+                            devices),
+                        domain=domain)
+
+        return rows
+
+
+    def host_bounds(self, subnet:NETBLOCK) -> tuple:
+        '''
+        First and last host address of subnet, skipping the network and
+        gateway addresses, fixed addresses and the DHCP range
+
+        IPv6 networks are limited to IPV6_HOSTS hosts unless
+        hosts_per_network is set.
+
+        Returns:
+            (first, last) tuple of integer addresses, last < first if
+            there is no space for hosts
+        '''
+        first = subnet.address + 2
+        if self.include_dhcp:
+            last = self.fixed_bounds(subnet=subnet)[0] - 1
+        else:
+            last = subnet.broadcast - 1
+        if self.hosts_per_network:
+            last = min(last, first + self.hosts_per_network - 1)
+        elif subnet.version == 6:
+            last = min(last, first + IPV6_HOSTS - 1)
+
+        return ( first, last )
+
+
+    def host_devices(self, subnet:NETBLOCK, first:int, last:int) -> list:
+        '''
+        Device type for each host address from first to last
+
+        Device types are assigned round robin by address, or drawn from
+        a generator seeded with seed and the network address when a
+        seed is set, so output only depends on the inputs.
+
+        Returns:
+            list of device types
+        '''
+        devices = self.device_types() or [ '' ]
+        if self.seed is None:
+            num_devices = len(devices)
+            return [ devices[address % num_devices] 
+                     for address in range(first, last + 1) ]
+
+        rng = self.rng(subnet.address, subnet.prefixlen)
+
+        return rng.choices(devices, k=last - first + 1)
+
+
+    def rng(self, *key) -> random.Random:
+        '''
+        Random generator seeded from seed and key
+
+        String seeds are hashed with SHA-512 by random.Random so the
+        sequence is the same in every process and run.
+        '''
+        return random.Random(':'.join(str(k) for k in (self.seed,) + key))
+
+
+    def host_label(self, location:str, department:str) -> str:
+        '''
+        DNS safe label prefix for hosts in a location/department
+        '''
+        return HOST_LABEL.sub('-', f'{location}-{department}'.casefold()).strip('-')
+
+
+    def host_name(self, label:str, ip:str) -> str:
+        '''
+        Host name for address ip
+        '''
+        return f'{label}-{ip.replace(".", "-").replace(":", "-")}'
+
+
+    def gen_cnames(self, 
+                   subnet:NETBLOCK,
+                   location:str = '',
+                   department:str = '',
+                   index:int = 0):
+        '''
+        Generate CNAME records for the hosts of subnet
+
+        Parameters are as gen_hosts()
+
+        Returns:
+            list of CSV rows
+        '''
+        rows = self.cname_rows(subnet=subnet, 
+                               location=location, 
+                               department=department,
+                               index=index)
+        self.add_rows('cnames', rows)
+
+        return rows
+
+
+    def cname_rows(self, 
+                   subnet:NETBLOCK,
+                   location:str = '',
+                   department:str = '',
+                   index:int = 0) -> list:
+        '''
+        Format CNAME records aliasing cname_fraction of the hosts of
+        subnet in to the cloud provider and other auth zones
+
+        Hosts are selected by address so that exactly cname_fraction of
+        any contiguous run of addresses is aliased, independent of how
+        the addresses are split in to networks. Alias names reuse the
+        unique host name, and the host's own domain is never used as
+        an alias zone, so alias FQDNs cannot be duplicated.
+
+        Returns:
+            list of CSV rows
+        '''
+        rows:list = []
+
+        subnet = NETBLOCK.from_network(subnet)
+        first, last = self.host_bounds(subnet=subnet)
+        if last < first or not self.host_domains or not self.cname_fraction:
+            return rows
+
+        domain = self.host_domains[index % len(self.host_domains)]
+        zones = self.alias_zones.get(domain)
+        if not zones:
+            return rows
+
+        dns_view = self.dns_view()
+        label = self.host_label(location=location, department=department)
+        devices = self.host_devices(subnet=subnet, first=first, last=last)
+        fraction = self.cname_fraction
+        aliases:list = []
+        for address in range(first, last + 1):
+            # Low 32 bits keep IPv6 addresses within float precision
+            offset = address & 0xffffffff
+            if int((offset + 1) * fraction) == int(offset * fraction):
+                continue
+            name = self.host_name(label, int_to_address(address, subnet.version))
+            aliases.append(( name, zones[address % len(zones)], 
+                             devices[address - first] ))
+        rows = self.templates['cname'].encode_rows(aliases, view=dns_view, 
+                                                   domain=domain)
+
+        return rows
+
+
+    def gen_records(self):
+        '''
+        Generate A/AAAA and PTR records for the host records in csv_sets
+
+        Returns:
+            dict of lists keyed by object type
+        '''
+        rows = self.record_rows(self.csv_sets.get('hosts', []))
+        if rows['skipped']:
+            logging.warning(f"Skipped {rows['skipped']} A/PTR records without a zone")
+        for object_type in [ 'a_records', 'ptr_records' ]:
+            if rows[object_type]:
+                self.add_rows(object_type, rows[object_type])
+
+        return rows
+
+
+    def iter_records(self, hosts):
+        '''
+        Generate an A/AAAA and a PTR record for each host record
+
+        Hosts are resolved in batches, so memory does not grow with the
+        number of hosts.
+
+        Parameters:
+            hosts (iterable): Host record CSV rows
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        index = ZONE_INDEX(forward=self.forward_zones, reverse=self.reverse_zones)
+        skipped = 0
+        hosts = iter(hosts)
+        while True:
+            batch = list(itertools.islice(hosts, 10000))
+            if not batch:
+                break
+            rows = self.record_rows(batch, index=index)
+            skipped += rows['skipped']
+            for object_type in [ 'a_records', 'ptr_records' ]:
+                for row in rows[object_type]:
+                    yield (object_type, row)
+        if skipped:
+            logging.warning(f'Skipped {skipped} A/PTR records without a zone')
+
+        return
+
+
+    def record_rows(self, hosts, index:ZONE_INDEX = None) -> dict:
+        '''
+        Format an A/AAAA and a PTR record for each host record
+
+        The forward and reverse zone of every record is resolved from
+        the zones generated by iter_zones() and iter_reverse() through
+        a ZONE_INDEX, records without a zone are skipped.
+
+        Parameters:
+            hosts (iterable): Host record CSV rows
+            index (ZONE_INDEX): Zones to resolve records in, built from
+                                the generated zones if not given
+
+        Returns:
+            dict of a_records and ptr_records row lists and the number
+            of skipped records
+        '''
+        if index is None:
+            index = ZONE_INDEX(forward=self.forward_zones, 
+                               reverse=self.reverse_zones)
+        columns = self.schemas['hosts'].columns
+        address_column = 1
+        fqdn_column = columns.index('fqdn') + 1
+        device_column = columns.index('EA-DeviceType') + 1
+        dns_view = self.dns_view()
+        records:list = []
+        skipped = 0
+
+        version = NETBLOCK.from_network(self.base_network).version
+        forward_zone = index.forward_zone
+        # Consecutive hosts share their reverse zone
+        zone_start, zone_end = 0, -1
+        for row in hosts:
+            if '"' in row:
+                fields = next(csv.reader([ row ]))
+            else:
+                fields = row.split(',')
+            address = fields[address_column]
+            fqdn = fields[fqdn_column]
+            value = address_to_int(address, version)
+            if not zone_start <= value <= zone_end:
+                zone = index.reverse_zone(value)
+                if zone is not None:
+                    zone_start, zone_end = zone.address, zone.broadcast
+            if not forward_zone(fqdn) or not zone_start <= value <= zone_end:
+                skipped += 1
+                continue
+            records.append(( fqdn, address, fields[device_column], 
+                             reverse_name(address, version) ))
+
+        a_rows = self.templates['a_record'].encode_rows(
+                    [ record[:3] for record in records ], view=dns_view)
+        ptr_rows = self.templates['ptr_record'].encode_rows(
+                    [ ( fqdn, ptr, device ) for fqdn, _, device, ptr in records ],
+                    view=dns_view)
+
+        return { 'a_records': a_rows, 'ptr_records': ptr_rows, 
+                 'skipped': skipped }
+
+
+    def iter_rows(self, base:str = ''):
+        '''
+        Generate the full dataset lazily
+
+        Parameters:
+            base (str): Override base network
+
+        Yields:
+            (object_type, row) tuples
+        '''
+        # Streamed hosts are spooled to a file for the A and PTR records,
+        # which are only resolved once the reverse zones are known
+        hosts = None
+        if self.include_records and self.include_hosts:
+            hosts = tempfile.TemporaryFile('w+', encoding='utf-8',
+                                           buffering=1024 * 1024)
+        try:
+            yield from self.iter_stage('gen_networks', 
+                                       self.iter_allocated(self.iter_networks(base=base),
+                                                           hosts=hosts))
+            yield from self.iter_stage('gen_zones', self.iter_zones())
+            yield from self.iter_stage('gen_reverse', self.iter_reverse())
+            if hosts is not None:
+                hosts.seek(0)
+                yield from self.iter_stage('gen_records', self.iter_records(
+                                            line.rstrip('\n') for line in hosts))
+        finally:
+            if hosts is not None:
+                hosts.close()
+
+        return
+
+
+    def sort_rows(self, rows) -> dict:
+        '''
+        Sort (object_type, row) tuples from the hierarchy generators in
+        to lists per object type, adding networks, DHCP ranges, hosts
+        and CNAMEs to csv_sets
+
+        Parameters:
+            rows (iterable): (object_type, row) tuples
+
+        Returns:
+            dict of lists keyed by object type
+        '''
+        sorted_rows:dict = { object_type: self.new_rows(object_type)
+                             for object_type in [ 'containers', 'networks',
+                                                  'dhcp_ranges', 
+                                                  'fixed_addresses', 'hosts',
+                                                  'cnames' ] }
+        for object_type, row in rows:
+            sorted_rows[object_type].append(row)
+
+        # DHCP ranges are recorded ahead of their networks
+        for object_type in [ 'dhcp_ranges', 'networks', 'fixed_addresses', 
+                             'hosts', 'cnames' ]:
+            if sorted_rows[object_type]:
+                self.add_rows(object_type, sorted_rows[object_type])
+
+        return sorted_rows
+
+
+    def new_rows(self, object_type:str):
+        '''
+        Empty row list for object type, a COLUMN_TABLE when columnar
+        '''
+        if self.columnar:
+            return COLUMN_TABLE(self.headers[object_type])
+
+        return []
+
+
+    def add_rows(self, object_type:str, rows:list):
+        '''
+        Add rows to csv_sets for object type
+
+        Parameters:
+            object_type (str): Object type key
+            rows (list): CSV rows
+        '''
+        if self.csv_sets.get(object_type):
+            self.csv_sets[object_type].extend(rows)
+        else:
+            self.csv_sets.update({ object_type: rows })
+
+        return
+
+class DATASET(NamedTuple):
+    '''
+    Generated object sets held by the generation service
+    '''
+    headers: dict
+    csv_sets: dict
+    bytes: int
+
+
+class DATASET_CACHE:
+    '''
+    Thread safe LRU cache of generated datasets bounded by size
+
+    Sizes are estimated from the rows held, least recently used
+    datasets are evicted until the total fits max_bytes. Misses are
+    generated one at a time, so concurrent requests for the same
+    dataset only generate it once.
+    '''
+
+    def __init__(self, max_bytes:int):
+        '''
+        Parameters:
+            max_bytes (int): Maximum estimated size of cached datasets
+        '''
+        self.max_bytes:int = max_bytes
+        self.datasets = collections.OrderedDict()
+        self.bytes:int = 0
+        self.hits:int = 0
+        self.misses:int = 0
+        self.evictions:int = 0
+        self.lock = threading.Lock()
+        self.generate_lock = threading.Lock()
+
+        return
+
+
+    def lookup(self, key) -> DATASET:
+        '''
+        Cached dataset for key, marked as most recently used
+
+        Returns:
+            DATASET or None
+        '''
+        with self.lock:
+            dataset = self.datasets.get(key)
+            if dataset is not None:
+                self.datasets.move_to_end(key)
+                self.hits += 1
+
+        return dataset
+
+
+    def get(self, key, generate) -> tuple:
+        '''
+        Cached dataset for key, generated with generate() on a miss
+
+        Parameters:
+            key: Hashable dataset key
+            generate (callable): Returns a DATASET
+
+        Returns:
+            (DATASET, hit) tuple
+        '''
+        dataset = self.lookup(key)
+        if dataset is not None:
+            return ( dataset, True )
+
+        with self.generate_lock:
+            dataset = self.lookup(key)
+            if dataset is not None:
+                return ( dataset, True )
+            dataset = generate()
+            self.add(key, dataset)
+
+        return ( dataset, False )
+
+
+    def add(self, key, dataset:DATASET):
+        '''
+        Cache dataset, evicting least recently used datasets to fit
+        '''
+        with self.lock:
+            self.misses += 1
+            if dataset.bytes > self.max_bytes:
+                logging.warning(f'Dataset of {dataset.bytes} bytes is larger '
+                                f'than the cache, not cached')
+                return
+            self.datasets[key] = dataset
+            self.bytes += dataset.bytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.datasets.popitem(last=False)
+                self.bytes -= evicted.bytes
+                self.evictions += 1
+
+        return
+
+
+    def stats(self) -> dict:
+        '''
+        Cache statistics
+        '''
+        with self.lock:
+            return { 'datasets': len(self.datasets),
+                     'bytes': self.bytes,
+                     'max_bytes': self.max_bytes,
+                     'hits': self.hits,
+                     'misses': self.misses,
+                     'evictions': self.evictions }
 
 
-class DEMODATA(METADATA):
+class DEMO_SERVICE:
+    '''
+    Long running generation service over local HTTP
+
+    GET /<object_type>?base=<network>&hosts=1&... streams the CSV of
+    one object type, or of all object types for /all, from the dataset
+    for the query parameters. GET /status returns cache statistics as
+    JSON. Datasets are cached by metadata hash, base network and the
+    generation options, normalised so that requests for the same data
+    share a cache entry. Errors are returned as plain text.
+    '''
+    # Query parameters and their types
+    PARAMS = { 'base': str,
+               'hosts': bool,
+               'hosts_per_network': int,
+               'cnames': float,
+               'fixed_addresses': int,
+               'records': bool,
+               'scale': int,
+               'dept_scale': int,
+               'seed': int }
 
     def __init__(self, 
-                 metadata:str = 'metadata.yaml',
-                 postfix:str = 'demo',
-                 include_countries:bool = False,
-                 include_locations:bool = False,
-                 include_networks:bool = False,
-                 include_dhcp:bool = False,
-                 include_hosts:bool = False):
+                 config:str = 'metadata.yaml',
+                 cache_bytes:int = 256 * 1024 * 1024,
+                 cache:bool = True,
+                 cache_dir:str = CACHE_DIR,
+                 workers:int = 1):
         '''
+        Parameters:
+            config (str): Metadata YAML file
+            cache_bytes (int): Maximum estimated size of cached datasets
+            cache (bool): Use the compiled metadata cache
+            cache_dir (str): Directory for compiled metadata
+            workers (int): Processes used to generate a dataset
         '''
-        super().__init__(metadata)
-        self.postfix = postfix
-        self.csv_sets:dict = {}
-        self.include_countries:bool = include_countries
-        self.include_locations:bool = include_locations
-        self.include_networks:bool = include_networks
-        self.include_dhcp:bool = include_dhcp
+        self.config:str = config
+        self.cache:bool = cache
+        self.cache_dir:str = cache_dir
+        self.workers:int = workers
+        self.datasets = DATASET_CACHE(cache_bytes)
+        # Default base network by metadata hash
+        self.base_networks:dict = {}
+        # Object types are fixed by the code, not the metadata
+        self.object_types = frozenset(METADATA(config, cache=cache, 
+                                               cache_dir=cache_dir).headers)
 
         return
-    
 
-    def open_csv(self, filename:str = 'data.csv') -> object:
+
+    def params(self, query:str) -> dict:
         '''
-        Attempt to open output file
+        Parse and validate query parameters
 
-        Parameters:
-            filename (str): Name of file to open.
+        Raises:
+            ValueError for unknown or invalid parameters
+        '''
+        params = { 'base': '', 'hosts': False, 'hosts_per_network': 0,
+                   'cnames': 0.0, 'fixed_addresses': 0, 'records': False,
+                   'scale': 1, 'dept_scale': 1, 'seed': None }
+        for name, values in urllib.parse.parse_qs(query, strict_parsing=False).items():
+            if name not in self.PARAMS:
+                raise ValueError(f'Unknown parameter {name}')
+            value = values[-1]
+            kind = self.PARAMS[name]
+            if kind is bool:
+                params[name] = value.lower() in [ '1', 'true', 'yes', 'on' ]
+            else:
+                params[name] = kind(value)
+        if params['base']:
+            params['base'] = ipaddress.ip_network(params['base'], 
+                                                  strict=False).exploded
+
+        return params
+
+
+    def dataset(self, params:dict) -> tuple:
+        '''
+        Dataset for params, from the cache or generated
 
         Returns:
-            file handler object.
+            (DATASET, hit) tuple
+        '''
+        with open(self.config, 'rb') as f:
+            metadata_hash = hashlib.sha256(f.read()).hexdigest()
+        params = self.normalise(params, metadata_hash)
+        key = ( metadata_hash, tuple(sorted(params.items())) )
+
+        return self.datasets.get(key, lambda: self.generate(params))
+
 
+    def normalise(self, params:dict, metadata_hash:str) -> dict:
         '''
-        if os.path.isfile(filename):
-            backup = filename+".bak"
-            try:
-                shutil.move(filename, backup)
-                logging.info("Outfile exists moved to {backup}")
-                try:
-                    handler = open(filename, mode='w')
-                    logging.info(f"Successfully opened output file {filename}.")
-                except IOError as err:
-                    logging.error(f"{err}")
-                    handler = False
-            except IOError:
-                logging.warning(f"Could not backup existing file {filename}.")
-                handler = False
-        else:
-            try:
-                handler = open(filename, mode='w')
-                logging.info(f"Successfully opened output file {filename}.")
-            except IOError as err:
-                logging.error(f"{err}")
-                handler = False
+        Params with the values DEMODATA would use, and defaults for
+        options that do not change the dataset
 
-        return handler
-    
-    
-    def output_csv(self,
-                   object_type:str = 'all',
-                   to_file:bool = False):
+        Returns:
+            dict of params
         '''
+        params = dict(params)
+        if not params['base']:
+            if metadata_hash not in self.base_networks:
+                metadata = METADATA(self.config, cache=self.cache, 
+                                    cache_dir=self.cache_dir)
+                self.base_networks[metadata_hash] = ipaddress.ip_network(
+                    metadata.base_network, strict=False).exploded
+            params['base'] = self.base_networks[metadata_hash]
+        params['scale'] = max(params['scale'], 1)
+        params['dept_scale'] = max(params['dept_scale'], 1)
+        params['cnames'] = min(max(params['cnames'], 0.0), 1.0)
+        params['fixed_addresses'] = max(params['fixed_addresses'], 0)
+        if not params['hosts']:
+            # Only used for host records
+            params.update(hosts_per_network=0, cnames=0.0, records=False)
+        if not params['hosts'] and not params['fixed_addresses']:
+            # Only used for host and fixed address device types
+            params['seed'] = None
+
+        return params
+
+
+    def generate(self, params:dict) -> DATASET:
         '''
-        if object_type == 'all':
-            # Output each section
-            for object in self.csv_sets.keys():
-                # Set output mechanism
-                if to_file:
-                    output = self.open_csv(filename=f'{object}_{self.postfix}.csv')
-                else:
-                    output = sys.stdout
+        Generate the dataset for params
+        '''
+        start = time.perf_counter()
+        d = DEMODATA(metadata=self.config,
+                     cache=self.cache,
+                     cache_dir=self.cache_dir,
+                     include_countries=True, 
+                     include_locations=True, 
+                     include_networks=True, 
+                     include_dhcp=True,
+                     include_hosts=params['hosts'],
+                     include_records=params['records'],
+                     hosts_per_network=params['hosts_per_network'],
+                     fixed_per_network=params['fixed_addresses'],
+                     cname_fraction=params['cnames'],
+                     seed=params['seed'],
+                     scale=params['scale'],
+                     dept_scale=params['dept_scale'],
+                     workers=self.workers)
+        csv_sets = d.gen_sets(base=params['base'])
+        if d.plan and d.plan['errors']:
+            raise ValueError(' '.join(d.plan['errors']))
+        # Row data plus list and str object overhead
+        size = sum(len(row) + 57 for rows in csv_sets.values() for row in rows)
+        logging.info(f'Generated dataset of {size} bytes in '
+                     f'{time.perf_counter() - start:.3f}s')
+
+        return DATASET(headers=dict(d.headers), csv_sets=csv_sets, bytes=size)
+
+
+    def serve(self, host:str = '127.0.0.1', port:int = 8080):
+        '''
+        Serve requests until interrupted
+        '''
+        server = http.server.ThreadingHTTPServer(( host, port ), DEMO_HANDLER)
+        server.service = self
+        logging.info(f'Serving on http://{host}:{server.server_port}/')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
 
-                # Output header for object
-                header = self.headers.get(object)
-                print(header, file=output)
-                # Ouput lines
-                for line in self.csv_sets[object]:
-                    print(line, file=output)
-        elif object_type in self.csv_sets.keys():
-            # Set output mechanism
-            if to_file:
-                output = self.open_csv(filename=f'{object_type}_{self.postfix}.csv')
-            else:
-                output = sys.stdout
-
-            # Output header for object
-            header = self.headers.get(object_type)
-            print(header, file=output)
-            # Ouput lines
-            for line in self.csv_sets[object_type]:
-                print(line, file=output)
-        
-        else:
-            logging.error(f'No data generated for object type: {object_type}')
-        
         return
 
 
-    def get_header_for_obj(self, object_type:str=''):
-        '''
-        '''
-        # Match object type and return header
-        return self.headers.get(object_type)
+class DEMO_HANDLER(http.server.BaseHTTPRequestHandler):
+    '''
+    HTTP request handler for DEMO_SERVICE
+    '''
 
+    def do_GET(self):
+        service = self.server.service
+        url = urllib.parse.urlsplit(self.path)
+        object_type = url.path.strip('/') or 'all'
+
+        if object_type == 'status':
+            body = json.dumps(service.datasets.stats()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if object_type != 'all' and object_type not in service.object_types:
+            self.send_text(404, f'Unknown object type: {object_type}')
+            return
+        try:
+            params = service.params(url.query)
+        except ValueError as err:
+            self.send_text(400, str(err))
+            return
+        try:
+            dataset, hit = service.dataset(params)
+        except ValueError as err:
+            # Layout does not fit the base network
+            self.send_text(400, str(err))
+            return
+        except Exception as err:
+            logging.exception('Dataset generation failed')
+            self.send_text(500, str(err))
+            return
 
-    def gen_data(self, base:str='', to_file:bool=False, object_type:str=''):
-        '''
-        '''
-        if base:
-            self.gen_networks(base=base)
-        else:
-            self.gen_networks()
-        self.gen_zones()
-        self.gen_reverse()
-        self.gen_hosts()
-        
-        if object:
-            self.output_csv(object_type=object_type, to_file=to_file)
+        if object_type == 'all':
+            objects = DEMODATA.dependency_order(dataset.csv_sets)
+        elif object_type in dataset.csv_sets:
+            objects = [ object_type ]
         else:
-            self.output_csv(to_file=to_file)
+            self.send_text(404, f'No data generated for object type: {object_type}')
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('X-Cache', 'HIT' if hit else 'MISS')
+        self.end_headers()
+        # Stream in batches, the response ends when the connection closes
+        try:
+            for object in objects:
+                self.wfile.write((dataset.headers[object] + '\n').encode('utf-8'))
+                lines = dataset.csv_sets[object]
+                for i in range(0, len(lines), 10000):
+                    self.wfile.write(( '\n'.join(lines[i:i + 10000]) + '\n' )
+                                     .encode('utf-8'))
+        except ( BrokenPipeError, ConnectionResetError ):
+            logging.debug('Client closed connection')
 
         return
-    
 
-    def gen_networks(self, 
-                       base:str = ''):
+
+    def send_text(self, status:int, text:str):
         '''
+        Send a plain text response, used for errors
         '''
-        if base:
-            self.base_network = base
-        else:
-            base = self.base_network
+        body = ( text + '\n' ).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-        container_csv:list = []
-        regions = self.regions()
-        base_block = ipaddress.ip_network(base)
-        next_prefix = int(base_block.prefixlen + math.sqrt(len(regions)) + 1)
-        sub_blocks = list(base_block.subnets(new_prefix=next_prefix))
+        return
 
-        # Create Top Level container
-        container_csv.append(f'networkcontainer,{base_block.network_address.exploded},'
-              f'{base_block.prefixlen},default,,,,,,,,No,,')
 
-        # Create block per Region
-        if len(regions) < len(sub_blocks):
-            index = 0
-            for region in regions:
-                subnet = ipaddress.ip_network(sub_blocks[index])
-                container_csv.append(f'networkcontainer,{subnet.network_address.exploded},'
-                                     f'{subnet.prefixlen},default,'
-                                     f'{region},OVERRIDE,,,,,,No,,')
+    def log_message(self, format:str, *args):
+        logging.info(f'{self.address_string()} {format % args}')
 
-                # Add countries if included
-                if self.include_countries:
-                    container_csv.extend(self.country_containers(subnet=subnet, 
-                                                                region=region))
-                elif self.include_locations:
-                    logging.warning(f'To create city containers for {region} include_country=True is required')
+        return
 
-                index += 1
-        else:
-            logging.error(f'Base subnet {base} cannot be subnetted in'
-                          f'to {len(regions)} regions.')
 
-        if container_csv:
-            self.csv_sets.update({ 'containers': container_csv})
+### Functions ###
 
 
-        return self.csv_sets
+# Per process DEMODATA object used by process pool workers
+_worker_data = None
 
+def _init_worker(demodata:DEMODATA):
+    '''
+    Process pool initialiser, keeps a copy of the DEMODATA object
+    so that it is only pickled once per worker
+    '''
+    global _worker_data
+    _worker_data = demodata
 
-    def country_containers(self, 
-                           subnet:ipaddress.ip_network, 
-                           region:str):
-        '''
-        '''
-        container_csv:list = []
+    return
 
-        countries = self.countries(region=region)
-        # Create block per country 
-        country_prefix = int(subnet.prefixlen + math.sqrt(len(countries))+2)
-        country_blocks = list(subnet.subnets(new_prefix=country_prefix))
-        if len(countries) < len(country_blocks):
-            index = 0
-            for country in countries:
-                sub = ipaddress.ip_network(country_blocks[index])
-                container_csv.append(f'networkcontainer,{sub.network_address.exploded},'
-                                     f'{sub.prefixlen},default,,'
-                                     f'INHERIT,{country},OVERRIDE,,,,No,,')
-                # Add locations if included
-                if self.include_locations:
-                    container_csv.extend(self.location_containers(subnet=sub, 
-                                                                  country=country))
-                index += 1
-
-        else:
-            logging.error(f'subnet {subnet} cannot be subnetted in'
-                        f'to {len(countries)} countries.')
 
-        return container_csv
+def _country_rows(address:int, prefixlen:int, version:int, country:str) -> list:
+    '''
+    Generate the subtree for a country in a worker process
 
+    Returns:
+        (rows, dhcp_seconds, host_seconds) tuple, rows is a list of
+        (object_type, row) tuples
+    '''
+    subnet = NETBLOCK(address, prefixlen, version)
+    _worker_data.dhcp_seconds = 0.0
+    _worker_data.host_seconds = 0.0
+    rows = list(_worker_data.iter_country(subnet=subnet, country=country))
 
-    def location_containers(self, 
-                            subnet:ipaddress.ip_network, 
-                            country:str):
-        '''
-        '''
-        container_csv:list = []
+    return ( rows, _worker_data.dhcp_seconds, _worker_data.host_seconds )
 
-        locations = self.locations(country=country)
-        # Create block per country 
-        prefix = int(subnet.prefixlen + math.sqrt(len(locations))+2)
-        if prefix < 29:
-            blocks = list(subnet.subnets(new_prefix=prefix))
-            if len(locations) < len(blocks):
-                index = 0
-                for location in locations:
-                    sub = ipaddress.ip_network(blocks[index])
-                    container_csv.append(f'networkcontainer,{sub.network_address.exploded},'
-                                        f'{sub.prefixlen},default,,'
-                        f'INHERIT,,INHERIT,{location},OVERRIDE,,No,,')
-                    # Add networks if included
-                    if self.include_networks:
-                        self.create_networks(subnet=sub, location=country)
-                    index += 1
-                    # Check for out of bounds
-                    if index > len(blocks):
-                        break
 
-            else:
-                logging.error(f'subnet {subnet} cannot be subnetted in'
-                            f'to {len(locations)} countries.')
-        else:
-            logging.debug('Prefix too small - unable to create location blocks')
+def int_to_address(value:int, version:int = 4) -> str:
+    '''
+    Convert integer address to exploded string form
 
-        return container_csv
+    Parameters:
+        value (int): Address as an integer
+        version (int): IP version, 4 or 6
 
+    Returns:
+        Address as a string
+    '''
+    if version == 4:
+        return socket.inet_ntoa(value.to_bytes(4, 'big'))
 
-    def create_networks(self, 
-                        subnet:ipaddress.ip_network,
-                        location:str):
-        '''
-        '''
-        networks:list = []
-        dhcp_csv:list = []
-        departments = self.departments()
-        reverse:str = 'FALSE'
+    digits = value.to_bytes(16, 'big').hex()
 
-        # Gen prefix
-        prefix = int(subnet.prefixlen + math.sqrt(len(departments))+2)
-        # Don't create networks larger that /24
-        if prefix < 24:
-            logging.debug('Adjusting prefix for networks to /24')
-            prefix = 24
-        elif prefix > 30:
-            logging.debug('Adjusting prefix for networks to /30')
-            prefix = 30
-        else:
-            logging.debug(f'Prefix for networks set to /{prefix}')
-        
-        subnets = list(subnet.subnets(new_prefix=prefix))
-        if len(departments) < len(subnets):
-            index = 0
-            for dept in departments:
-                sub = ipaddress.ip_network(subnets[index])
-                gw = str(sub.network_address + 1)
-                # Auto create reverse zone flag
-                if sub.prefixlen == 24:
-                    reverse = 'TRUE'
-                else:
-                    reverse = 'FALSE'
-                # Gen network CSV
-                networks.append(f'network,{sub.network_address.exploded},'
-                                f'{sub.netmask.exploded},{gw},FALSE,{reverse},FALSE,,'
-                                f'INHERIT,,INHERIT,,INHERIT,{dept},')
-                # Add networks if included
-                if self.include_dhcp:
-                    dhcp_csv.append(self.dhcp_range(subnet=sub))
-                index += 1
-                # Check for out of bounds
-                if index > len(subnets):
-                    break
+    return ':'.join([ digits[i:i + 4] for i in range(0, 32, 4) ])
 
-        else:
-            logging.error(f'subnet {subnet} cannot be subnetted in'
-                          f'to {len(self.departments())} countries.')
-        
-        # Update csv_sets
-        if networks:
-            if self.csv_sets.get('networks'):
-                self.csv_sets['networks'].extend(networks)
-            else:
-                self.csv_sets.update({'networks': networks })
 
-        return networks
-        
+def address_to_int(address:str, version:int = 4) -> int:
+    '''
+    Convert an address string to an integer
 
-    def dhcp_range(self, 
-                   subnet:ipaddress.ip_network):
-        '''
-        Generate DHCP Ranges
-    
-        '''
-        net_size = subnet.num_addresses
-        if net_size > 254:
-            range_size = 253
-        elif net_size > 15:
-            range_size = int(net_size / 2)
-        else:
-            range_size = int(net_size)
-        broadcast = subnet.broadcast_address
-        start_ip = str(broadcast - (range_size + 1))
-        end_ip = str(broadcast - 1)
-        logging.debug(f"Creating Range start: {start_ip}, end: {end_ip}")
+    Parameters:
+        address (str): IPv4 or IPv6 address
+        version (int): IP version, 4 or 6
 
-        range = f'DhcpRange,{start_ip},{end_ip}'
-        
-        if self.csv_sets.get('dhcp_ranges'):
-            self.csv_sets['dhcp_ranges'].extend([ range ])
-        else:
-            self.csv_sets.update({'dhcp_ranges': [ range ] })
+    Returns:
+        Address as an integer
+    '''
+    if version == 4:
+        return int.from_bytes(socket.inet_aton(address), 'big')
 
-        return range
+    return int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
 
 
-    def gen_zones(self):
-        '''
-        '''
-        dns_view = self.dns_view()
-        nsg = self.name_server_group()
-        zones = self.auth_zones()
-        lines:list = []
+def reverse_name(address:str, version:int = 4) -> str:
+    '''
+    in-addr.arpa or ip6.arpa owner name of an address
+    '''
+    if version == 4:
+        return '.'.join(address.split('.')[::-1]) + '.in-addr.arpa'
 
-        # Gen NSG CSV
-        self.csv_sets.update({ 'nsg': [ f'nsgroup,{nsg},,,TRUE' ] })
+    digits = address_to_int(address, 6).to_bytes(16, 'big').hex()
 
-        for z in zones:
-            lines.append(f'authzone,{z},FORWARD,{dns_view},{nsg},demo@infoblox.com')
-        
-        if self.csv_sets.get('auth_zones'):
-            self.csv_sets['auth_zones'].extend(lines)
-        else:
-            self.csv_sets.update({'auth_zones': lines })
+    return '.'.join(digits[::-1]) + '.ip6.arpa'
 
-        return lines
-    
 
-    def gen_reverse(self, prefix:int = 16, base:str = ''):
-        '''
-        '''
-        lines:list = []
-        subnets:list = []
-        dns_view = self.dns_view()
-        nsg = self.name_server_group()
-        supported_prefixes = [ 8, 16, 24 ]
+def block_bits(sizes) -> int:
+    '''
+    Host bits of the smallest block holding child blocks of 2**bits
+    for each bits in sizes, packed largest first
+    '''
+    total = sum( 1 << bits for bits in sizes )
 
-        if prefix not in supported_prefixes:
-            if prefix > 8 and prefix < 16:
-                prefix = 8
-                logging.warning(f'Adjusting prefix to /{prefix}')
-            elif prefix > 16 and prefix < 24:
-                prefix = 16
-                logging.warning(f'Adjusting prefix to /{prefix}')
-            elif prefix > 24:
-                prefix = 24
-                logging.warning(f'Adjusting prefix to /{prefix}')
-            else:
-                # Adjusting to default /16
-                prefix = 16
-                logging.warning(f'Adjusting prefix to default /{prefix}')
+    return max(total - 1, 0).bit_length()
 
-        # Check for base network
-        if base:
-            self.base_network = base
 
-        if self.base_network:
-            net = ipaddress.ip_network(self.base_network)
-            if net.prefixlen == prefix:
-                # Just create reverse for prefix
-                lines.append(f'authzone,{net.exploded},IPv4,{dns_view},{nsg},demo@infoblox.com')
-            elif net.prefixlen > prefix:
-                rnet = net.supernet(new_prefix=prefix)
-                lines.append(f'authzone,{rnet.exploded},IPv4,{dns_view},{nsg},demo@infoblox.com')
-            else:
-                subnets = list(net.subnets(new_prefix=prefix))
-                for net in subnets:
-                    lines.append(f'authzone,{net.exploded},IPv4,{dns_view},{nsg},demo@infoblox.com')
+def merge_intervals(intervals:list) -> list:
+    '''
+    Merge (start, end) integer intervals in to a sorted list of
+    disjoint intervals, joining intervals that overlap or touch
 
+    Parameters:
+        intervals (list): (start, end) tuples, end inclusive
+
+    Returns:
+        list of (start, end) tuples in order
+    '''
+    merged:list = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = ( merged[-1][0], end )
         else:
-            logging.error('Base network not set. (Either call gen_networks,'
-                          ' or set base parameter)')
-        
-        if self.csv_sets.get('auth_zones'):
-            self.csv_sets['auth_zones'].extend(lines)
-        else:
-            self.csv_sets.update({'auth_zones': lines })
+            merged.append(( start, end ))
 
-        return lines
-        
-        
+    return merged
 
-    def gen_hosts(self, 
-                  zone:str='infoblox.test', 
-                  dns_view:str='Internal DNS'):
-        '''
-        '''
-        return
 
-### Functions ###
+def synthetic_mac(address:int) -> str:
+    '''
+    Locally administered MAC address derived from an IPv4 address
+
+    Parameters:
+        address (int): Address as an integer
+
+    Returns:
+        MAC address as a string
+    '''
+    return ( 0x020000000000 | address ).to_bytes(6, 'big').hex(':')
+
+
+def synthetic_duid(address:int) -> str:
+    '''
+    DUID-UUID (RFC 6355) holding all 128 bits of an IPv6 address
+
+    Parameters:
+        address (int): Address as an integer
+
+    Returns:
+        DUID as a string
+    '''
+    return '00:04:' + address.to_bytes(16, 'big').hex(':')
+
 
 def parseargs():
     '''
@@ -686,6 +4910,62 @@ def parseargs():
                         help='Output CSVs to file')
     parse.add_argument('-o', '--object', type=str, default='all',
                        help='Output specified object only')
+    parse.add_argument('--scale', type=int, default=1,
+                       help='Number of sites to generate per location')
+    parse.add_argument('--dept-scale', type=int, default=1,
+                       help='Number of networks per department per site')
+    parse.add_argument('--hosts', action='store_true',
+                       help='Generate host records for each network')
+    parse.add_argument('--records', action='store_true',
+                       help='Create A/AAAA and PTR records for the hosts, '
+                            'hosts are then not configured for DNS')
+    parse.add_argument('--hosts-per-network', type=int, default=0,
+                       help='Maximum hosts per network, 0 for all free addresses')
+    parse.add_argument('--fixed-addresses', type=int, default=0,
+                       help='Fixed address reservations per network')
+    parse.add_argument('--cnames', type=float, default=0.0,
+                       help='Fraction of hosts to create CNAME aliases for')
+    parse.add_argument('--seed', type=int,
+                       help='Seed for randomised values e.g. device types')
+    parse.add_argument('-i', '--incremental', action='store_true',
+                       help='Reuse cached rows for unchanged regions')
+    parse.add_argument('-w', '--workers', type=int, default=1,
+                       help='Number of worker processes for generation')
+    parse.add_argument('-s', '--stream', action='store_true',
+                       help='Stream rows to output as they are generated')
+    parse.add_argument('--no-cache', action='store_true',
+                       help='Do not use the compiled metadata cache')
+    parse.add_argument('--cache-dir', type=str, default=CACHE_DIR,
+                       help='Override compiled metadata cache directory')
+    parse.add_argument('--wapi', type=str, default='',
+                       help='Create objects via this WAPI URL instead of ' +
+                            'outputting CSV, e.g. https://gm/wapi/v2.11')
+    parse.add_argument('-u', '--user', type=str, default='',
+                       help='WAPI username (prompted if not given)')
+    parse.add_argument('--wapi-batch', type=int, default=1000,
+                       help='Objects per WAPI /request call (default: 1000)')
+    parse.add_argument('--wapi-concurrency', type=int, default=4,
+                       help='WAPI /request calls in flight (default: 4)')
+    parse.add_argument('-z', '--compress', type=str, choices=[ 'gzip', 'zstd' ],
+                       default='', help='Compress files written with -f')
+    parse.add_argument('--shards', type=int, default=0,
+                       help='Split each object set in to this many -f files')
+    parse.add_argument('--shard-rows', type=int, default=0,
+                       help='Maximum rows per -f file when sharding')
+    parse.add_argument('--columnar', action='store_true',
+                       help='Hold generated rows as typed columns')
+    parse.add_argument('--export', type=str, choices=[ 'parquet', 'arrow' ],
+                       help='Also export each object type as Parquet or Arrow')
+    parse.add_argument('--plan', action='store_true',
+                       help='Print the planned address layout and exit')
+    parse.add_argument('-p', '--profile', action='store_true',
+                       help='Save per stage timings to profile_<postfix>.json')
+    parse.add_argument('--cprofile', action='store_true',
+                       help='Save cProfile stats to profile_<postfix>.prof')
+    parse.add_argument('--serve', type=str, default='',
+                       help='Serve generated CSV over HTTP on [HOST:]PORT')
+    parse.add_argument('--cache-mb', type=int, default=256,
+                       help='Dataset cache size for --serve in MB')
     parse.add_argument('-d', '--debug', action='store_true', 
                         help="Enable debug messages")
 
@@ -723,14 +5003,82 @@ def main():
     args = parseargs()
     setup_logging(args.debug)
 
-    d = DEMODATA(include_countries=True, 
+    if args.serve:
+        host, _, port = args.serve.rpartition(':')
+        service = DEMO_SERVICE(config=args.config,
+                               cache_bytes=args.cache_mb * 1024 * 1024,
+                               cache=not args.no_cache,
+                               cache_dir=args.cache_dir,
+                               workers=args.workers)
+        service.serve(host=host or '127.0.0.1', port=int(port))
+        return 0
+
+    if args.compress == 'zstd' and zstandard is None:
+        logging.error('zstd output requires the zstandard package')
+        return 1
+    if args.compress and not args.file:
+        logging.warning('Compression only applies to -f output')
+    if ( args.shards or args.shard_rows ) and not args.file:
+        logging.warning('Sharding only applies to -f output')
+    if ( args.shards or args.shard_rows ) and args.stream:
+        logging.error('Sharding is not available in streaming mode')
+        return 1
+
+    d = DEMODATA(metadata=args.config,
+                 cache=not args.no_cache,
+                 cache_dir=args.cache_dir,
+                 include_countries=True, 
                  include_locations=True, 
                  include_networks=True, 
-                 include_dhcp=True)
+                 include_dhcp=True,
+                 include_hosts=args.hosts,
+                 include_records=args.records,
+                 hosts_per_network=args.hosts_per_network,
+                 fixed_per_network=args.fixed_addresses,
+                 cname_fraction=args.cnames,
+                 seed=args.seed,
+                 incremental=args.incremental,
+                 profile=args.profile,
+                 cprofile=args.cprofile,
+                 columnar=args.columnar,
+                 compression=args.compress if args.file else '',
+                 shards=args.shards,
+                 shard_rows=args.shard_rows,
+                 streaming=args.stream,
+                 scale=args.scale,
+                 dept_scale=args.dept_scale,
+                 workers=args.workers)
+    if args.plan:
+        plan = d.fit_layout(base=args.base)
+        print(json.dumps(plan, indent=2))
+        return 1 if plan['errors'] else 0
+
+    client = None
+    if args.wapi:
+        if wapi is None:
+            logging.error('WAPI import requires the requests package')
+            return 1
+        user = args.user or input('Username: ')
+        client = wapi.WAPI_CLIENT(args.wapi, user, getpass.getpass('Password: '),
+                                  concurrency=args.wapi_concurrency)
+
     if args.base:
-        d.gen_data(base=args.base, object_type=args.object, to_file=args.file)
+        ok = d.gen_data(base=args.base, object_type=args.object, to_file=args.file,
+                        client=client, wapi_batch=args.wapi_batch)
     else:
-        d.gen_data(object_type=args.object, to_file=args.file)
+        ok = d.gen_data(object_type=args.object, to_file=args.file,
+                        client=client, wapi_batch=args.wapi_batch)
+
+    if client is not None:
+        client.close()
+    if not ok:
+        return 1
+
+    if args.export:
+        if args.stream:
+            logging.error('Export is not available in streaming mode')
+        else:
+            d.export_columns(format=args.export, object_type=args.object)
 
     return
 
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Local mock WAPI server for testing WAPI pushes
+
+ Accepts multi-object /request calls and applies each call as a
+ whole, like a Grid Master. Items can create (POST), look up (GET,
+ with assign_state) and delete (DELETE, with ##STATE:<name>:##
+ substitution) objects. Creating an object that already exists
+ rejects the call with an IBDataConflictError. The server can be set
+ to fail with 503 after a number of objects, to stand in for a Grid
+ Master going away part way through a load.
+
+ Requirements:
+   Python 3
+
+ Usage: <scriptname> [options]
+        -p, --port        port to listen on
+        --fail-after      fail with 503 after this many objects
+        -h                help
+
+ Author: Chris Marrison
+ Email: chris@infoblox.com
+
+----------------------------------------------------------------------
+"""
+
+__version__ = '0.0.1'
+__author__ = 'Chris Marrison'
+
+import argparse
+import http.server
+import json
+import logging
+import threading
+
+
+class MOCK_WAPI:
+    '''
+    In memory WAPI object store served over local HTTP
+    '''
+
+    def __init__(self, host:str = '127.0.0.1', port:int = 0,
+                 fail_after:int = None):
+        '''
+        Parameters:
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 for any free port
+            fail_after (int): Fail every call with 503 once this many
+                              objects have been created, None to never fail
+        '''
+        self.fail_after = fail_after
+        self.objects:dict = {}
+        self.items:dict = {}
+        self.created:int = 0
+        self.calls:int = 0
+        self.conflicts:int = 0
+        self.lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer(( host, port ),
+                                                      MOCK_HANDLER)
+        self.server.wapi = self
+        self.thread = None
+
+        return
+
+
+    @property
+    def url(self) -> str:
+        '''
+        Base WAPI URL of the server
+        '''
+        host, port = self.server.server_address[:2]
+
+        return f'http://{host}:{port}/wapi/v2.11'
+
+
+    def start(self):
+        '''
+        Serve requests on a background thread
+        '''
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+        return
+
+
+    def stop(self):
+        '''
+        Stop serving and close the socket
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+
+        return
+
+
+    def key(self, item:dict) -> str:
+        '''
+        Identity of the object an item creates
+        '''
+        data = { k: v for k, v in item.get('data', {}).items()
+                 if k != 'extattrs' }
+
+        return item['object'] + ':' + json.dumps(data, sort_keys=True)
+
+
+    def request(self, items:list) -> tuple:
+        '''
+        Apply a /request call, creating all of its objects or none
+
+        Returns:
+            (status, body) tuple
+        '''
+        with self.lock:
+            self.calls += 1
+            if ( self.fail_after is not None and
+                 len(self.objects) >= self.fail_after ):
+                return ( 503, { 'Error': 'Service Unavailable' } )
+
+            # Applied to copies, kept only if every item succeeds
+            objects = dict(self.objects)
+            refs = dict(self.items)
+            created = self.created
+            state:dict = {}
+            results:list = []
+            for item in items:
+                method = item.get('method')
+                if method not in ( 'POST', 'GET', 'DELETE' ) or 'object' not in item:
+                    return self.error('AdmConProtoError: Invalid item', item)
+                if method == 'POST':
+                    key = self.key(item)
+                    if key in objects:
+                        self.conflicts += 1
+                        return self.error(f"IBDataConflictError: IB.Data.Conflict:"
+                                          f"The object {item['object']} already exists.")
+                    result = f"{item['object']}/{created}:default"
+                    created += 1
+                    objects[key] = result
+                    refs[result] = item
+                elif method == 'GET':
+                    data = item.get('data', {})
+                    result = [ { '_ref': ref, **found['data'] }
+                               for ref, found in refs.items()
+                               if found['object'] == item['object'] and
+                                  all(found['data'].get(k) == v
+                                      for k, v in data.items()) ]
+                    for name, field in item.get('assign_state', {}).items():
+                        if result:
+                            state[name] = result[0][field]
+                else:
+                    result = item['object']
+                    if item.get('enable_substitution'):
+                        for name, value in state.items():
+                            result = result.replace(f'##STATE:{name}:##', value)
+                    if result not in refs:
+                        return self.error(f'AdmConDataNotFound: Reference '
+                                          f'{result} not found')
+                    del objects[self.key(refs.pop(result))]
+                if not item.get('discard'):
+                    results.append(result)
+
+            self.objects = objects
+            self.items = refs
+            self.created = created
+
+        return ( 200, results )
+
+
+    def error(self, text:str, item:dict = None) -> tuple:
+        '''
+        Rejected /request call
+
+        Returns:
+            (status, body) tuple
+        '''
+        if item is not None:
+            return ( 400, { 'Error': text, 'text': f'Invalid item {item}' } )
+
+        return ( 400, { 'Error': text, 'text': text } )
+
+
+class MOCK_HANDLER(http.server.BaseHTTPRequestHandler):
+    '''
+    HTTP request handler for MOCK_WAPI
+    '''
+
+    def do_POST(self):
+        wapi = self.server.wapi
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            items = json.loads(self.rfile.read(length) or b'null')
+        except ValueError:
+            items = None
+
+        if not self.path.rstrip('/').endswith('/request'):
+            status, body = ( 404, { 'Error': 'Unknown path', 'text': self.path } )
+        elif not isinstance(items, list):
+            status, body = ( 400, { 'Error': 'AdmConProtoError: Expected a list',
+                                    'text': 'Expected a list' } )
+        else:
+            status, body = wapi.request(items)
+
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+        return
+
+
+    def log_message(self, format:str, *args):
+        logging.debug(f'{self.address_string()} {format % args}')
+
+        return
+
+
+def parseargs():
+    '''
+    Parse Arguments Using argparse
+
+    Returns:
+        Returns parsed arguments
+    '''
+    parse = argparse.ArgumentParser(description='Local mock WAPI server')
+    parse.add_argument('-p', '--port', type=int, default=8443,
+                       help='Port to listen on')
+    parse.add_argument('--fail-after', type=int, default=None,
+                       help='Fail with 503 after this many objects')
+
+    return parse.parse_args()
+
+
+def main():
+    '''
+    Serve until interrupted
+    '''
+    args = parseargs()
+    logging.basicConfig(level=logging.DEBUG,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+    wapi = MOCK_WAPI(port=args.port, fail_after=args.fail_after)
+    logging.info(f'Serving mock WAPI on {wapi.url}')
+    try:
+        wapi.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        wapi.server.server_close()
+        logging.info(f'{len(wapi.objects)} objects created')
+
+    return 0
+
+
+### Main ###
+if __name__ == '__main__':
+    exitcode = main()
+    exit(exitcode)
+## End Main ###
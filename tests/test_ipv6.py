@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for a run with an IPv6 base network
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import re
+import sys
+import csv
+import ipaddress
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+BASE = 'fd00::/32'
+
+
+class TEST_IPV6(unittest.TestCase):
+    '''
+    Networks, reverse zones, AAAA/PTR records and DUIDs for an IPv6 base
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        d = gen_demo_data.DEMODATA(
+                metadata=os.path.join(ROOT, 'metadata.yaml'),
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                include_dhcp=True,
+                include_hosts=True,
+                include_records=True,
+                hosts_per_network=3,
+                fixed_per_network=2)
+        cls.d = d
+        cls.csv_sets = d.gen_sets(base=BASE)
+        cls.rows = { object_type: list(csv.reader(rows))
+                     for object_type, rows in cls.csv_sets.items() }
+
+        return
+
+
+    def networks(self) -> list:
+        return [ ipaddress.ip_network(f'{row[1]}/{row[2]}')
+                 for row in self.rows['networks'] ]
+
+
+    def reverse_zones(self) -> list:
+        return [ ipaddress.ip_network(row[1]) for row in self.rows['auth_zones']
+                 if row[2] == 'IPv6' ]
+
+
+    def test_networks(self):
+        base = ipaddress.ip_network(BASE)
+        self.assertTrue(self.d.headers['networks'].startswith('header-ipv6network,'))
+        networks = self.networks()
+        self.assertGreater(len(networks), 0)
+        for network in networks:
+            self.assertEqual(network.prefixlen, gen_demo_data.IPV6_NETWORK_PREFIX)
+            self.assertTrue(network.subnet_of(base), network)
+        for row in self.rows['dhcp_ranges']:
+            start = ipaddress.ip_address(row[1])
+            end = ipaddress.ip_address(row[2])
+            self.assertLessEqual(int(end) - int(start) + 1,
+                                 gen_demo_data.IPV6_RANGE)
+
+        return
+
+
+    def test_reverse_zones(self):
+        zones = self.reverse_zones()
+        self.assertGreater(len(zones), 0)
+        for zone in zones:
+            # ip6.arpa zones are delegated on nibble boundaries
+            self.assertEqual(zone.prefixlen % 4, 0, zone)
+        for network in self.networks():
+            self.assertEqual(len([ zone for zone in zones
+                                   if network.subnet_of(zone) ]), 1, network)
+
+        return
+
+
+    def test_records(self):
+        hosts = { row[1]: row[3] for row in self.rows['hosts'] }
+        forward = [ row[1] for row in self.rows['auth_zones']
+                    if row[2] == 'FORWARD' ]
+        zones = self.reverse_zones()
+
+        self.assertTrue(self.d.headers['a_records'].startswith('header-AaaaRecord,'))
+        self.assertEqual(len(self.rows['a_records']), len(hosts))
+        self.assertEqual(len(self.rows['ptr_records']), len(hosts))
+        for _, fqdn, _, address, _ in self.rows['a_records']:
+            self.assertEqual(hosts[address], fqdn)
+            self.assertTrue(any(fqdn.endswith('.' + zone) for zone in forward),
+                            fqdn)
+            self.assertTrue(any(ipaddress.ip_address(address) in zone
+                                for zone in zones), address)
+        # Hosts are IPAM only when A and PTR records are created
+        for row in self.rows['hosts']:
+            self.assertEqual(row[2], 'FALSE')
+        names = { ipaddress.ip_address(address).reverse_pointer: fqdn
+                  for address, fqdn in hosts.items() }
+        for _, dname, fqdn, _, _ in self.rows['ptr_records']:
+            self.assertEqual(names[fqdn], dname)
+
+        return
+
+
+    def test_duids(self):
+        duid = re.compile('00:04(:[0-9a-f]{2}){16}$')
+        rows = self.rows['fixed_addresses']
+        self.assertTrue(self.d.headers['fixed_addresses']
+                        .startswith('header-ipv6fixedaddress,address*,duid*'))
+        self.assertEqual(len(rows), 2 * len(self.rows['networks']))
+        for row in rows:
+            self.assertRegex(row[2], duid)
+        self.assertEqual(len({ row[2] for row in rows }), len(rows))
+        self.assertEqual(len({ row[1] for row in rows }), len(rows))
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
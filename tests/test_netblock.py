@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for NETBLOCK address arithmetic and network allocation
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import sys
+import csv
+import ipaddress
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+from gen_demo_data import NETBLOCK
+
+
+class TEST_NETBLOCK(unittest.TestCase):
+    '''
+    Child blocks match ipaddress and stop at the end of the block
+    '''
+
+    def test_subnets(self):
+        for network, prefix in [ ( '10.0.0.0/22', 24 ),
+                                 ( '10.40.0.0/14', 29 ),
+                                 ( 'fd00::/48', 64 ) ]:
+            block = NETBLOCK.from_network(network)
+            expected = ipaddress.ip_network(network).subnets(new_prefix=prefix)
+            for sub, net in zip(block.subnets(new_prefix=prefix, count=20),
+                                expected):
+                self.assertEqual(sub.exploded, net.exploded)
+                self.assertEqual(sub.num_addresses, net.num_addresses)
+                self.assertEqual(sub.broadcast, int(net.broadcast_address))
+                if net.version == 4:
+                    self.assertEqual(sub.netmask, str(net.netmask))
+            self.assertEqual(block.subnet(3, prefix),
+                             NETBLOCK.from_network(list(ipaddress.ip_network(
+                                 network).subnets(new_prefix=prefix))[3]))
+
+        return
+
+
+    def test_exhaustion(self):
+        block = NETBLOCK.from_network('10.0.0.0/22')
+
+        self.assertEqual(block.num_subnets(24), 4)
+        self.assertEqual(len(list(block.subnets(new_prefix=24, count=10))), 4)
+        self.assertEqual(block.subnet(3, 24).exploded, '10.0.3.0/24')
+        with self.assertRaises(IndexError):
+            block.subnet(4, 24)
+        with self.assertRaises(IndexError):
+            block.subnet(-1, 24)
+        # Larger than the block, or longer than an address
+        self.assertEqual(block.num_subnets(20), 0)
+        self.assertEqual(block.num_subnets(33), 0)
+        self.assertEqual(list(block.subnets(new_prefix=20)), [])
+
+        return
+
+
+    def test_supernet(self):
+        block = NETBLOCK.from_network('10.0.1.0/24')
+
+        self.assertEqual(block.supernet(16).exploded, '10.0.0.0/16')
+        self.assertEqual(block.supernet(24), block)
+        with self.assertRaises(ValueError):
+            block.supernet(25)
+
+        return
+
+
+class TEST_ALLOCATION(unittest.TestCase):
+    '''
+    Generated networks are inside the base network and never overlap
+    '''
+
+    def demodata(self) -> gen_demo_data.DEMODATA:
+        return gen_demo_data.DEMODATA(
+                metadata=os.path.join(ROOT, 'metadata.yaml'),
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                scale=3)
+
+
+    def test_allocation(self):
+        d = self.demodata()
+        d.gen_networks()
+        base = ipaddress.ip_network(d.base_network)
+        networks = sorted(ipaddress.ip_network(f'{row[1]}/{row[2]}')
+                          for row in csv.reader(d.csv_sets['networks']))
+
+        self.assertGreater(len(networks), 0)
+        for network in networks:
+            self.assertTrue(network.subnet_of(base), network)
+        for previous, network in zip(networks, networks[1:]):
+            self.assertFalse(previous.overlaps(network), network)
+
+        return
+
+
+    def test_location_exhausted(self):
+        d = self.demodata()
+        # A /29 can not hold a network per department
+        with self.assertLogs(level='ERROR'):
+            rows = d.create_networks(subnet=NETBLOCK.from_network('10.0.0.0/29'),
+                                     location='London')
+
+        self.assertEqual(len(rows), 0)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
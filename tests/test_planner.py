@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for the up-front layout planner
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import ipaddress
+import tempfile
+import unittest
+import subprocess
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+
+class TEST_PLANNER(unittest.TestCase):
+    '''
+    Plan the layout for base networks that fit and that are too small
+    '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        return
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def demodata(self) -> gen_demo_data.DEMODATA:
+        return gen_demo_data.DEMODATA(
+                metadata=os.path.join(ROOT, 'metadata.yaml'),
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                include_dhcp=True)
+
+
+    def networks(self, d:gen_demo_data.DEMODATA) -> list:
+        return [ ipaddress.ip_network(f'{row[1]}/{row[2]}')
+                 for row in csv.reader(d.csv_sets['networks']) ]
+
+
+    def run_main(self, *args) -> subprocess.CompletedProcess:
+        return subprocess.run([ sys.executable,
+                                os.path.join(ROOT, 'gen_demo_data.py'),
+                                '-c', os.path.join(ROOT, 'metadata.yaml'),
+                                '--no-cache', *args ],
+                              capture_output=True, text=True, timeout=120,
+                              cwd=self.tmpdir.name)
+
+
+    def test_demo_layout(self):
+        d = self.demodata()
+        plan = d.fit_layout(base='10.40.0.0/14')
+
+        self.assertEqual(plan['errors'], [])
+        self.assertFalse(plan['compact'])
+        d.gen_sets(base='10.40.0.0/14')
+        self.assertEqual(len(self.networks(d)), plan['networks'])
+
+        return
+
+
+    def test_compact_layout(self):
+        d = self.demodata()
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertTrue(d.check_layout(base='10.0.0.0/19'))
+            # Only warned when the plan changes
+            self.assertTrue(d.check_layout(base='10.0.0.0/19'))
+
+        self.assertTrue(d.plan['compact'])
+        self.assertEqual(len([ line for line in logs.output
+                               if 'compact layout' in line ]), 1)
+        d.gen_sets(base='10.0.0.0/19')
+        networks = self.networks(d)
+        self.assertEqual(len(networks), d.plan['networks'])
+        base = ipaddress.ip_network('10.0.0.0/19')
+        for network in networks:
+            self.assertTrue(network.subnet_of(base), network)
+
+        return
+
+
+    def test_too_small(self):
+        d = self.demodata()
+        output = io.StringIO()
+        with self.assertLogs(level='ERROR'):
+            with contextlib.redirect_stdout(output):
+                self.assertFalse(d.gen_data(base='10.0.0.0/22'))
+
+        self.assertTrue(d.plan['errors'])
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual(d.stage_stats, [])
+
+        return
+
+
+    def test_main_exit(self):
+        result = self.run_main('-b', '10.0.0.0/22', '-f')
+
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, '')
+        self.assertIn('cannot be subnetted', result.stderr)
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+        result = self.run_main('-b', '10.0.0.0/22', '--plan')
+        self.assertEqual(result.returncode, 1)
+        self.assertTrue(json.loads(result.stdout)['errors'])
+
+        result = self.run_main('-b', '10.0.0.0/19', '--plan')
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(json.loads(result.stdout)['errors'], [])
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for DEMODATA.push_wapi() against the local mock WAPI server
+
+ Requirements:
+   Python 3, requests, gen_demo_data.py, wapi.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wapi
+import gen_demo_data
+from mock_wapi import MOCK_WAPI
+
+
+class TEST_PUSH_WAPI(unittest.TestCase):
+    '''
+    Load a generated data set through the mock WAPI server
+    '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmpdir.name, 'checkpoint.json')
+        self.mock = MOCK_WAPI()
+        self.mock.start()
+        self.client = wapi.WAPI_CLIENT(self.mock.url, concurrency=4,
+                                       retries=0, backoff=0)
+        self.d = gen_demo_data.DEMODATA(
+                    metadata=os.path.join(ROOT, 'metadata.yaml'),
+                    cache=False,
+                    include_countries=True,
+                    include_locations=True,
+                    include_networks=True,
+                    include_dhcp=True)
+        self.d.gen_networks()
+        self.d.gen_zones()
+        self.items = [ self.d.wapi_item(object, row)
+                       for object, rows in self.d.object_phases()
+                       for row in rows ]
+
+        return
+
+
+    def tearDown(self):
+        self.client.close()
+        self.mock.stop()
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def push(self) -> dict:
+        return self.d.push_wapi(self.client, chunk_size=10,
+                                checkpoint=self.checkpoint)
+
+
+    def test_load(self):
+        counts = self.push()
+
+        self.assertEqual(counts, { 'loaded': len(self.items), 'existing': 0,
+                                   'failed': 0, 'remaining': 0 })
+        self.assertEqual(len(self.mock.objects), len(self.items))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+    def test_resume(self):
+        # Stop part way through a window of in flight calls
+        self.mock.fail_after = len(self.items) // 2 + 3
+        first = self.push()
+
+        self.assertGreater(first['remaining'], 0)
+        self.assertTrue(os.path.exists(self.checkpoint))
+        done = len(self.items) - first['remaining']
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['done'], done)
+        # Every object before the checkpoint was created
+        for item in self.items[:done]:
+            self.assertIn(self.mock.key(item), self.mock.objects)
+
+        self.mock.fail_after = None
+        second = self.push()
+
+        self.assertEqual(second['remaining'], 0)
+        self.assertEqual(second['failed'], 0)
+        self.assertEqual(first['loaded'] + second['loaded'] + second['existing'],
+                         len(self.items))
+        self.assertEqual(len(self.mock.objects), len(self.items))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+    def test_existing(self):
+        # Objects that already exist are rejected with IBDataConflictError
+        for item in self.items[5:8]:
+            self.mock.objects[self.mock.key(item)] = 'existing'
+        counts = self.push()
+
+        self.assertEqual(counts['existing'], 3)
+        self.assertEqual(counts['loaded'], len(self.items) - 3)
+        self.assertEqual(counts['failed'], 0)
+        self.assertEqual(len(self.mock.objects), len(self.items))
+
+
+    def test_other_checkpoint(self):
+        # A checkpoint for a different data set is ignored
+        self.d.write_checkpoint(self.checkpoint, 'other', len(self.items))
+        counts = self.push()
+
+        self.assertEqual(counts['loaded'], len(self.items))
+        self.assertEqual(len(self.mock.objects), len(self.items))
+
+
+if __name__ == '__main__':
+    unittest.main()
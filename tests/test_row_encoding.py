@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for ROW_TEMPLATE quoting of metadata values
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import sys
+import csv
+import tempfile
+import unittest
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+
+class TEST_ROW_ENCODING(unittest.TestCase):
+    '''
+    Encode rows with commas and quotes in metadata values
+    '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open(os.path.join(ROOT, 'metadata.yaml')) as f:
+            metadata = yaml.safe_load(f)
+        departments = metadata['metadata']['departments']
+        departments[0] = 'HR, People'
+        departments[1] = 'Engineering "R&D"'
+        self.metadata = os.path.join(self.tmpdir.name, 'metadata.yaml')
+        with open(self.metadata, 'w') as f:
+            yaml.safe_dump(metadata, f)
+
+        return
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def generate(self, columnar:bool = False) -> dict:
+        d = gen_demo_data.DEMODATA(
+                metadata=self.metadata,
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                include_dhcp=True,
+                include_hosts=True,
+                hosts_per_network=2,
+                columnar=columnar)
+        d.gen_networks()
+
+        return d
+
+
+    def test_template(self):
+        schema = gen_demo_data.ROW_SCHEMA('header-network,address*,comment,EA-Department')
+        template = schema.template({ 'address': '{address}',
+                                     'comment': '{department} network',
+                                     'EA-Department': '{department}' },
+                                   fields=('address',))
+        self.assertEqual(template.encode('10.0.0.0', 'HR'),
+                         'network,10.0.0.0,HR network,HR')
+        self.assertEqual(template.encode('10.0.0.0', 'HR, "People"'),
+                         'network,10.0.0.0,"HR, ""People"" network",'
+                         '"HR, ""People"""')
+        self.assertEqual(template.encode_rows([ '10.0.0.0', '10.0.1.0' ], 'A,B'),
+                         [ 'network,10.0.0.0,"A,B network","A,B"',
+                           'network,10.0.1.0,"A,B network","A,B"' ])
+
+        return
+
+
+    def test_rows_match_header(self):
+        d = self.generate()
+        for object_type, rows in d.csv_sets.items():
+            width = len(d.headers[object_type].split(','))
+            for row in csv.reader(rows):
+                self.assertEqual(len(row), width, row)
+        values = { field for row in csv.reader(d.csv_sets['networks'])
+                   for field in row }
+        self.assertIn('HR, People', values)
+        self.assertIn('Engineering "R&D"', values)
+
+        return
+
+
+    def test_columnar(self):
+        rows = self.generate().csv_sets
+        columns = self.generate(columnar=True).csv_sets
+        for object_type in rows:
+            self.assertEqual(list(columns[object_type]), rows[object_type])
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
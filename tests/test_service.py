@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for the DEMO_SERVICE dataset cache over local HTTP
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import http.server
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+
+class TEST_SERVICE(unittest.TestCase):
+    '''
+    Request datasets from a DEMO_SERVICE on a local port
+    '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = os.path.join(ROOT, 'metadata.yaml')
+        self.service = gen_demo_data.DEMO_SERVICE(config=self.config,
+                                                  cache_dir=self.tmpdir.name)
+        self.server = http.server.ThreadingHTTPServer(( '127.0.0.1', 0 ),
+                                                      gen_demo_data.DEMO_HANDLER)
+        self.server.service = self.service
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+        return
+
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def get(self, path:str) -> tuple:
+        url = f'http://127.0.0.1:{self.server.server_port}{path}'
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                return ( response.status, response.headers,
+                         response.read().decode('utf-8') )
+        except urllib.error.HTTPError as err:
+            return ( err.code, err.headers, err.read().decode('utf-8') )
+
+
+    def test_miss_then_hit(self):
+        status, headers, first = self.get('/networks')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['X-Cache'], 'MISS')
+        self.assertTrue(first.startswith('header-network,'))
+
+        status, headers, second = self.get('/networks')
+        self.assertEqual(headers['X-Cache'], 'HIT')
+        self.assertEqual(second, first)
+        stats = self.service.datasets.stats()
+        self.assertEqual(( stats['hits'], stats['misses'] ), ( 1, 1 ))
+
+        return
+
+
+    def test_normalised_params(self):
+        self.get('/all')
+        base = gen_demo_data.METADATA(self.config, cache=False).base_network
+        for query in [ 'scale=0', 'scale=1&dept_scale=-1', f'base={base}',
+                       'hosts_per_network=5&records=1', 'seed=7' ]:
+            status, headers, _ = self.get(f'/all?{query}')
+            self.assertEqual(status, 200, query)
+            self.assertEqual(headers['X-Cache'], 'HIT', query)
+
+        _, headers, _ = self.get('/all?hosts=1')
+        self.assertEqual(headers['X-Cache'], 'MISS')
+        _, headers, _ = self.get('/all?hosts=1&seed=7')
+        self.assertEqual(headers['X-Cache'], 'MISS')
+
+        return
+
+
+    def test_errors(self):
+        for path, status in [ ( '/unknown', 404 ),
+                              ( '/networks?colour=red', 400 ),
+                              ( '/networks?scale=many', 400 ),
+                              ( '/networks?base=10.0.0.0/30', 400 ) ]:
+            code, headers, body = self.get(path)
+            self.assertEqual(code, status, path)
+            self.assertTrue(headers['Content-Type'].startswith('text/plain'),
+                            path)
+            self.assertNotIn('<', body, path)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
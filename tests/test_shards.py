@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for sharded -f output and the import manifest
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import sys
+import csv
+import gzip
+import json
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+
+class TEST_SHARDS(unittest.TestCase):
+    '''
+    Write shards and read them back through the manifest
+    '''
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+        return
+
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def generate(self, object_type:str = 'all', **kwargs) -> gen_demo_data.DEMODATA:
+        d = gen_demo_data.DEMODATA(
+                metadata=os.path.join(ROOT, 'metadata.yaml'),
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                include_dhcp=True,
+                **kwargs)
+        self.assertTrue(d.gen_data(to_file=True, object_type=object_type))
+
+        return d
+
+
+    def manifest(self) -> dict:
+        with open('manifest_demo.json') as f:
+            return json.load(f)
+
+
+    def read_shard(self, filename:str) -> list:
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(filename, 'rt') as f:
+            rows = f.read().splitlines()
+        # Header then rows
+        return rows[1:]
+
+
+    def shard_rows(self, manifest:dict) -> dict:
+        rows:dict = {}
+        for phase in manifest['phases']:
+            for shard in phase:
+                rows.setdefault(shard['object_type'], []).extend(
+                    self.read_shard(shard['file']))
+
+        return rows
+
+
+    def shard_files(self) -> set:
+        return { name for name in os.listdir('.')
+                 if '_demo_' in name and not name.endswith('.bak') }
+
+
+    def test_round_trip(self):
+        d = self.generate(shards=3, compression='gzip')
+        manifest = self.manifest()
+        rows = self.shard_rows(manifest)
+        for object_type, expected in d.csv_sets.items():
+            self.assertEqual(sorted(rows[object_type]), sorted(expected))
+        for phase in manifest['phases']:
+            for shard in phase:
+                self.assertEqual(len(self.read_shard(shard['file'])),
+                                 shard['rows'])
+        self.assertEqual(self.shard_files(),
+                         { shard['file'] for phase in manifest['phases']
+                           for shard in phase })
+
+        return
+
+
+    def test_fewer_shards(self):
+        self.generate(shards=4)
+        self.generate(shards=2)
+        manifest = self.manifest()
+        self.assertEqual(self.shard_files(),
+                         { shard['file'] for phase in manifest['phases']
+                           for shard in phase })
+
+        return
+
+
+    def test_partial_rerun(self):
+        d = self.generate(shards=2)
+        before = self.manifest()
+        self.generate(object_type='networks', shards=1)
+        after = self.manifest()
+
+        self.assertEqual([ phase[0]['object_type'] for phase in after['phases'] ],
+                         [ phase[0]['object_type'] for phase in before['phases'] ])
+        self.assertEqual(len([ shard for phase in after['phases']
+                               for shard in phase
+                               if shard['object_type'] == 'networks' ]), 1)
+        self.assertEqual(self.shard_files(),
+                         { shard['file'] for phase in after['phases']
+                           for shard in phase })
+        rows = self.shard_rows(after)
+        for object_type, expected in d.csv_sets.items():
+            self.assertEqual(sorted(rows[object_type]), sorted(expected))
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for streamed (-s) output against output from csv_sets
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import io
+import sys
+import tempfile
+import unittest
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+
+class TEST_STREAMING(unittest.TestCase):
+    '''
+    Streamed and non-streamed runs output the same rows
+    '''
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+        return
+
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def generate(self, to_file:bool = False, **kwargs) -> str:
+        d = gen_demo_data.DEMODATA(
+                metadata=os.path.join(ROOT, 'metadata.yaml'),
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                include_dhcp=True,
+                include_hosts=True,
+                include_records=True,
+                hosts_per_network=4,
+                fixed_per_network=2,
+                seed=1,
+                **kwargs)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertTrue(d.gen_data(to_file=to_file))
+
+        return output.getvalue()
+
+
+    def files(self) -> dict:
+        contents:dict = {}
+        for name in sorted(os.listdir('.')):
+            with open(name) as f:
+                contents[name] = f.read()
+            os.remove(name)
+
+        return contents
+
+
+    def test_stdout(self):
+        rows = self.generate()
+        self.assertEqual(self.generate(streaming=True), rows)
+        headers = [ line.split(',')[0] for line in rows.splitlines()
+                    if line.startswith('header-') ]
+        self.assertEqual(headers[:3], [ 'header-nsgroup',
+                                        'header-networkcontainer',
+                                        'header-network' ])
+
+        return
+
+
+    def test_files(self):
+        self.generate(to_file=True)
+        rows = self.files()
+        self.generate(to_file=True, streaming=True)
+        self.assertEqual(self.files(), rows)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
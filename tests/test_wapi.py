@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for WAPI_CLIENT retries and the create/delete EA scripts
+ against the local mock WAPI server
+
+ Requirements:
+   Python 3, requests, wapi.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import sys
+import socket
+import tempfile
+import unittest
+import subprocess
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wapi
+from mock_wapi import MOCK_WAPI
+
+
+class TEST_RETRIES(unittest.TestCase):
+    '''
+    Only requests that can not have been applied are retried
+    '''
+
+    def setUp(self):
+        self.mock = MOCK_WAPI()
+        self.mock.start()
+
+        return
+
+
+    def tearDown(self):
+        self.mock.stop()
+
+        return
+
+
+    def client(self, url:str) -> wapi.WAPI_CLIENT:
+        client = wapi.WAPI_CLIENT(url, retries=2, backoff=0)
+        self.addCleanup(client.close)
+
+        return client
+
+
+    def test_post_not_retried(self):
+        self.mock.fail_after = 0
+        client = self.client(self.mock.url)
+        response = client.request('POST', 'request',
+                                  [ { 'method': 'POST', 'object': 'network',
+                                      'data': { 'network': '10.0.0.0/24' } } ])
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.mock.calls, 1)
+        self.assertEqual(client.retried, 0)
+
+        return
+
+
+    def test_not_connected(self):
+        # Nothing listens on a closed socket's port
+        with socket.socket() as sock:
+            sock.bind(( '127.0.0.1', 0 ))
+            port = sock.getsockname()[1]
+        client = self.client(f'http://127.0.0.1:{port}/wapi/v2.11')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.request('POST', 'request', [])
+
+        self.assertEqual(client.retried, 2)
+
+        return
+
+
+class TEST_EA_SCRIPTS(unittest.TestCase):
+    '''
+    Run create-eas-request.py and delete-eas-request.py
+    '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.ea_list = [ f'Demo{index:02d}' for index in range(25) ]
+        self.file = os.path.join(self.tmpdir.name, 'ea_list.txt')
+        with open(self.file, 'w') as f:
+            f.write('\n'.join(self.ea_list) + '\n')
+        self.mock = MOCK_WAPI()
+        self.mock.start()
+
+        return
+
+
+    def tearDown(self):
+        self.mock.stop()
+        self.tmpdir.cleanup()
+
+        return
+
+
+    def run_script(self, script:str) -> str:
+        # A new session has no controlling terminal, so getpass
+        # reads the password from stdin
+        result = subprocess.run([ sys.executable, os.path.join(ROOT, script),
+                                  '-f', self.file, '-u', 'admin',
+                                  '--url', self.mock.url, '-b', '10' ],
+                                input='password\n', capture_output=True,
+                                text=True, timeout=60, cwd=self.tmpdir.name,
+                                start_new_session=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        return result.stdout
+
+
+    def test_create_delete(self):
+        output = self.run_script('create-eas-request.py')
+        self.assertIn('Created 25 of 25 EAs, 0 failed', output)
+        self.assertEqual(sorted(item['data']['name']
+                                for item in self.mock.items.values()),
+                         self.ea_list)
+
+        output = self.run_script('delete-eas-request.py')
+        self.assertIn('Deleted 25 of 25 EAs, 0 failed', output)
+        self.assertEqual(self.mock.objects, {})
+
+        return
+
+
+    def test_existing(self):
+        self.run_script('create-eas-request.py')
+        output = self.run_script('create-eas-request.py')
+
+        self.assertIn('Created 0 of 25 EAs, 25 failed', output)
+        self.assertIn('IBDataConflictError', output)
+        self.assertEqual(len(self.mock.objects), 25)
+
+        return
+
+
+    def test_delete_missing(self):
+        output = self.run_script('delete-eas-request.py')
+
+        self.assertIn('Deleted 0 of 25 EAs, 25 failed', output)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
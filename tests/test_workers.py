@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Tests for parallel (-w) generation against a serial run
+
+ Requirements:
+   Python 3, gen_demo_data.py
+
+ Usage: python -m pytest tests
+        python -m unittest discover -s tests
+
+----------------------------------------------------------------------
+"""
+
+import os
+import io
+import sys
+import unittest
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gen_demo_data
+
+
+class TEST_WORKERS(unittest.TestCase):
+    '''
+    Worker processes output the same bytes as a serial run
+    '''
+
+    def generate(self, workers:int = 1, base:str = '', **kwargs) -> str:
+        d = gen_demo_data.DEMODATA(
+                metadata=os.path.join(ROOT, 'metadata.yaml'),
+                cache=False,
+                include_countries=True,
+                include_locations=True,
+                include_networks=True,
+                include_dhcp=True,
+                include_hosts=True,
+                include_records=True,
+                hosts_per_network=4,
+                fixed_per_network=2,
+                cname_fraction=0.5,
+                seed=1,
+                scale=2,
+                workers=workers,
+                **kwargs)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertTrue(d.gen_data(base=base))
+
+        return output.getvalue()
+
+
+    def test_workers(self):
+        serial = self.generate()
+        self.assertIn('header-hostrecord', serial)
+        self.assertEqual(self.generate(workers=2), serial)
+        self.assertEqual(self.generate(workers=3), serial)
+
+        return
+
+
+    def test_streaming_workers(self):
+        self.assertEqual(self.generate(workers=2, streaming=True),
+                         self.generate(streaming=True))
+
+        return
+
+
+    def test_ipv6_workers(self):
+        self.assertEqual(self.generate(workers=2, base='fd00::/32'),
+                         self.generate(base='fd00::/32'))
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+#vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
+"""
+-----------------------------------------------------------------------
+
+ Connection pooled WAPI client
+
+ Requirements:
+   Python 3, requests
+
+ Usage: import wapi
+        client = wapi.WAPI_CLIENT(url, user, password)
+        results = client.run([ ('POST', 'extensibleattributedef', data) ])
+
+ Author: Chris Marrison
+ Email: chris@infoblox.com
+
+ ChangeLog:
+   <date>	<version>	<comment>
+
+ Todo:
+
+ Copyright 2018 Chris Marrison / Infoblox Inc
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+----------------------------------------------------------------------
+"""
+
+__version__ = '0.0.1'
+__author__ = 'Chris Marrison'
+
+import logging
+import time
+import asyncio
+import functools
+import concurrent.futures
+import requests
+import urllib3
+
+# HTTP status codes worth retrying
+RETRY_STATUS = ( 429, 500, 502, 503, 504 )
+
+# Methods that can be repeated without creating a second object
+IDEMPOTENT = ( 'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS' )
+
+
+class WAPI_CLIENT:
+    '''
+    WAPI client sharing one keep-alive session between a bounded
+    number of concurrent requests
+    '''
+
+    def __init__(self, url:str, user:str = '', password:str = '',
+                 concurrency:int = 8,
+                 retries:int = 3,
+                 backoff:float = 0.5,
+                 timeout:float = 60,
+                 verify:bool = False):
+        '''
+        Parameters:
+            url (str): Base WAPI URL, e.g. https://gm/wapi/v2.11
+            user (str): Username
+            password (str): Password
+            concurrency (int): Maximum requests in flight
+            retries (int): Retries on connection errors, 429 and 5xx,
+                           POSTs are only retried when no connection
+                           could be made
+            backoff (float): Initial retry delay in seconds, doubled
+                             on each retry unless Retry-After is given
+            timeout (float): Per request timeout in seconds
+            verify (bool): Verify the server certificate
+        '''
+        self.url:str = url.rstrip('/')
+        self.concurrency:int = max(1, concurrency)
+        self.retries:int = retries
+        self.backoff:float = backoff
+        self.timeout:float = timeout
+        self.retried:int = 0
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if user:
+            self.session.auth = (user, password)
+        self.session.verify = verify
+        self.session.headers.update({ 'content-type': 'application/json' })
+
+        if not verify:
+            # Disable SSL warnings in requests #
+            requests.packages.urllib3.disable_warnings()
+
+        return
+
+
+    def close(self):
+        '''
+        Close pooled connections
+        '''
+        self.session.close()
+
+        return
+
+
+    def retry_delay(self, attempt:int, response=None) -> float:
+        '''
+        Delay before the next attempt, honouring Retry-After
+        '''
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return float(retry_after)
+
+        return self.backoff * 2 ** attempt
+
+
+    @staticmethod
+    def not_sent(err:Exception) -> bool:
+        '''
+        True if the request failed before a connection was made, so
+        it can not have reached the server
+        '''
+        if isinstance(err, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(err.args[0], 'reason', None) if err.args else None
+
+        return isinstance(reason, ( urllib3.exceptions.NewConnectionError,
+                                    urllib3.exceptions.ConnectTimeoutError ))
+
+
+    def request(self, method:str, path:str, data=None):
+        '''
+        Make a WAPI call, retrying on connection errors, 429 and 5xx
+
+        A POST may have been applied even when it fails or returns an
+        error, e.g. a /request call that timed out after it was sent,
+        so POSTs are only retried when the connection could not be made.
+
+        Parameters:
+            method (str): HTTP method
+            path (str): Object or function path relative to the base URL
+            data: Object to send as the JSON body
+
+        Returns:
+            requests.Response of the last attempt
+        '''
+        url = f'{self.url}/{path}'
+        idempotent = method.upper() in IDEMPOTENT
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, json=data,
+                                                timeout=self.timeout)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as err:
+                if ( attempt >= self.retries or 
+                     not ( idempotent or self.not_sent(err) ) ):
+                    raise
+                delay = self.retry_delay(attempt)
+                logging.debug(f'{method} {path} failed: {err}, '
+                              f'retrying in {delay}s')
+            else:
+                if (response.status_code not in RETRY_STATUS or
+                    attempt >= self.retries or not idempotent):
+                    return response
+                delay = self.retry_delay(attempt, response)
+                logging.debug(f'{method} {path} returned '
+                              f'{response.status_code}, '
+                              f'retrying in {delay}s')
+            self.retried += 1
+            attempt += 1
+            time.sleep(delay)
+
+
+    async def gather(self, calls:list) -> list:
+        '''
+        Run WAPI calls concurrently, at most concurrency at a time
+
+        Parameters:
+            calls (list): List of (method, path, data) tuples
+
+        Returns:
+            List of requests.Response or exception, in call order
+        '''
+        loop = asyncio.get_running_loop()
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.concurrency) as pool:
+            futures = [ loop.run_in_executor(pool,
+                          functools.partial(self.request, *call))
+                        for call in calls ]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+
+        return results
+
+
+    def batch_result(self, response) -> list:
+        '''
+        Decode a /request response
+
+        Returns:
+            list of results for the non discarded items or None on failure
+        '''
+        if isinstance(response, Exception):
+            return None
+        if response.status_code not in ( 200, 201 ):
+            return None
+        try:
+            results = response.json()
+        except ValueError:
+            return None
+        if not isinstance(results, list):
+            return None
+
+        return results
+
+
+    def transport_error(self, response):
+        '''
+        Exception for a failed connection, 429 or 5xx response
+
+        Returns:
+            Exception or None if the request was answered
+        '''
+        if isinstance(response, Exception):
+            return response
+        if response.status_code in RETRY_STATUS:
+            return requests.HTTPError(f'{response.status_code} '
+                                      f'{response.reason}: {response.text}',
+                                      response=response)
+
+        return None
+
+
+    def batch_error(self, response) -> str:
+        '''
+        Error text for a failed /request response
+        '''
+        if isinstance(response, Exception):
+            return str(response)
+        try:
+            return response.json().get('text', response.text)
+        except (ValueError, AttributeError):
+            return response.text
+
+
+    async def gather_batches(self, entries:list, chunk_size:int = 100) -> list:
+        '''
+        Send entries as chunked multi-object /request calls
+
+        Each entry is a list of /request items that produces exactly
+        one result, all other items of the entry must be discarded.
+        A /request call is applied as a whole, so when a chunk is
+        rejected each of its entries is resent on its own to report the
+        failure against the entry that caused it. Chunks that still fail
+        with a connection error, 429 or 5xx after retries are not resent
+        and report the exception for each entry.
+
+        Parameters:
+            entries (list): List of lists of /request items
+            chunk_size (int): Entries per /request call
+
+        Returns:
+            List of (ok, result) tuples in entry order, where result is
+            the error text or exception when ok is False
+        '''
+        chunk_size = max(1, chunk_size)
+        offsets = range(0, len(entries), chunk_size)
+        calls = [ ('POST', 'request',
+                   [ item for entry in entries[offset:offset + chunk_size]
+                          for item in entry ])
+                  for offset in offsets ]
+        responses = await self.gather(calls)
+
+        results:list = [ None ] * len(entries)
+        resend:list = []
+        for offset, response in zip(offsets, responses):
+            count = len(entries[offset:offset + chunk_size])
+            batch = self.batch_result(response)
+            error = self.transport_error(response)
+            if batch is not None and len(batch) == count:
+                for index, result in enumerate(batch):
+                    results[offset + index] = (True, result)
+            elif error:
+                for index in range(count):
+                    results[offset + index] = (False, error)
+            elif count == 1:
+                results[offset] = (False, self.batch_error(response))
+            else:
+                logging.debug(f'Batch at {offset} failed, resending '
+                              f'{count} entries individually')
+                resend.extend(range(offset, offset + count))
+
+        if resend:
+            responses = await self.gather([ ('POST', 'request', entries[index])
+                                            for index in resend ])
+            for index, response in zip(resend, responses):
+                batch = self.batch_result(response)
+                if batch is not None and len(batch) == 1:
+                    results[index] = (True, batch[0])
+                else:
+                    results[index] = (False, self.transport_error(response)
+                                             or self.batch_error(response))
+
+        return results
+
+
+    def run_batches(self, entries:list, chunk_size:int = 100) -> list:
+        '''
+        Blocking wrapper for gather_batches()
+        '''
+        return asyncio.run(self.gather_batches(entries, chunk_size))
+
+
+    def run(self, calls:list) -> list:
+        '''
+        Blocking wrapper for gather()
+
+        Parameters:
+            calls (list): List of (method, path, data) tuples
+
+        Returns:
+            List of requests.Response or exception, in call order
+        '''
+        return asyncio.run(self.gather(calls))